@@ -1,109 +1,185 @@
 from flask import (
+    Blueprint,
     Flask,
+    current_app,
     send_from_directory,
     render_template,
     request,
     jsonify,
-    send_file
-)
-import qrcode
-from qrcode.constants import (
-    ERROR_CORRECT_L,
-    ERROR_CORRECT_M,
-    ERROR_CORRECT_Q,
-    ERROR_CORRECT_H
+    send_file,
+    url_for,
+    Response,
+    abort,
+    g
 )
 from io import BytesIO
+from types import SimpleNamespace
 import base64
-import re
 import os
 import secrets
-from datetime import timedelta
-
-app = Flask(__name__)
-
-# Конфигурация приложения
-app.config.update(
-    SECRET_KEY=os.environ.get('SECRET_KEY', secrets.token_hex(32)),
-    SESSION_COOKIE_SECURE=True,
-    SESSION_COOKIE_HTTPONLY=True,
-    SESSION_COOKIE_SAMESITE='Lax',
-    PERMANENT_SESSION_LIFETIME=timedelta(days=1),
-    MAX_CONTENT_LENGTH=16 * 1024 * 1024,  # 16MB
+import threading
+import time
+
+from batch import (
+    BATCH_FORMATS,
+    BatchError,
+    create_process_pool,
+    iter_results,
+    parse_batch_items,
+    stream_ndjson,
+    stream_zip
 )
+from classifier import PAYLOAD_KINDS, classify, normalize_hex_color
+from jobs import JobNotFound, JobRunner, JobStore
+from metrics import EncodeStats, MetricsRegistry, gauge_lines
+from page_cache import PageCache
+from rate_limit import (
+    LocalBucketBackend,
+    RateLimited,
+    RateLimiter,
+    RenderTooLarge,
+    SharedBucketBackend,
+    client_key,
+    estimate_cost,
+    estimate_render_memory
+)
+from render_cache import RenderCache, SqliteCacheBackend, make_cache_key
+from render_pool import PoolSaturated, RenderPool, RenderTimeout
+from security_headers import HeaderProfiles, make_nonce
+from config import ENCODERS, RENDERERS, config
+
+bp = Blueprint('main', __name__)
 
+# Сервисы приложения (кэши, пулы, лимиты) создаются в create_app() и
+# хранятся в app.extensions: у каждого приложения свои. Модули рендера
+# (qrcode, Pillow) импортируются при первом рендере или в preload_renderers()
+EXTENSION_KEY = 'qr_generator'
 
-def get_csp_for_request():
+
+def services():
     """
-    Возвращает Content Security Policy для текущего запроса.
+    Сервисы текущего приложения.
     """
-    base_csp = [
-        "default-src 'self'",
-        "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net",
-        "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net",
-        "img-src 'self' data: https:",
-        "font-src 'self' https://cdn.jsdelivr.net",
-        "connect-src 'self'",
-        "frame-ancestors 'none'",
-        "form-action 'self'",
-        "object-src 'none'",
-    ]
+    return current_app.extensions[EXTENSION_KEY]
+
+
+def collect_runtime_metrics():
+    """
+    Метрики кэша, пула рендера и PNG-кодировщика на момент запроса.
+    """
+    qr = services()
+    
+    cache = qr.render_cache.stats()
+    yield from gauge_lines(
+        'qr_render_cache_events_total', 'Render cache outcomes',
+        {
+            'hit': cache['hits'],
+            'backend_hit': cache['backend_hits'],
+            'miss': cache['misses'],
+            'eviction': cache['evictions'],
+            'coalesced': cache['coalesced'],
+        },
+        'outcome', kind='counter'
+    )
+    yield from gauge_lines(
+        'qr_render_cache_entries', 'Entries in the local render cache',
+        cache['entries']
+    )
+    yield from gauge_lines(
+        'qr_render_cache_bytes', 'Bytes held by the local render cache',
+        cache['bytes']
+    )
     
-    return '; '.join(base_csp)
+    matrices = qr.matrix_cache.stats()
+    yield from gauge_lines(
+        'qr_matrix_cache_events_total', 'Encoded matrix cache outcomes',
+        {
+            'hit': matrices['hits'],
+            'miss': matrices['misses'],
+            'eviction': matrices['evictions'],
+            'coalesced': matrices['coalesced'],
+        },
+        'outcome', kind='counter'
+    )
+    yield from gauge_lines(
+        'qr_matrix_cache_entries', 'Encoded matrices in the local cache',
+        matrices['entries']
+    )
+    
+    pool = qr.render_pool.stats()
+    yield from gauge_lines(
+        'qr_render_pool_in_flight', 'Renders running or queued in the pool',
+        pool['in_flight']
+    )
+    yield from gauge_lines(
+        'qr_render_pool_rejected_total', 'Renders rejected with 429',
+        pool['rejected'], kind='counter'
+    )
+    yield from gauge_lines(
+        'qr_render_pool_timeouts_total', 'Renders that hit RENDER_TIMEOUT',
+        pool['timed_out'], kind='counter'
+    )
+    
+    png = qr.encode_stats.snapshot()
+    yield from gauge_lines(
+        'qr_png_codes_total', 'PNG codes encoded per size preset',
+        {size_id: entry['codes'] for size_id, entry in png.items()},
+        'size', kind='counter'
+    )
+    yield from gauge_lines(
+        'qr_png_bytes_total', 'PNG bytes produced per size preset',
+        {size_id: entry['bytes_total'] for size_id, entry in png.items()},
+        'size', kind='counter'
+    )
+    
+    pages = qr.page_cache.stats()
+    yield from gauge_lines(
+        'qr_page_cache_events_total', 'Page cache outcomes',
+        {'hit': pages['hits'], 'render': pages['renders']},
+        'outcome', kind='counter'
+    )
+    
+    if qr.warmup_report:
+        yield from gauge_lines(
+            'qr_warmup_seconds', 'Warm-up time at app creation by stage',
+            qr.warmup_report['seconds'], 'stage'
+        )
+
 
 
-@app.after_request
+def get_csp_nonce():
+    """
+    Nonce для CSP текущего запроса (создается при первом обращении).
+    """
+    nonce = g.get('csp_nonce')
+    if nonce is None:
+        nonce = g.csp_nonce = make_nonce()
+    return nonce
+
+
+@bp.after_app_request
 def add_security_headers(response):
     """
     Добавляет security headers к каждому ответу.
+    
+    Наборы заголовков посчитаны заранее в header_profiles, здесь только
+    выбирается набор и применяется одним обновлением.
     """
-    # Удаляем лишние заголовки
-    headers_to_remove = ['X-Powered-By', 'Server']
-    for header in headers_to_remove:
-        if header in response.headers:
-            del response.headers[header]
-    
-    # Базовые заголовки безопасности
-    response.headers.update({
-        'X-Content-Type-Options': 'nosniff',
-        'X-Frame-Options': 'DENY',
-        'X-XSS-Protection': '0',
-        'Referrer-Policy': 'strict-origin-when-cross-origin',
-        'Permissions-Policy': (
-            'accelerometer=(), autoplay=(), camera=(), '
-            'geolocation=(), gyroscope=(), magnetometer=(), '
-            'microphone=(), payment=(), usb=()'
-        ),
-        'Cross-Origin-Embedder-Policy': 'require-corp',
-        'Cross-Origin-Opener-Policy': 'same-origin',
-        'Cross-Origin-Resource-Policy': 'same-origin',
-        'X-DNS-Prefetch-Control': 'off',
-    })
+    header_profiles = services().header_profiles
     
-    # HSTS для продакшена
-    if os.environ.get('FLASK_ENV') == 'production':
-        response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
+    headers = response.headers
+    # Удаляем лишние заголовки
+    headers.pop('X-Powered-By', None)
+    headers.pop('Server', None)
     
-    # Content Security Policy
-    response.headers['Content-Security-Policy'] = get_csp_for_request()
+    # Изображения QR-кодов и страницы из кэша страниц уже настроили кэширование
+    cacheable = 'public' in headers.get('Cache-Control', '')
+    headers.update(header_profiles.get(request.path, cacheable))
     
-    # Настройки кэширования
-    if request.path.startswith('/static/'):
-        # Статические файлы - длительное кэширование
-        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
-    else:
-        # Динамические страницы - не кэшировать
-        response.headers['Cache-Control'] = (
-            'no-store, no-cache, must-revalidate, proxy-revalidate'
+    if header_profiles.csp_nonce:
+        headers['Content-Security-Policy'] = header_profiles.csp_with_nonce(
+            get_csp_nonce()
         )
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-    
-    # CORS заголовки для API
-    if request.path.startswith('/api/'):
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
     
     return response
 
@@ -117,12 +193,6 @@ SIZE_OPTIONS = [
         'border': 2,
         'desc': 'Для очень плотной печати',
         'icon': 'bi-qr-code-scan',
-        'char_limits': {
-            'L': '~100 символов',
-            'M': '~80 символов',
-            'Q': '~60 символов',
-            'H': '~40 символов'
-        },
         'max_version': 10
     },
     {
@@ -132,12 +202,6 @@ SIZE_OPTIONS = [
         'border': 3,
         'desc': 'Для документов и визиток',
         'icon': 'bi-qr-code',
-        'char_limits': {
-            'L': '~200 символов',
-            'M': '~160 символов',
-            'Q': '~120 символов',
-            'H': '~80 символов'
-        },
         'max_version': 20
     },
     {
@@ -147,12 +211,6 @@ SIZE_OPTIONS = [
         'border': 4,
         'desc': 'Универсальный размер',
         'icon': 'bi-qr-code',
-        'char_limits': {
-            'L': '~300 символов',
-            'M': '~240 символов',
-            'Q': '~180 символов',
-            'H': '~120 символов'
-        },
         'max_version': 30
     },
     {
@@ -162,12 +220,6 @@ SIZE_OPTIONS = [
         'border': 5,
         'desc': 'Для плакатов и дисплеев',
         'icon': 'bi-qr-code-scan',
-        'char_limits': {
-            'L': '~500 символов',
-            'M': '~400 символов',
-            'Q': '~300 символов',
-            'H': '~200 символов'
-        },
         'max_version': 40
     },
     {
@@ -177,16 +229,27 @@ SIZE_OPTIONS = [
         'border': 6,
         'desc': 'Для больших дисплеев и баннеров',
         'icon': 'bi-qr-code-scan',
-        'char_limits': {
-            'L': '~700 символов',
-            'M': '~550 символов',
-            'Q': '~400 символов',
-            'H': '~280 символов'
-        },
         'max_version': 40
     }
 ]
 
+# Форматы вывода QR-кода
+OUTPUT_FORMATS = {
+    'png': {'name': 'PNG', 'mimetype': 'image/png', 'extension': 'png'},
+    'svg': {'name': 'SVG', 'mimetype': 'image/svg+xml', 'extension': 'svg'},
+    'svg-path': {
+        'name': 'SVG (один контур)',
+        'mimetype': 'image/svg+xml',
+        'extension': 'svg'
+    },
+    'pdf': {'name': 'PDF', 'mimetype': 'application/pdf', 'extension': 'pdf'},
+}
+
+# Матрица модулей для рендера на клиенте (/api/matrix и format=matrix в
+# /api/generate). Это не изображение, поэтому ее нет в OUTPUT_FORMATS
+MATRIX_FORMAT = 'matrix'
+MATRIX_MIMETYPE = 'application/octet-stream'
+
 # Цветовая палитра
 COLOR_OPTIONS = [
     '#000000', '#6c63ff', '#ff6584', '#36d1dc', '#ff9966',
@@ -196,20 +259,44 @@ COLOR_OPTIONS = [
 ]
 
 # Уровни коррекции ошибок
+# Значения констант совпадают с qrcode.constants (ERROR_CORRECT_*), сам
+# qrcode здесь не импортируется, чтобы не загружать его при старте
 ERROR_CORRECTION_LEVELS = {
-    'L': {'name': 'L (Низкий, 7%)', 'const': ERROR_CORRECT_L},
-    'M': {'name': 'M (Средний, 15%)', 'const': ERROR_CORRECT_M},
-    'Q': {'name': 'Q (Высокий, 25%)', 'const': ERROR_CORRECT_Q},
-    'H': {'name': 'H (Максимальный, 30%)', 'const': ERROR_CORRECT_H}
+    'L': {'name': 'L (Низкий, 7%)', 'const': 1},
+    'M': {'name': 'M (Средний, 15%)', 'const': 0},
+    'Q': {'name': 'Q (Высокий, 25%)', 'const': 3},
+    'H': {'name': 'H (Максимальный, 30%)', 'const': 2}
 }
 
+DATA_TOO_LONG_MESSAGE = 'Данные не помещаются в QR-код даже максимальной версии 40'
+
+# Отказы в допуске и перегрузка: их отдают errorhandler'ы (413, 429, 503),
+# а не обработчики ошибок рендера
+ADMISSION_ERRORS = (PoolSaturated, RenderTimeout, RateLimited, RenderTooLarge)
+
+
+def get_size_options():
+    """
+    SIZE_OPTIONS с точными лимитами символов (байтовый режим) для
+    максимальной версии пресета. Лимиты считаются при первом вызове.
+    """
+    if 'char_limits' not in SIZE_OPTIONS[-1]:
+        from capacity import max_chars
+        
+        for size in SIZE_OPTIONS:
+            size['char_limits'] = {
+                level: f"до {max_chars(info['const'], size['max_version'])} символов"
+                for level, info in ERROR_CORRECTION_LEVELS.items()
+            }
+    return SIZE_OPTIONS
+
 
 def get_max_chars_for_size(size_id, error_level='M'):
     """
     Получает максимальное количество символов для размера и уровня коррекции.
     """
     size_info = next(
-        (s for s in SIZE_OPTIONS if s['id'] == size_id),
+        (s for s in get_size_options() if s['id'] == size_id),
         SIZE_OPTIONS[2]
     )
     return size_info['char_limits'].get(error_level, '~240 символов')
@@ -223,12 +310,9 @@ def validate_color(color):
         return '#000000'
     
     color = color.strip()
-    hex_pattern = r'^#([A-Fa-f0-9]{6}|[A-Fa-f0-9]{3})$'
-    
-    if re.match(hex_pattern, color):
-        if len(color) == 4:
-            color = f'#{color[1]*2}{color[2]*2}{color[3]*2}'
-        return color
+    normalized = normalize_hex_color(color)
+    if normalized:
+        return normalized
     
     if color in COLOR_OPTIONS:
         return color
@@ -236,56 +320,487 @@ def validate_color(color):
     return '#000000'
 
 
-def optimize_data(data):
+def read_data(value):
     """
-    Оптимизирует введенные данные для QR-кода.
+    Данные для QR-кода без пробелов по краям.
+    
+    Строка длиннее, чем помещается в любой QR-код, отклоняется сразу, до
+    классификации и сегментации.
     """
-    data = data.strip()
+    from capacity import MAX_DATA_CHARS
     
-    # Проверяем на email
-    if '@' in data and '.' in data and not data.startswith('mailto:'):
-        if ' ' not in data and not data.startswith('http'):
-            return f'mailto:{data}'
+    data = str(value or '').strip()
+    if len(data) > MAX_DATA_CHARS:
+        raise RenderTooLarge(DATA_TOO_LONG_MESSAGE)
+    return data
+
+
+def check_option_types(options,
+                       fields=('size', 'color', 'error_correction', 'format')):
+    """
+    Сообщение об ошибке, если параметр генерации передан не строкой, или None.
+    """
+    for field in fields:
+        value = options.get(field)
+        if value is not None and not isinstance(value, str):
+            return f'{field} must be a string'
+    return None
+
+
+def parse_api_options(options):
+    """
+    Нормализует параметры генерации из JSON-запроса API.
     
-    # Проверяем на телефон
-    phone_pattern = r'^[\d\s\-\+\(\)]+$'
-    if re.match(phone_pattern, data) and len(data.replace(' ', '')) >= 10:
-        if not data.startswith('tel:'):
-            cleaned = re.sub(r'[^\d\+]', '', data)
-            return f'tel:{cleaned}'
+    Данные возвращаются классифицированными (Payload): исходная строка в
+    ``source`` кодируется как есть, ``kind`` идет в info ответа.
+    """
+    data = read_data(options.get('data'))
+    size_id = options.get('size', 'm')
+    color = validate_color(options.get('color', '#000000'))
+    error_correction = options.get('error_correction', 'M')
     
-    # Проверяем на URL
-    if not data.startswith(('http://', 'https://', 'mailto:', 'tel:')):
-        url_pattern = r'^[a-zA-Z0-9-]+\.[a-zA-Z]{2,}'
-        if re.match(url_pattern, data):
-            return f'https://{data}'
+    selected_size = next(
+        (s for s in SIZE_OPTIONS if s['id'] == size_id),
+        SIZE_OPTIONS[2]
+    )
+    if error_correction not in ERROR_CORRECTION_LEVELS:
+        error_correction = 'M'
     
-    return data
+    return classify(data), selected_size, color, error_correction
+
+
+def get_api_info(payload, selected_size, color, error_correction, body=None,
+                 meta=None):
+    """
+    Информация о QR-коде для ответа API; ``payload`` - из parse_api_options.
+    """
+    info = {
+        'data_length': len(payload.source),
+        'size': selected_size['name'],
+        'color': color,
+        'error_correction': ERROR_CORRECTION_LEVELS[error_correction]['name'],
+        'type': payload.kind
+    }
+    if body is not None:
+        info['bytes'] = len(body)
+    if meta is not None:
+        info['version'] = meta['version']
+        info['overflow'] = meta['overflow']
+        info['segments'] = meta.get('segments', [])
+        info['capacity'] = meta['capacity']
+    return info
+
+
+def get_matrix_info(body, meta, selected_size):
+    """
+    Матрица модулей для ответа API: версия, маска, число модулей на
+    сторону, рекомендуемая рамка пресета и модули в base64.
+    
+    Модули без рамки идут построчно, модуль (i, j) - бит i * n + j со
+    старшего бита байта (1 - темный).
+    """
+    return {
+        'version': meta['version'],
+        'mask': meta['mask'],
+        'modules_count': meta['modules_count'],
+        'border': selected_size['border'],
+        'encoding': 'base64',
+        'modules': base64.b64encode(body).decode()
+    }
+
+
+def admit(endpoint, renders, inline=False, check_size=True):
+    """
+    Допускает рендеры запроса до построения QR-кодов.
+    
+    renders - кортежи (данные, пресет размера, уровень коррекции, формат).
+    С check_size данные, которые заведомо не помещаются в версию 40, и
+    рендеры дороже RENDER_MEMORY_BUDGET отклоняются с RenderTooLarge
+    (ответ 413); inline - ответ содержит изображение в base64. Затем
+    стоимость списывается с бакета клиента, при нехватке токенов
+    выбрасывается RateLimited (ответ 429), а запрос дороже всего бакета -
+    RenderTooLarge.
+    """
+    from capacity import may_fit
+    
+    metrics = services().metrics
+    rate_limiter = services().rate_limiter
+    
+    budget = current_app.config['RENDER_MEMORY_BUDGET']
+    cost = 0
+    for data, selected_size, error_correction, fmt in renders:
+        nbytes = len(data.encode('utf-8'))
+        # Матрица не растеризуется, ее стоимость - только кодирование
+        box_size = 0 if fmt == MATRIX_FORMAT else selected_size['box_size']
+        const = ERROR_CORRECTION_LEVELS[error_correction]['const']
+        if check_size and not may_fit(data, const):
+            metrics.inc('qr_render_rejected_total', endpoint, 'capacity')
+            raise RenderTooLarge(DATA_TOO_LONG_MESSAGE)
+        if check_size and budget and estimate_render_memory(
+            nbytes, selected_size, const, fmt,
+            services().render_settings['renderer'], inline
+        ) > budget:
+            metrics.inc('qr_render_rejected_total', endpoint, 'memory')
+            raise RenderTooLarge(
+                'QR-код слишком большой для выбранного размера и формата, '
+                'выберите меньший размер'
+            )
+        cost += estimate_cost(nbytes, box_size, const)
+    
+    if rate_limiter is None:
+        return
+    try:
+        rate_limiter.acquire(get_client_key(), cost)
+    except RateLimited:
+        metrics.inc('qr_rate_limited_total', endpoint)
+        raise
+
+
+def get_client_key():
+    """
+    Ключ бакета клиента текущего запроса.
+    """
+    return client_key(
+        request.headers.get('X-API-Key'), request.remote_addr,
+        current_app.config['API_KEYS']
+    )
+
+
+def get_png_options(size_id):
+    """
+    Параметры сжатия PNG для пресета размера.
+    """
+    compression = services().render_settings['png_compression']
+    return compression.get(size_id, compression['default'])
+
+
+def make_qr(data, error_correction_info, **options):
+    """
+    Кодирует данные в QR-код минимальной версии.
+    
+    Данные разбиваются на сегменты разных режимов (цифры, буквенно-цифровой,
+    байты, кандзи) так, чтобы версия была минимальной, а данные сверх
+    версии 40 отклоняются сразу с RenderTooLarge. options - аргументы
+    QRCode (box_size, border). Возвращает QR-код и сегменты.
+    """
+    import qrcode
+    
+    import encoder
+    from segments import optimize_segments
+    
+    qr = qrcode.QRCode(error_correction=error_correction_info['const'], **options)
+    try:
+        segments, version = optimize_segments(data, qr.error_correction)
+    except qrcode.exceptions.DataOverflowError:
+        # may_fit пропускает данные у самого предела версии 40
+        raise RenderTooLarge(DATA_TOO_LONG_MESSAGE) from None
+    for segment in segments:
+        qr.add_data(segment)
+    
+    qr.version = version
+    encoder.make(qr, services().render_settings['encoder'])
+    return qr, segments
 
 
-@app.route('/', methods=['GET', 'POST'])
+def get_encoded_meta(qr, segments):
+    """
+    Метаданные QR-кода, не зависящие от пресета размера.
+    """
+    from capacity import required_bits
+    from segments import describe_segments
+    
+    return {
+        'version': qr.version,
+        'mask': qr.mask_pattern,
+        'segments': describe_segments(segments),
+        'modules_count': qr.modules_count,
+        'required_bits': required_bits(qr.data_list),
+    }
+
+
+def get_render_meta(encoded, selected_size, error_correction_info):
+    """
+    Метаданные рендера для пресета: превышение max_version пресета
+    (флаг overflow) и остаток емкости до него.
+    """
+    from capacity import get_capacity_info
+    
+    meta = {k: v for k, v in encoded.items() if k != 'required_bits'}
+    meta['overflow'] = encoded['version'] > selected_size['max_version']
+    meta['capacity'] = get_capacity_info(
+        encoded['required_bits'], error_correction_info['const'],
+        selected_size['max_version']
+    )
+    return meta
+
+
+def build_qr(data, selected_size, error_correction_info):
+    """
+    Кодирует данные в QR-код пресета и возвращает его вместе с
+    метаданными рендера (без кэша матриц).
+    """
+    qr, segments = make_qr(
+        data, error_correction_info,
+        box_size=selected_size['box_size'],
+        border=selected_size['border']
+    )
+    return qr, get_render_meta(
+        get_encoded_meta(qr, segments), selected_size, error_correction_info
+    )
+
+
+def encode_qr(data, error_level):
+    """
+    Матрица QR-кода без рамки, упакованная encoder.pack_modules, и
+    метаданные, не зависящие от пресета.
+    
+    Сегментация, Reed-Solomon и выбор маски выполняются один раз на пару
+    (данные, уровень коррекции): запись лежит в matrix_cache, и все
+    размеры, цвета и форматы этого QR-кода строятся из нее.
+    """
+    from encoder import pack_modules
+    
+    def encode():
+        started = time.perf_counter()
+        qr, segments = make_qr(data, ERROR_CORRECTION_LEVELS[error_level])
+        packed = pack_modules(qr.modules)
+        services().metrics.observe(
+            'make', time.perf_counter() - started,
+            error_level=error_level, version=qr.version
+        )
+        return packed, get_encoded_meta(qr, segments)
+    
+    return services().matrix_cache.get_or_render(
+        make_cache_key('encoded', data, error_level), encode
+    )
+
+
+def render_qr_image(data, selected_size, color, error_level, fmt='png'):
+    """
+    Генерирует QR-код в выбранном формате и возвращает байты и метаданные.
+    
+    Матрица берется из encode_qr, здесь только растеризация или векторный
+    вывод для пресета и цвета.
+    """
+    from encoder import unpack_modules
+    from rasterizer import encode_matrix_png, encode_png, rasterize
+    from vector import render_pdf, render_svg
+    
+    encode_stats = services().encode_stats
+    metrics = services().metrics
+    
+    labels = {'size': selected_size['id'], 'error_level': error_level, 'fmt': fmt}
+    
+    packed, encoded = encode_qr(data, error_level)
+    meta = get_render_meta(
+        encoded, selected_size, ERROR_CORRECTION_LEVELS[error_level]
+    )
+    labels['version'] = meta['version']
+    if meta['overflow']:
+        metrics.inc('qr_overflow_total', selected_size['id'], error_level)
+    if fmt == MATRIX_FORMAT:
+        return packed, meta
+    
+    matrix = unpack_modules(
+        packed, meta['modules_count'], selected_size['border']
+    )
+    if fmt in ('svg', 'svg-path'):
+        # Векторные форматы строятся прямо из матрицы, без растра
+        with metrics.timed('make_image', **labels):
+            body = render_svg(
+                matrix, selected_size['box_size'], color,
+                single_path=(fmt == 'svg-path')
+            )
+    elif fmt == 'pdf':
+        with metrics.timed('make_image', **labels):
+            body = render_pdf(
+                matrix, selected_size['box_size'], color
+            )
+    elif services().render_settings['renderer'] == 'fast':
+        # PNG пишется построчно прямо из матрицы, без растра в памяти
+        started = time.perf_counter()
+        body = encode_matrix_png(
+            matrix, selected_size['box_size'], color,
+            **get_png_options(selected_size['id'])
+        )
+        elapsed = time.perf_counter() - started
+        encode_stats.record(selected_size['id'], len(body), elapsed)
+        metrics.observe('png_save', elapsed, **labels)
+    else:
+        # Палитровое изображение Pillow с выбранным цветом
+        with metrics.timed('make_image', **labels):
+            qr_img = rasterize(matrix, selected_size['box_size'], color)
+        
+        # Кодируем в 1-битный PNG с палитрой
+        started = time.perf_counter()
+        body = encode_png(qr_img, **get_png_options(selected_size['id']))
+        elapsed = time.perf_counter() - started
+        encode_stats.record(selected_size['id'], len(body), elapsed)
+        metrics.observe('png_save', elapsed, **labels)
+    
+    return body, meta
+
+
+def get_qr_cache_key(fmt, data, selected_size, color, error_level):
+    """
+    Ключ кэша (и ETag) для нормализованных параметров рендера.
+    """
+    return make_cache_key(
+        fmt, data, selected_size['id'], color.lower(), error_level
+    )
+
+
+def not_modified(etag, vary_accept=False):
+    """
+    Ответ 304, если If-None-Match запроса совпадает с ``etag``, иначе None.
+    
+    ETag изображения - ключ кэша рендера, поэтому ревалидация проверяется
+    до admit() и рендера и не тратит токены клиента.
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.cache_control.max_age = 31536000
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    if vary_accept:
+        response.vary.add('Accept')
+    return response
+
+
+def get_qr_image(data, selected_size, color, error_level, fmt='png',
+                 pool=None):
+    """
+    Возвращает QR-код в выбранном формате из кэша или рендерит его.
+    
+    Если передан ``pool``, промах кэша рендерится в ограниченном пуле.
+    """
+    render_cache = services().render_cache
+    
+    key = get_qr_cache_key(fmt, data, selected_size, color, error_level)
+    args = (data, selected_size, color, error_level, fmt)
+    if pool is not None:
+        return render_cache.get_or_render(
+            key, lambda: pool.run(render_qr_image, *args)
+        )
+    return render_cache.get_or_render(key, lambda: render_qr_image(*args))
+
+
+def serve_cached_page(key, render, sources, mimetype='text/html'):
+    """
+    Отдает страницу из кэша страниц с ETag, Last-Modified и сжатием.
+    """
+    page = services().page_cache.get(key, render, sources, mimetype)
+    body, encoding, etag = page.select(
+        lambda name: request.accept_encodings[name]
+    )
+    
+    response = Response(body, mimetype=page.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.last_modified = page.last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['PAGE_CACHE_MAX_AGE']
+    return response.make_conditional(request)
+
+
+def cached_template(name, **context):
+    """
+    Шаблон, который не зависит от запроса, через кэш страниц.
+    """
+    if current_app.config['CSP_NONCE']:
+        # Nonce уникален для каждого ответа, такие страницы не кэшируем
+        return render_template(name, **context)
+    
+    source = os.path.join(current_app.root_path, current_app.template_folder, name)
+    return serve_cached_page(
+        name, lambda: render_template(name, **context), [source]
+    )
+
+
+def cached_static_file(name, mimetype):
+    """
+    Файл из static через кэш страниц.
+    """
+    source = os.path.join(current_app.static_folder, name)
+    if not os.path.isfile(source):
+        abort(404)
+    
+    def read():
+        with open(source, 'rb') as f:
+            return f.read()
+    
+    return serve_cached_page(f'static:{name}', read, [source], mimetype)
+
+
+def get_png_srcset(data, modules_count, color, error_correction, selected_size):
+    """
+    srcset из PNG пресетов крупнее выбранного с плотностью относительно
+    него: встроенное в src изображение остается кандидатом 1x и на
+    обычном экране не запрашивается повторно, а на экранах высокой
+    плотности браузер берет более крупный вариант. Все они строятся из
+    одной закэшированной матрицы.
+    """
+    def width(size):
+        return (modules_count + 2 * size['border']) * size['box_size']
+    
+    return ', '.join(
+        url_for(
+            'main.api_qr_image',
+            fmt='png',
+            data=data,
+            size=size['id'],
+            color=color,
+            error_correction=error_correction
+        ) + f" {round(width(size) / width(selected_size), 2):g}x"
+        for size in SIZE_OPTIONS
+        if width(size) > width(selected_size)
+    ) or None
+
+
+@bp.route('/', methods=['GET', 'POST'])
 def index():
     """
     Главная страница с генератором QR-кодов.
     """
+    render_pool = services().render_pool
+    metrics = services().metrics
+    
     qr_data_url = None
+    qr_image_url = None
+    qr_srcset = None
     qr_info = None
     form_data = {}
     warning_message = None
     
+    if request.method == 'GET':
+        return cached_template(
+            'index.html',
+            size_options=get_size_options(),
+            color_options=COLOR_OPTIONS,
+            output_formats=OUTPUT_FORMATS,
+            form_data=form_data
+        )
+    
     if request.method == 'POST':
         try:
-            data = request.form.get('data', '').strip()
+            data = read_data(request.form.get('data'))
             if not data:
                 return render_template(
                     'index.html',
-                    size_options=SIZE_OPTIONS,
+                    size_options=get_size_options(),
                     color_options=COLOR_OPTIONS,
+                    output_formats=OUTPUT_FORMATS,
                     error="Пожалуйста, введите данные для QR-кода",
                     form_data=request.form
                 )
             
-            optimized_data = optimize_data(data)
+            with metrics.timed('optimize_data'):
+                payload = classify(data)
+            optimized_data = payload.data
             
             size_id = request.form.get('size', 'm')
             selected_size = next(
@@ -295,75 +810,97 @@ def index():
             
             color = validate_color(request.form.get('color', '#000000'))
             error_correction = request.form.get('error_correction', 'M')
+            output_format = request.form.get('format', 'png')
+            if output_format not in OUTPUT_FORMATS:
+                output_format = 'png'
             
             # Проверяем длину данных
             data_length = len(data)
             max_chars = get_max_chars_for_size(size_id, error_correction)
             
             # Получаем уровень коррекции ошибок
-            error_correction_info = ERROR_CORRECTION_LEVELS.get(
-                error_correction,
-                ERROR_CORRECTION_LEVELS['M']
-            )
+            if error_correction not in ERROR_CORRECTION_LEVELS:
+                error_correction = 'M'
+            error_correction_info = ERROR_CORRECTION_LEVELS[error_correction]
             
-            # Создаем QR-код с цветом
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=error_correction_info['const'],
-                box_size=selected_size['box_size'],
-                border=selected_size['border']
+            renders = [
+                (optimized_data, selected_size, error_correction, output_format)
+            ]
+            if output_format == 'pdf':
+                renders.append(
+                    (optimized_data, selected_size, error_correction, 'svg')
+                )
+            admit('index', renders, inline=True)
+            image_bytes, render_meta = get_qr_image(
+                optimized_data, selected_size, color, error_correction,
+                output_format, pool=render_pool
             )
             
-            qr.add_data(optimized_data)
+            # PDF нельзя показать в <img>, для предпросмотра берем SVG
+            if output_format == 'pdf':
+                preview_format = 'svg'
+                preview_bytes, _ = get_qr_image(
+                    optimized_data, selected_size, color, error_correction,
+                    preview_format, pool=render_pool
+                )
+            else:
+                preview_format = output_format
+                preview_bytes = image_bytes
             
-            try:
-                qr.make(fit=True)
-            except qrcode.exceptions.DataOverflowError:
+            if render_meta['overflow']:
                 warning_message = (
                     f"Внимание: данные ({data_length} символов) могут не "
                     f"поместиться в выбранный размер с уровнем коррекции "
                     f"{error_correction}. Рекомендуется выбрать больший "
                     "размер или более высокий уровень коррекции."
                 )
-                # Пытаемся сгенерировать с автоматическим подбором версии
-                qr = qrcode.QRCode(
-                    version=None,
-                    error_correction=error_correction_info['const'],
-                    box_size=selected_size['box_size'],
-                    border=selected_size['border']
-                )
-                qr.add_data(optimized_data)
-                qr.make(fit=True)
-            
-            # Создаем изображение с выбранным цветом
-            qr_img = qr.make_image(fill_color=color, back_color="white")
-            
-            # Сохраняем в буфер
-            buffer = BytesIO()
-            qr_img.save(buffer, format="PNG")
-            buffer.seek(0)
             
             # Конвертируем в base64 для отображения на странице
-            qr_data_url = (
-                f"data:image/png;base64,"
-                f"{base64.b64encode(buffer.getvalue()).decode()}"
+            with metrics.timed(
+                'base64', selected_size['id'], error_correction,
+                render_meta['version'], preview_format
+            ):
+                qr_data_url = (
+                    f"data:{OUTPUT_FORMATS[preview_format]['mimetype']};base64,"
+                    f"{base64.b64encode(preview_bytes).decode()}"
+                )
+            
+            # Прямая ссылка на изображение для скачивания и шаринга
+            qr_image_url = url_for(
+                'main.api_qr_image',
+                fmt=output_format,
+                data=optimized_data,
+                size=selected_size['id'],
+                color=color,
+                error_correction=error_correction
             )
             
+            if preview_format == 'png':
+                qr_srcset = get_png_srcset(
+                    optimized_data, render_meta['modules_count'], color,
+                    error_correction, selected_size
+                )
+            
             # Информация о QR-коде для отображения
             qr_info = {
                 'data': data,
                 'optimized_data': optimized_data,
+                'payload_type': PAYLOAD_KINDS[payload.kind],
                 'data_length': data_length,
                 'selected_size': selected_size,
                 'color': color,
                 'error_level': error_correction_info['name'],
                 'size_px': (
-                    qr.modules_count * selected_size['box_size'] +
+                    render_meta['modules_count'] * selected_size['box_size'] +
                     2 * selected_size['border'] * selected_size['box_size'],
-                    qr.modules_count * selected_size['box_size'] +
+                    render_meta['modules_count'] * selected_size['box_size'] +
                     2 * selected_size['border'] * selected_size['box_size']
                 ),
-                'version': qr.version,
+                'version': render_meta['version'],
+                'segments': render_meta.get('segments', []),
+                'file_size': len(image_bytes),
+                'capacity': render_meta['capacity'],
+                'format': OUTPUT_FORMATS[output_format],
                 'max_chars': max_chars
             }
             
@@ -372,31 +909,120 @@ def index():
                 'data': data,
                 'size': size_id,
                 'color': color,
-                'error_correction': error_correction
+                'error_correction': error_correction,
+                'format': output_format
             }
             
+        except ADMISSION_ERRORS:
+            raise
         except Exception as e:
             print(f"Error generating QR code: {e}")
+            metrics.inc('qr_render_errors_total', 'index')
             return render_template(
                 'index.html',
-                size_options=SIZE_OPTIONS,
+                size_options=get_size_options(),
                 color_options=COLOR_OPTIONS,
+                output_formats=OUTPUT_FORMATS,
                 error=f"Ошибка при генерации QR-кода: {str(e)}",
                 form_data=request.form
             )
     
+    with metrics.timed('template'):
+        return render_template(
+            'index.html',
+            size_options=get_size_options(),
+            color_options=COLOR_OPTIONS,
+            output_formats=OUTPUT_FORMATS,
+            qr_data_url=qr_data_url,
+            qr_image_url=qr_image_url,
+            qr_srcset=qr_srcset,
+            qr_info=qr_info,
+            form_data=form_data,
+            warning_message=warning_message
+        )
+
+
+@bp.app_errorhandler(PoolSaturated)
+def handle_pool_saturated(error):
+    """
+    Пул рендера перегружен: просим клиента повторить запрос позже.
+    """
+    message = 'Сервер перегружен, повторите попытку через несколько секунд'
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': message})
+    else:
+        response = current_app.make_response(render_template(
+            'index.html',
+            size_options=get_size_options(),
+            color_options=COLOR_OPTIONS,
+            output_formats=OUTPUT_FORMATS,
+            error=message,
+            form_data=request.form
+        ))
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+@bp.app_errorhandler(RateLimited)
+def handle_rate_limited(error):
+    """
+    Клиент исчерпал лимит на рендер QR-кодов.
+    """
+    message = 'Слишком много запросов, повторите попытку позже'
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': message})
+    else:
+        response = current_app.make_response(render_template(
+            'index.html',
+            size_options=get_size_options(),
+            color_options=COLOR_OPTIONS,
+            output_formats=OUTPUT_FORMATS,
+            error=message,
+            form_data=request.form
+        ))
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+@bp.app_errorhandler(RenderTooLarge)
+def handle_render_too_large(error):
+    """
+    Данные или изображение не проходят по емкости либо бюджету памяти.
+    """
+    message = str(error)
+    if request.path.startswith('/api/'):
+        return jsonify({'error': message}), 413
     return render_template(
         'index.html',
-        size_options=SIZE_OPTIONS,
+        size_options=get_size_options(),
         color_options=COLOR_OPTIONS,
-        qr_data_url=qr_data_url,
-        qr_info=qr_info,
-        form_data=form_data,
-        warning_message=warning_message
-    )
+        output_formats=OUTPUT_FORMATS,
+        error=message,
+        form_data=request.form
+    ), 413
 
 
-@app.route('/health')
+@bp.app_errorhandler(RenderTimeout)
+def handle_render_timeout(error):
+    """
+    Рендер не уложился в RENDER_TIMEOUT.
+    """
+    message = 'Генерация QR-кода заняла слишком много времени'
+    if request.path.startswith('/api/'):
+        return jsonify({'error': message}), 503
+    return render_template(
+        'index.html',
+        size_options=get_size_options(),
+        color_options=COLOR_OPTIONS,
+        output_formats=OUTPUT_FORMATS,
+        error=message,
+        form_data=request.form
+    ), 503
+
+
+@bp.route('/health')
 def health_check():
     """
     Эндпоинт для проверки здоровья приложения.
@@ -404,148 +1030,700 @@ def health_check():
     return jsonify({'status': 'healthy', 'service': 'qr-generator'}), 200
 
 
-@app.route('/api/generate', methods=['POST'])
+def generate_matrix(payload, selected_size, color, error_correction):
+    """
+    Ответ /api/generate с format=matrix: матрица вместо изображения.
+    
+    Цвет в рендере матрицы не участвует, поэтому матрицы разных цветов
+    берутся из одной записи кэша; цвет возвращается в info для клиента.
+    """
+    data = payload.source
+    admit(
+        'api_generate',
+        [(data, selected_size, error_correction, MATRIX_FORMAT)]
+    )
+    body, render_meta = get_qr_image(
+        data, selected_size, '#000000', error_correction, MATRIX_FORMAT,
+        pool=services().render_pool
+    )
+    
+    info = get_api_info(
+        payload, selected_size, color, error_correction, body, render_meta
+    )
+    info['format'] = MATRIX_FORMAT
+    
+    return jsonify({
+        'success': True,
+        'matrix': get_matrix_info(body, render_meta, selected_size),
+        'info': info
+    })
+
+
+@bp.route('/api/generate', methods=['POST'])
 def api_generate():
     """
     API endpoint for generating QR codes.
     """
+    metrics = services().metrics
+    
     try:
-        data = request.json.get('data', '').strip()
+        payload, selected_size, color, error_correction = parse_api_options(
+            request.json
+        )
+        data = payload.source
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        size_id = request.json.get('size', 'm')
-        color = validate_color(request.json.get('color', '#000000'))
-        error_correction = request.json.get('error_correction', 'M')
+        output_format = request.json.get('format', 'png')
+        if output_format == MATRIX_FORMAT:
+            return generate_matrix(payload, selected_size, color, error_correction)
+        if output_format not in OUTPUT_FORMATS:
+            return jsonify({'error': f'Unsupported format: {output_format}'}), 400
         
-        selected_size = next(
-            (s for s in SIZE_OPTIONS if s['id'] == size_id),
-            SIZE_OPTIONS[2]
-        )
-        error_correction_info = ERROR_CORRECTION_LEVELS.get(
-            error_correction,
-            ERROR_CORRECTION_LEVELS['M']
+        admit(
+            'api_generate',
+            [(data, selected_size, error_correction, output_format)],
+            inline=True
         )
         
-        # Create QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=error_correction_info['const'],
-            box_size=selected_size['box_size'],
-            border=selected_size['border']
+        # Create QR code (cached by normalized parameters)
+        image_bytes, render_meta = get_qr_image(
+            data, selected_size, color, error_correction, output_format,
+            pool=services().render_pool
         )
         
-        qr.add_data(data)
-        qr.make(fit=True)
-        
-        # Create image
-        qr_img = qr.make_image(fill_color=color, back_color="white")
-        buffer = BytesIO()
-        qr_img.save(buffer, format="PNG")
-        buffer.seek(0)
-        
         # Convert to base64
-        qr_data_url = (
-            f"data:image/png;base64,"
-            f"{base64.b64encode(buffer.getvalue()).decode()}"
+        with metrics.timed(
+            'base64', selected_size['id'], error_correction,
+            render_meta['version'], output_format
+        ):
+            qr_data_url = (
+                f"data:{OUTPUT_FORMATS[output_format]['mimetype']};base64,"
+                f"{base64.b64encode(image_bytes).decode()}"
+            )
+        
+        info = get_api_info(
+            payload, selected_size, color, error_correction, image_bytes,
+            render_meta
         )
+        info['format'] = output_format
         
         return jsonify({
             'success': True,
             'qr_code': qr_data_url,
-            'info': {
-                'data_length': len(data),
-                'size': selected_size['name'],
-                'color': color,
-                'error_correction': error_correction_info['name']
-            }
+            'info': info
         })
         
+    except ADMISSION_ERRORS:
+        raise
+    except Exception as e:
+        metrics.inc('qr_render_errors_total', 'api_generate')
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/generate/variants', methods=['POST'])
+def api_generate_variants():
+    """
+    Несколько вариантов одного QR-кода за один запрос.
+    
+    Данные и уровень коррекции - как у /api/generate, variants - список
+    {size, color, format} (по умолчанию все SIZE_OPTIONS в цвете и формате
+    запроса). Матрица кодируется один раз, для каждого варианта
+    выполняется только растеризация или векторный вывод.
+    """
+    options = request.get_json(silent=True)
+    if not isinstance(options, dict):
+        return jsonify({'error': 'JSON body required'}), 400
+    type_error = check_option_types(options)
+    if type_error:
+        return jsonify({'error': type_error}), 400
+    payload, selected_size, color, error_correction = parse_api_options(options)
+    data = payload.source
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    variants = options.get('variants') or [
+        {'size': size['id']} for size in SIZE_OPTIONS
+    ]
+    max_items = current_app.config['VARIANTS_MAX_ITEMS']
+    if not isinstance(variants, list) or len(variants) > max_items:
+        return jsonify({
+            'error': f'variants must be a list of at most {max_items} items'
+        }), 400
+    
+    renders = []
+    for variant in variants:
+        if not isinstance(variant, dict):
+            return jsonify({'error': 'Each variant must be an object'}), 400
+        type_error = check_option_types(variant, ('size', 'color', 'format'))
+        if type_error:
+            return jsonify({'error': type_error}), 400
+        output_format = variant.get('format', options.get('format', 'png'))
+        if output_format not in OUTPUT_FORMATS:
+            return jsonify({'error': f'Unsupported format: {output_format}'}), 400
+        renders.append((
+            next(
+                (s for s in SIZE_OPTIONS if s['id'] == variant.get('size')),
+                selected_size
+            ),
+            validate_color(variant.get('color', color)),
+            output_format
+        ))
+    
+    admit(
+        'api_generate_variants',
+        [(data, size, error_correction, fmt) for size, _, fmt in renders],
+        inline=True
+    )
+    try:
+        results = []
+        for size, variant_color, output_format in renders:
+            body, render_meta = get_qr_image(
+                data, size, variant_color, error_correction, output_format,
+                pool=services().render_pool
+            )
+            results.append({
+                'size': size['id'],
+                'color': variant_color,
+                'format': output_format,
+                'width': (
+                    (render_meta['modules_count'] + 2 * size['border'])
+                    * size['box_size']
+                ),
+                'bytes': len(body),
+                'qr_code': (
+                    f"data:{OUTPUT_FORMATS[output_format]['mimetype']};base64,"
+                    f"{base64.b64encode(body).decode()}"
+                )
+            })
+        # info - для пресета запроса, а не последнего варианта; матрица
+        # уже в кэше
+        _, encoded = encode_qr(data, error_correction)
+        info = get_api_info(
+            payload, selected_size, color, error_correction,
+            meta=get_render_meta(
+                encoded, selected_size, ERROR_CORRECTION_LEVELS[error_correction]
+            )
+        )
+    except ADMISSION_ERRORS:
+        raise
+    except Exception as e:
+        services().metrics.inc('qr_render_errors_total', 'api_generate_variants')
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({'success': True, 'variants': results, 'info': info})
+
+
+@bp.route('/api/qr', methods=['GET', 'POST'])
+@bp.route('/api/qr.<fmt>', methods=['GET', 'POST'])
+def api_qr_image(fmt=None):
+    """
+    Возвращает изображение QR-кода напрямую, без base64 и JSON.
+    """
+    if fmt is None:
+        mimetype = request.accept_mimetypes.best_match(
+            [f['mimetype'] for f in OUTPUT_FORMATS.values()],
+            OUTPUT_FORMATS['png']['mimetype']
+        )
+        fmt = next(
+            k for k, f in OUTPUT_FORMATS.items() if f['mimetype'] == mimetype
+        )
+    if fmt not in OUTPUT_FORMATS:
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 404
+    
+    options = request.get_json(silent=True) if request.is_json else None
+    payload, selected_size, color, error_correction = parse_api_options(
+        options if isinstance(options, dict) else request.values
+    )
+    data = payload.source
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    etag = get_qr_cache_key(fmt, data, selected_size, color, error_correction)
+    response = not_modified(etag, vary_accept=request.path == '/api/qr')
+    if response is not None:
+        return response
+    
+    admit('api_qr_image', [(data, selected_size, error_correction, fmt)])
+    try:
+        body, _ = get_qr_image(
+            data, selected_size, color, error_correction, fmt,
+            pool=services().render_pool
+        )
+    except ADMISSION_ERRORS:
+        raise
+    except Exception as e:
+        services().metrics.inc('qr_render_errors_total', 'api_qr_image')
+        return jsonify({'error': str(e)}), 500
+    
+    response = send_file(
+        BytesIO(body),
+        mimetype=OUTPUT_FORMATS[fmt]['mimetype'],
+        as_attachment=bool(request.values.get('download')),
+        download_name=f'qr_{selected_size["id"]}.{OUTPUT_FORMATS[fmt]["extension"]}',
+        etag=etag,
+        max_age=31536000,
+        conditional=True
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    if request.path == '/api/qr':
+        response.vary.add('Accept')
+    return response
+
+
+@bp.route('/api/matrix', methods=['GET', 'POST'])
+def api_matrix():
+    """
+    Матрица модулей QR-кода для рендера на клиенте.
+    
+    Параметры те же, что у /api/qr, без цвета. По умолчанию - JSON с
+    версией, маской и модулями в base64 (см. get_matrix_info); с
+    ``encoding=binary`` или ``Accept: application/octet-stream`` - сами
+    упакованные модули (версия 40 - 3917 байт), а версия, маска, число
+    модулей и рамка - в заголовках X-QR-*.
+    """
+    options = request.get_json(silent=True) if request.is_json else None
+    if not isinstance(options, dict):
+        options = request.values
+    payload, selected_size, _, error_correction = parse_api_options(options)
+    data = payload.source
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    binary = options.get('encoding') == 'binary' or (
+        request.accept_mimetypes.best_match(
+            ['application/json', MATRIX_MIMETYPE], 'application/json'
+        ) == MATRIX_MIMETYPE
+    )
+    etag = get_qr_cache_key(
+        MATRIX_FORMAT + ('-binary' if binary else ''), data, selected_size,
+        '#000000', error_correction
+    )
+    response = not_modified(etag, vary_accept=True)
+    if response is not None:
+        return response
+    
+    admit(
+        'api_matrix',
+        [(data, selected_size, error_correction, MATRIX_FORMAT)]
+    )
+    try:
+        body, render_meta = get_qr_image(
+            data, selected_size, '#000000', error_correction, MATRIX_FORMAT,
+            pool=services().render_pool
+        )
+    except ADMISSION_ERRORS:
+        raise
     except Exception as e:
+        services().metrics.inc('qr_render_errors_total', 'api_matrix')
         return jsonify({'error': str(e)}), 500
+    
+    matrix = get_matrix_info(body, render_meta, selected_size)
+    if binary:
+        response = current_app.response_class(body, mimetype=MATRIX_MIMETYPE)
+        response.headers['X-QR-Version'] = str(matrix['version'])
+        response.headers['X-QR-Mask'] = str(matrix['mask'])
+        response.headers['X-QR-Modules'] = str(matrix['modules_count'])
+        response.headers['X-QR-Border'] = str(matrix['border'])
+    else:
+        response = jsonify(matrix)
+    
+    response.set_etag(etag)
+    response.cache_control.max_age = 31536000
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept')
+    return response.make_conditional(request)
+
+
+def render_batch_item(index, item, fmt='png'):
+    """
+    Рендерит один элемент пакета (выполняется в пуле процессов).
+    """
+    result = {'index': index}
+    if item.get('name'):
+        result['name'] = item['name']
+    
+    try:
+        payload, selected_size, color, error_correction = parse_api_options(item)
+        if not payload.source:
+            raise ValueError('No data provided')
+        body, render_meta = get_qr_image(
+            payload.source, selected_size, color, error_correction, fmt
+        )
+    except Exception as e:
+        result.update(success=False, error=str(e))
+        return result
+    
+    result.update(
+        success=True,
+        body=body,
+        info=get_api_info(
+            payload, selected_size, color, error_correction, body, render_meta
+        )
+    )
+    return result
+
+
+def get_job_item_key(item, fmt):
+    """
+    Ключ рендера элемента задания: под ним изображение лежит в хранилище.
+    """
+    payload, selected_size, color, error_correction = parse_api_options(item)
+    if not payload.source:
+        raise ValueError('No data provided')
+    return get_qr_cache_key(
+        fmt, payload.source, selected_size, color, error_correction
+    )
+
+
+def get_batch_pool(app):
+    """
+    Пул процессов пакетного рендера приложения, создается при первом вызове.
+    
+    Приложение Flask не передается в процессы пула: каждый процесс
+    создает свое с той же конфигурацией (init_batch_worker) и держит
+    открытым его контекст, поэтому render_batch_item в нем берет сервисы
+    этого приложения.
+    """
+    qr = app.extensions[EXTENSION_KEY]
+    with qr.lock:
+        if qr.batch_pool is None:
+            qr.batch_pool = create_process_pool(
+                app.config['BATCH_WORKERS'] or os.cpu_count(),
+                initializer=init_batch_worker, initargs=(qr.config_name,)
+            )
+    return qr.batch_pool
+
+
+def init_batch_worker(config_name):
+    """
+    Инициализатор процесса пакетного рендера: приложение с модулями
+    рендера, но без прогрева.
+    """
+    create_app(config_name, preload=True, warmup=False).app_context().push()
+
+
+def charge_item(client, item, fmt, endpoint):
+    """
+    Списывает стоимость элемента пакета или задания с бакета клиента.
+    Возвращает 0 или число секунд, через которое токенов хватит;
+    элемент дороже RATE_LIMIT_BURST завершается ошибкой RenderTooLarge.
+    """
+    rate_limiter = services().rate_limiter
+    
+    if rate_limiter is None or client is None:
+        return 0
+    payload, selected_size, _, error_correction = parse_api_options(item)
+    box_size = 0 if fmt == MATRIX_FORMAT else selected_size['box_size']
+    const = ERROR_CORRECTION_LEVELS[error_correction]['const']
+    try:
+        rate_limiter.acquire(
+            client,
+            estimate_cost(len(payload.source.encode('utf-8')), box_size, const)
+        )
+    except RateLimited as e:
+        services().metrics.inc('qr_rate_limited_total', endpoint)
+        return e.retry_after
+    return 0
+
+
+@bp.route('/api/generate/batch', methods=['POST'])
+def api_generate_batch():
+    """
+    Пакетная генерация QR-кодов с потоковой выдачей ZIP или NDJSON.
+    """
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            items = parse_batch_items(upload=upload)
+            output = request.form.get('format')
+        else:
+            payload = request.get_json(silent=True)
+            items = parse_batch_items(payload)
+            output = payload.get('format') if isinstance(payload, dict) else None
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    output = output or request.args.get('format', 'zip')
+    if output not in BATCH_FORMATS:
+        return jsonify({'error': f'Unsupported format: {output}'}), 400
+    if not items:
+        return jsonify({'error': 'No items provided'}), 400
+    if len(items) > current_app.config['BATCH_MAX_ITEMS']:
+        return jsonify({
+            'error': f"Too many items (max {current_app.config['BATCH_MAX_ITEMS']})"
+        }), 413
+    
+    # Элементы оплачиваются по одному по мере отправки в пул, как в
+    # JobRunner: без токенов выдача ждет пополнения бакета. Первый
+    # элемент оплачивается до ответа, и клиент без токенов сразу получает
+    # 429; слишком большие элементы получают ошибку в своем результате
+    app = current_app._get_current_object()
+    client = get_client_key()
+    paid = None
+    for index, item in enumerate(items):
+        try:
+            item_payload, selected_size, _, error_correction = parse_api_options(
+                item
+            )
+        except RenderTooLarge:
+            continue
+        admit(
+            'api_generate_batch',
+            [(item_payload.source, selected_size, error_correction, 'png')],
+            check_size=False
+        )
+        paid = index
+        break
+    
+    def charge(index, item):
+        if index == paid:
+            return
+        # Выдача идет после завершения запроса
+        with app.app_context():
+            delay = charge_item(client, item, 'png', 'api_generate_batch')
+            while delay:
+                time.sleep(delay)
+                delay = charge_item(client, item, 'png', 'api_generate_batch')
+    
+    workers = current_app.config['BATCH_WORKERS'] or os.cpu_count()
+    results = iter_results(
+        get_batch_pool(app), render_batch_item, items, window=workers * 4,
+        before_submit=charge if services().rate_limiter is not None else None
+    )
+    
+    if output == 'ndjson':
+        body = stream_ndjson(
+            results,
+            lambda png: f"data:image/png;base64,{base64.b64encode(png).decode()}"
+        )
+        return Response(body, mimetype='application/x-ndjson')
+    
+    return Response(
+        stream_zip(results),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename=qr_codes.zip'}
+    )
+
+
+@bp.route('/api/jobs', methods=['POST'])
+def api_create_job():
+    """
+    Ставит пакетную генерацию в фоновую очередь и сразу возвращает задание.
+    
+    Элементы те же, что у /api/generate/batch (JSON или CSV/JSONL файл),
+    format - формат изображений, как у /api/generate.
+    """
+    job_runner = services().job_runner
+    
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            items = parse_batch_items(upload=upload)
+            output_format = request.form.get('format')
+        else:
+            payload = request.get_json(silent=True)
+            items = parse_batch_items(payload)
+            output_format = (
+                payload.get('format') if isinstance(payload, dict) else None
+            )
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    output_format = output_format or 'png'
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({'error': f'Unsupported format: {output_format}'}), 400
+    if not items:
+        return jsonify({'error': 'No items provided'}), 400
+    if len(items) > current_app.config['JOBS_MAX_ITEMS']:
+        return jsonify({
+            'error': f"Too many items (max {current_app.config['JOBS_MAX_ITEMS']})"
+        }), 413
+    
+    # Элементы списываются с бакета клиента по мере рендера: большое
+    # задание не отклоняется, а выполняется со скоростью лимита клиента
+    job_id = services().job_store.create(
+        items, output_format,
+        client=None if services().rate_limiter is None else get_client_key()
+    )
+    job_runner.ensure_started()
+    job_runner.wake()
+    
+    response = jsonify(get_job_info(job_id))
+    response.status_code = 202
+    response.headers['Location'] = url_for('main.api_job_status', job_id=job_id)
+    return response
+
+
+def get_job_info(job_id):
+    """
+    Состояние задания со ссылками на статус и результат.
+    """
+    info = services().job_store.get(job_id)
+    info['status_url'] = url_for('main.api_job_status', job_id=job_id)
+    if info['status'] == 'done':
+        info['result_url'] = url_for('main.api_job_result', job_id=job_id)
+    return info
+
+
+@bp.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """
+    Прогресс задания: обработано, ошибки, скорость и оценка окончания.
+    """
+    services().job_runner.ensure_started()
+    return jsonify(get_job_info(job_id))
+
+
+@bp.route('/api/jobs/<job_id>/result')
+def api_job_result(job_id):
+    """
+    ZIP с изображениями и manifest.ndjson; поддерживает Range-запросы,
+    поэтому прерванную загрузку можно продолжить.
+    """
+    job_store = services().job_store
+    
+    info = job_store.get(job_id)
+    if info['status'] != 'done':
+        return jsonify({
+            'error': 'Job is not finished', 'status': info['status']
+        }), 409
+    return send_file(
+        job_store.result_path(job_id),
+        mimetype='application/zip',
+        as_attachment=True,
+        download_name=f'qr_codes_{job_id}.zip',
+        conditional=True
+    )
+
+
+@bp.app_errorhandler(JobNotFound)
+def handle_job_not_found(error):
+    return jsonify({'error': 'Job not found'}), 404
+
+
+@bp.app_errorhandler(404)
+def handle_not_found(error):
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'Not found'}), 404
+    return render_template('404.html'), 404
+
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """
+    Метрики в текстовом формате Prometheus (по процессу воркера).
+    """
+    metrics = services().metrics
+    
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+@bp.route('/api/cache/stats')
+def api_cache_stats():
+    """
+    Статистика кэша готовых QR-кодов и кэша закодированных матриц.
+    """
+    qr = services()
+    return jsonify({**qr.render_cache.stats(), 'matrix': qr.matrix_cache.stats()})
+
+
+@bp.route('/api/pool/stats')
+def api_pool_stats():
+    """
+    Состояние пула рендера.
+    """
+    return jsonify(services().render_pool.stats())
+
+
+@bp.route('/api/png/stats')
+def api_png_stats():
+    """
+    Средний размер и время кодирования PNG по пресетам размера.
+    """
+    return jsonify(services().encode_stats.snapshot())
 
 
 # Security files
-@app.route('/.well-known/security.txt')
-@app.route('/security.txt')
+@bp.route('/.well-known/security.txt')
+@bp.route('/security.txt')
 def security_txt():
     """
     Возвращает файл security.txt.
     """
-    return send_from_directory('static', 'security.txt'), 200, {
-        'Content-Type': 'text/plain; charset=utf-8'
-    }
+    return cached_static_file('security.txt', 'text/plain')
 
 
 # Policy pages
-@app.route('/privacy-policy')
-@app.route('/privacy')
+@bp.route('/privacy-policy')
+@bp.route('/privacy')
 def privacy_policy():
     """
     Страница политики конфиденциальности.
     """
-    return render_template('privacy-policy.html')
+    return cached_template('privacy-policy.html')
 
 
-@app.route('/terms-of-service')
-@app.route('/terms')
+@bp.route('/terms-of-service')
+@bp.route('/terms')
 def terms_of_service():
     """
     Страница условий использования.
     """
-    return render_template('terms-of-service.html')
+    return cached_template('terms-of-service.html')
 
 
-@app.route('/cookie-policy')
-@app.route('/cookies')
+@bp.route('/cookie-policy')
+@bp.route('/cookies')
 def cookie_policy():
     """
     Страница политики использования cookies.
     """
-    return render_template('cookie-policy.html')
+    return cached_template('cookie-policy.html')
 
 
-@app.route('/dmca-policy')
+@bp.route('/dmca-policy')
 def dmca_policy():
     """
     Страница DMCA политики.
     """
-    return render_template('dmca-policy.html')
+    return cached_template('dmca-policy.html')
 
 
 # Static files
-@app.route('/ads.txt')
+@bp.route('/ads.txt')
 def ads_txt():
     """
     Возвращает ads.txt файл.
     """
-    return send_from_directory('static', 'ads.txt'), 200, {
-        'Content-Type': 'text/plain; charset=utf-8'
-    }
+    return cached_static_file('ads.txt', 'text/plain')
 
 
-@app.route('/robots.txt')
+@bp.route('/robots.txt')
 def robots_txt():
     """
     Возвращает robots.txt файл.
     """
-    return send_from_directory('static', 'robots.txt'), 200, {
-        'Content-Type': 'text/plain; charset=utf-8'
-    }
+    return cached_static_file('robots.txt', 'text/plain')
 
 
-@app.route('/sitemap.xml')
+@bp.route('/sitemap.xml')
 def sitemap_xml():
     """
     Возвращает sitemap.xml файл.
     """
-    return send_from_directory('static', 'sitemap.xml'), 200, {
-        'Content-Type': 'application/xml; charset=utf-8'
-    }
+    return cached_static_file('sitemap.xml', 'application/xml')
 
 
 # Humans.txt (опционально)
-@app.route('/humans.txt')
+@bp.route('/humans.txt')
 def humans_txt():
     """
     Возвращает humans.txt файл.
@@ -554,7 +1732,7 @@ def humans_txt():
         'Content-Type': 'text/plain; charset=utf-8'
     }
 
-@app.route('/yandex_9dec845bb9d3d77e.html')
+@bp.route('/yandex_9dec845bb9d3d77e.html')
 def yandex_verification():
     """Яндекс.Вебмастер подтверждение прав на сайт"""
     return '''
@@ -568,7 +1746,231 @@ def yandex_verification():
 
 
 
+def preload_renderers():
+    """
+    Импортирует модули рендера и строит один QR-код, чтобы таблицы
+    емкости, сегментации и плагины Pillow были загружены заранее.
+    """
+    from rasterizer import encode_matrix_png
+    
+    size = get_size_options()[0]
+    qr, _ = build_qr('preload', size, ERROR_CORRECTION_LEVELS['M'])
+    encode_matrix_png(qr.get_matrix(), size['box_size'], '#000000')
+
+
+def warm_up(app):
+    """
+    Прогрев при создании приложения, чтобы первые запросы после деплоя
+    не были медленнее остальных.
+    
+    Компилирует все шаблоны (с кэшем байткода - читает их с диска),
+    рендерит по одному QR-коду на каждую комбинацию SIZE_OPTIONS ×
+    ERROR_CORRECTION_LEVELS тем же render_qr_image, что и запросы, но без
+    метрик и статистики сжатия, и запрашивает главную страницу, заполняя
+    кэш страниц. Возвращает отчет о времени.
+    """
+    seconds = {}
+    started = time.perf_counter()
+    templates = app.jinja_env.list_templates()
+    for name in templates:
+        app.jinja_env.get_template(name)
+    seconds['templates'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    renders = 0
+    qr = app.extensions[EXTENSION_KEY]
+    app.extensions[EXTENSION_KEY] = SimpleNamespace(**{
+        **vars(qr),
+        'metrics': MetricsRegistry(enabled=False),
+        'encode_stats': EncodeStats(),
+    })
+    try:
+        for size in get_size_options():
+            for level in ERROR_CORRECTION_LEVELS:
+                render_qr_image('warm-up', size, '#000000', level)
+                renders += 1
+        render_qr_image('warm-up', size, '#000000', level, 'svg')
+    finally:
+        app.extensions[EXTENSION_KEY] = qr
+    seconds['renders'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    app.test_client().get('/')
+    seconds['pages'] = time.perf_counter() - started
+    
+    seconds['total'] = sum(seconds.values())
+    report = {'templates': len(templates), 'renders': renders, 'seconds': seconds}
+    app.logger.info(
+        'Warm-up: %d templates, %d renders in %.0f ms',
+        report['templates'], renders, seconds['total'] * 1000
+    )
+    return report
+
+
+def create_app(config_name=None, preload=None, warmup=None):
+    """
+    Создает приложение с конфигурацией из config.py.
+    
+    config_name - ключ словаря config.config (по умолчанию FLASK_CONFIG,
+    затем FLASK_ENV, затем 'default'). С preload=True (по умолчанию
+    PRELOAD_RENDERERS) модули рендера загружаются сразу: при preload_app
+    в gunicorn это происходит один раз в мастере, и воркеры делят память
+    через copy-on-write. Без предзагрузки qrcode и Pillow импортируются
+    при первом рендере. warmup (по умолчанию WARMUP) - прогрев warm_up().
+    """
+    config_name = (
+        config_name or os.environ.get('FLASK_CONFIG')
+        or os.environ.get('FLASK_ENV') or 'default'
+    )
+    app = Flask(__name__)
+    app.config.from_object(config.get(config_name, config['default']))
+    if not app.config['SECRET_KEY']:
+        app.config['SECRET_KEY'] = secrets.token_hex(32)
+    for key, choices in (('QR_RENDERER', RENDERERS), ('QR_ENCODER', ENCODERS)):
+        if app.config[key] not in choices:
+            raise ValueError(
+                f"{key} must be one of {', '.join(choices)}, "
+                f"got {app.config[key]!r}"
+            )
+    if app.config['PROXY_FIX_HOPS']:
+        # Адрес клиента (и ключ лимита) из X-Forwarded-For своих прокси
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        
+        hops = app.config['PROXY_FIX_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    
+    render_cache = RenderCache(
+        max_entries=app.config['RENDER_CACHE_MAX_ENTRIES'],
+        max_bytes=app.config['RENDER_CACHE_MAX_BYTES'],
+        ttl=app.config['RENDER_CACHE_TTL'],
+        backend=(
+            SqliteCacheBackend(
+                app.config['RENDER_CACHE_PATH'],
+                ttl=app.config['RENDER_CACHE_TTL']
+            )
+            if app.config['RENDER_CACHE_PATH'] else None
+        )
+    )
+    matrix_cache = RenderCache(
+        max_entries=app.config['MATRIX_CACHE_MAX_ENTRIES'],
+        max_bytes=app.config['MATRIX_CACHE_MAX_BYTES'],
+        ttl=app.config['RENDER_CACHE_TTL']
+    )
+    encode_stats = EncodeStats()
+    render_pool = RenderPool(
+        max_workers=app.config['RENDER_POOL_WORKERS'],
+        max_queue=app.config['RENDER_POOL_QUEUE'],
+        timeout=app.config['RENDER_TIMEOUT']
+    )
+    header_profiles = HeaderProfiles(
+        app.config['CSP'],
+        csp_nonce=app.config['CSP_NONCE'],
+        hsts=app.config['HSTS']
+    )
+    page_cache = PageCache(
+        check_interval=app.config['PAGE_CACHE_CHECK_INTERVAL']
+    )
+    rate_limiter = None
+    if app.config['RATE_LIMIT_ENABLED']:
+        rate_limiter = RateLimiter(
+            rate=app.config['RATE_LIMIT_RATE'],
+            burst=app.config['RATE_LIMIT_BURST'],
+            backend=(
+                SharedBucketBackend(app.config['RATE_LIMIT_PATH'])
+                if app.config['RATE_LIMIT_PATH'] else LocalBucketBackend()
+            )
+        )
+    job_store = JobStore(
+        app.config['JOBS_DIR'] or os.path.join(app.instance_path, 'jobs'),
+        lease=app.config['JOBS_LEASE'],
+        ttl=app.config['JOBS_RESULT_TTL'] or None
+    )
+    
+    def charge(client, item, fmt):
+        # Поток заданий работает вне запроса
+        with app.app_context():
+            return charge_item(client, item, fmt, 'api_jobs')
+    
+    job_runner = JobRunner(
+        job_store,
+        render_item=render_batch_item,
+        item_key=get_job_item_key,
+        get_pool=lambda: get_batch_pool(app),
+        extensions={k: f['extension'] for k, f in OUTPUT_FORMATS.items()},
+        chunk_size=app.config['JOBS_CHUNK_SIZE'],
+        charge=charge
+    )
+    
+    metrics = MetricsRegistry(enabled=app.config['METRICS_ENABLED'])
+    metrics.counter(
+        'qr_overflow_total',
+        'Renders whose version exceeded the size preset max_version',
+        ('size', 'error_level')
+    )
+    metrics.counter(
+        'qr_render_errors_total', 'Failed QR renders by endpoint',
+        ('endpoint',)
+    )
+    metrics.counter(
+        'qr_render_rejected_total',
+        'Requests rejected before rendering as too large',
+        ('endpoint', 'reason')
+    )
+    metrics.counter(
+        'qr_rate_limited_total', 'Requests rejected by the rate limiter',
+        ('endpoint',)
+    )
+    metrics.register_collector(collect_runtime_metrics)
+    
+    app.extensions[EXTENSION_KEY] = SimpleNamespace(
+        render_cache=render_cache,
+        matrix_cache=matrix_cache,
+        encode_stats=encode_stats,
+        render_pool=render_pool,
+        header_profiles=header_profiles,
+        page_cache=page_cache,
+        metrics=metrics,
+        rate_limiter=rate_limiter,
+        job_store=job_store,
+        job_runner=job_runner,
+        render_settings={
+            'renderer': app.config['QR_RENDERER'],
+            'encoder': app.config['QR_ENCODER'],
+            'png_compression': app.config['PNG_COMPRESSION'],
+        },
+        warmup_report={},
+        config_name=config_name,
+        batch_pool=None,
+        lock=threading.Lock()
+    )
+    
+    if app.config['JINJA_BYTECODE_CACHE']:
+        from jinja2 import FileSystemBytecodeCache
+        
+        cache_dir = (
+            app.config['JINJA_CACHE_DIR']
+            or os.path.join(app.instance_path, 'jinja')
+        )
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            print(f"Jinja bytecode cache disabled: {e}")
+        else:
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    
+    app.register_blueprint(bp)
+    
+    with app.app_context():
+        if app.config['PRELOAD_RENDERERS'] if preload is None else preload:
+            preload_renderers()
+        if app.config['WARMUP'] if warmup is None else warmup:
+            services().warmup_report.update(warm_up(app))
+    
+    return app
+
+
 if __name__ == '__main__':
+    app = create_app()
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV', 'development') == 'development'
     
@@ -578,4 +1980,4 @@ if __name__ == '__main__':
         port=port,
         debug=debug,
         use_reloader=debug
-    )
\ No newline at end of file
+    )
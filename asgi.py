@@ -0,0 +1,229 @@
+"""
+ASGI-точка входа.
+
+Запуск:
+    uvicorn asgi:application --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+
+Цикл событий не блокируется: каждый запрос Flask обрабатывается в пуле
+потоков адаптера, а кодирование QR-кодов внутри него ограничено пулом
+рендера (RENDER_POOL_WORKERS/RENDER_POOL_QUEUE) с ответом 429 при
+перегрузке и таймаутом RENDER_TIMEOUT.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from io import BytesIO
+
+from app import create_app
+
+_STREAM_END = object()
+
+# Как часто поток, ждущий места в очереди ответа, проверяет отмену
+_POLL_INTERVAL = 0.5
+
+
+class ClientDisconnected(Exception):
+    """
+    Клиент отключился или не читал ответ дольше send_timeout.
+    """
+
+
+class WsgiToAsgi:
+    """
+    Минимальный адаптер WSGI-приложения к протоколу ASGI (только HTTP).
+
+    Если клиент отключился (http.disconnect или ошибка send), поток
+    приложения перестает отдавать тело и закрывает WSGI-итератор; поток,
+    который не может отдать часть ответа дольше ``send_timeout`` секунд,
+    тоже сдается и освобождается.
+    """
+
+    def __init__(self, wsgi_app, max_threads=64, max_body=None, send_timeout=60):
+        self.wsgi_app = wsgi_app
+        # Под тем же именем, что у ProxyFix и других оберток werkzeug:
+        # хуки gunicorn получают приложение Flask через worker.wsgi.app
+        self.app = wsgi_app
+        self.max_body = max_body
+        self.send_timeout = send_timeout
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_threads, thread_name_prefix='wsgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise RuntimeError(f"Unsupported scope type: {scope['type']}")
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if self.max_body and len(body) > self.max_body:
+                await send({'type': 'http.response.start', 'status': 413,
+                            'headers': [(b'content-type', b'text/plain')]})
+                await send({'type': 'http.response.body',
+                            'body': b'Request Entity Too Large'})
+                return
+            if not message.get('more_body'):
+                break
+
+        loop = asyncio.get_running_loop()
+        # Ограниченная очередь дает обратное давление потоку, который
+        # отдает тело ответа, если клиент читает медленно
+        queue = asyncio.Queue(maxsize=8)
+        cancelled = threading.Event()
+
+        def put(item):
+            if cancelled.is_set():
+                raise ClientDisconnected()
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            deadline = time.monotonic() + self.send_timeout
+            while True:
+                try:
+                    return future.result(timeout=_POLL_INTERVAL)
+                except FutureTimeoutError:
+                    if cancelled.is_set() or time.monotonic() > deadline:
+                        future.cancel()
+                        raise ClientDisconnected() from None
+
+        loop.run_in_executor(
+            self.executor, self._run_wsgi, scope, bytes(body), put
+        )
+
+        disconnect = asyncio.ensure_future(self._wait_disconnect(receive))
+        try:
+            while True:
+                get = asyncio.ensure_future(queue.get())
+                await asyncio.wait(
+                    (get, disconnect), return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnect.done():
+                    get.cancel()
+                    return
+                item = get.result()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                await send(item)
+        finally:
+            # Ответ отдан, клиент ушел или send упал: поток приложения
+            # больше не ждет места в очереди
+            cancelled.set()
+            disconnect.cancel()
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _run_wsgi(self, scope, body, put):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        try:
+            try:
+                result = self.wsgi_app(self._environ(scope, body), start_response)
+                try:
+                    header_sent = False
+                    for chunk in result:
+                        if not header_sent:
+                            put(self._start_message(started))
+                            header_sent = True
+                        if chunk:
+                            put({
+                                'type': 'http.response.body',
+                                'body': chunk,
+                                'more_body': True
+                            })
+                    if not header_sent:
+                        put(self._start_message(started))
+                    put({'type': 'http.response.body', 'body': b''})
+                finally:
+                    # Закрывает генераторы ответа и при отключении клиента
+                    if hasattr(result, 'close'):
+                        result.close()
+            except ClientDisconnected:
+                raise
+            except BaseException as e:
+                put(e)
+                return
+            put(_STREAM_END)
+        except ClientDisconnected:
+            pass
+
+    @staticmethod
+    def _start_message(started):
+        return {
+            'type': 'http.response.start',
+            'status': started['status'],
+            'headers': started['headers']
+        }
+
+    @staticmethod
+    def _environ(scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+
+app = create_app()
+application = WsgiToAsgi(
+    app,
+    max_threads=int(os.environ.get('ASGI_THREADS', 64)),
+    max_body=app.config['MAX_CONTENT_LENGTH']
+)
@@ -0,0 +1,176 @@
+import csv
+import io
+import json
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+
+from werkzeug.utils import secure_filename
+
+BATCH_FORMATS = ('zip', 'ndjson')
+BATCH_FIELDS = ('data', 'size', 'color', 'error_correction', 'name')
+
+class BatchError(ValueError):
+    """
+    Ошибка во входных данных пакетной генерации.
+    """
+
+
+def create_process_pool(max_workers=None, initializer=None, initargs=()):
+    """
+    Создает пул процессов для рендера; initializer выполняется в каждом
+    процессе пула при его запуске.
+
+    Процессы запускаются через spawn: пул создается в многопоточном
+    воркере, и форк унаследовал бы захваченные другими потоками
+    блокировки (кэша, лимитов, sqlite). Поэтому initializer и initargs
+    должны быть сериализуемыми.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count(),
+        mp_context=get_context('spawn'),
+        initializer=initializer, initargs=initargs
+    )
+
+
+def parse_batch_items(payload=None, upload=None):
+    """
+    Разбирает элементы пакета из JSON-тела или загруженного CSV/JSONL файла.
+    """
+    if upload is not None:
+        text = io.TextIOWrapper(upload.stream, encoding='utf-8-sig')
+        filename = (upload.filename or '').lower()
+        if filename.endswith(('.jsonl', '.ndjson')) or \
+                upload.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            items = []
+            for line_no, line in enumerate(text, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    raise BatchError(f'Invalid JSON on line {line_no}')
+        else:
+            items = list(csv.DictReader(text))
+    elif isinstance(payload, list):
+        items = payload
+    elif isinstance(payload, dict):
+        items = payload.get('items')
+    else:
+        items = None
+
+    if not isinstance(items, list):
+        raise BatchError('No items provided')
+
+    normalized = []
+    for item in items:
+        if isinstance(item, str):
+            item = {'data': item}
+        if not isinstance(item, dict):
+            raise BatchError('Each item must be an object or a string')
+        normalized.append({
+            field: item[field] for field in BATCH_FIELDS
+            if item.get(field) is not None
+        })
+    return normalized
+
+
+def iter_results(pool, func, items, window, before_submit=None):
+    """
+    Отдает результаты ``func(item)`` по порядку, держа в работе не более
+    ``window`` элементов, чтобы память не росла с размером пакета.
+
+    ``before_submit(index, item)`` вызывается перед отправкой элемента в
+    пул и может ждать (например, пополнения бакета клиента); если он
+    выбрасывает исключение, элемент не рендерится и получает ошибку.
+    """
+    pending = deque()
+    for index, item in enumerate(items):
+        if before_submit is not None:
+            try:
+                before_submit(index, item)
+            except Exception as e:
+                result = {'index': index}
+                if item.get('name'):
+                    result['name'] = item['name']
+                result.update(success=False, error=str(e))
+                future = Future()
+                future.set_result(result)
+                pending.append(future)
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+                continue
+        pending.append(pool.submit(func, index, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def item_filename(result, extension='png'):
+    """
+    Имя файла элемента внутри архива.
+    """
+    name = secure_filename(result.get('name') or '')
+    if name:
+        return f'{result["index"]:06d}_{name}.{extension}'
+    return f'{result["index"]:06d}.{extension}'
+
+
+class _ChunkBuffer:
+    """
+    Поток только для записи, из которого можно забирать накопленные байты.
+
+    Отсутствие ``tell()``/``seek()`` переводит ``zipfile`` в потоковый режим.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(results):
+    """
+    Упаковывает результаты в ZIP, отдавая архив по частям.
+
+    Ошибки и метаданные элементов пишутся в manifest.ndjson в конце архива.
+    """
+    buffer = _ChunkBuffer()
+    manifest = []
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for result in results:
+            body = result.pop('body', None)
+            if body is not None:
+                result['file'] = item_filename(result)
+                archive.writestr(result['file'], body)
+            manifest.append(json.dumps(result, ensure_ascii=False))
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+        archive.writestr('manifest.ndjson', '\n'.join(manifest) + '\n')
+    yield buffer.drain()
+
+
+def stream_ndjson(results, encode_body):
+    """
+    Отдает результаты построчно в формате NDJSON.
+    """
+    for result in results:
+        body = result.pop('body', None)
+        if body is not None:
+            result['qr_code'] = encode_body(body)
+        yield json.dumps(result, ensure_ascii=False) + '\n'
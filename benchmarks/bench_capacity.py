@@ -0,0 +1,122 @@
+"""
+Сравнение подбора версии по таблице емкости с пробным кодированием qrcode.
+
+Для каждой комбинации SIZE_OPTIONS × ERROR_CORRECTION_LEVELS берет данные
+у предела max_version пресета и чуть сверх версии 40, затем замеряет:
+  - fit: только подбор версии (QRCode.best_fit против find_min_version);
+  - total: старый путь index() (version=1, make(fit=True), при ошибке
+    повторная сборка с version=None) против build_qr().
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_capacity [--repeat N]
+"""
+import argparse
+import time
+from bisect import bisect_left
+
+import qrcode
+
+from app import ERROR_CORRECTION_LEVELS, SIZE_OPTIONS, build_qr, create_app
+from capacity import DATA_BITS, VERSION_CLASSES, max_chars, required_bits
+from rate_limit import RenderTooLarge
+
+
+def find_min_version(data_list, error_correction):
+    """
+    Находит минимальную версию для сегментов бинарным поиском по таблице.
+
+    Возвращает версию и количество занятых бит. Если данные не помещаются
+    даже в версию 40, бросает ``DataOverflowError`` без кодирования.
+    """
+    limits = DATA_BITS[error_correction]
+    for (low, high), bits in zip(VERSION_CLASSES, required_bits(data_list)):
+        version = bisect_left(limits, bits, low, high + 1)
+        if version <= high:
+            return version, bits
+
+    raise qrcode.exceptions.DataOverflowError(
+        'Данные не помещаются в QR-код даже максимальной версии 40'
+    )
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            func()
+        except (ValueError, qrcode.exceptions.DataOverflowError, RenderTooLarge):
+            # build_qr отклоняет данные сверх версии 40 с RenderTooLarge
+            pass
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def legacy_build(data, size, error_const):
+    """
+    Подбор версии так, как это делал index() до таблицы емкости.
+    """
+    def make(version):
+        qr = qrcode.QRCode(
+            version=version,
+            error_correction=error_const,
+            box_size=size['box_size'],
+            border=size['border']
+        )
+        qr.add_data(data)
+        qr.make(fit=True)
+        return qr
+
+    try:
+        return make(1)
+    except (ValueError, qrcode.exceptions.DataOverflowError):
+        return make(None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    # build_qr берет кодировщик из настроек приложения
+    create_app().app_context().push()
+
+    print(
+        f"{'size':<4} {'ec':<2} {'payload':<8} "
+        f"{'fit old, us':>12} {'fit new, us':>12} "
+        f"{'total old, ms':>14} {'total new, ms':>14}"
+    )
+    for size in SIZE_OPTIONS:
+        for level, info in ERROR_CORRECTION_LEVELS.items():
+            const = info['const']
+            payloads = {
+                'limit': 'x' * max_chars(const, size['max_version']),
+                'over40': 'x' * (max_chars(const, 40) + 1),
+            }
+            for label, data in payloads.items():
+                def fit_old():
+                    qr = qrcode.QRCode(error_correction=const)
+                    qr.add_data(data)
+                    qr.best_fit()
+
+                def fit_new():
+                    qr = qrcode.QRCode(error_correction=const)
+                    qr.add_data(data)
+                    find_min_version(qr.data_list, const)
+
+                old = best_time(fit_old, args.repeat)
+                new = best_time(fit_new, args.repeat)
+                total_old = best_time(
+                    lambda: legacy_build(data, size, const), args.repeat
+                )
+                total_new = best_time(
+                    lambda: build_qr(data, size, info), args.repeat
+                )
+                print(
+                    f"{size['id']:<4} {level:<2} {label:<8} "
+                    f"{old * 1e6:>12.1f} {new * 1e6:>12.1f} "
+                    f"{total_old * 1000:>14.2f} {total_new * 1000:>14.2f}"
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Сравнение classifier.classify с прежней optimize_data() на смешанном корпусе.
+
+Корпус из URL, доменов без схемы, email, телефонов, коротких номеров,
+Wi-Fi, vCard, geo и произвольного текста генерируется с фиксированным
+зерном. Скрипт замеряет оба варианта и печатает, на каких типах данных
+результат отличается (прежняя функция превращала Wi-Fi и vCard с
+символом @ в mailto:).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_classifier [--count N] [--repeat N]
+"""
+import argparse
+import random
+import re
+import string
+import time
+from collections import Counter
+
+from classifier import classify
+
+
+def legacy_optimize_data(data):
+    """
+    optimize_data() в том виде, в каком она была до classifier.py.
+    """
+    data = data.strip()
+
+    if '@' in data and '.' in data and not data.startswith('mailto:'):
+        if ' ' not in data and not data.startswith('http'):
+            return f'mailto:{data}'
+
+    phone_pattern = r'^[\d\s\-\+\(\)]+$'
+    if re.match(phone_pattern, data) and len(data.replace(' ', '')) >= 10:
+        if not data.startswith('tel:'):
+            cleaned = re.sub(r'[^\d\+]', '', data)
+            return f'tel:{cleaned}'
+
+    if not data.startswith(('http://', 'https://', 'mailto:', 'tel:')):
+        url_pattern = r'^[a-zA-Z0-9-]+\.[a-zA-Z]{2,}'
+        if re.match(url_pattern, data):
+            return f'https://{data}'
+
+    return data
+
+
+def word(rng, low=3, high=10):
+    return ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(low, high)))
+
+
+GENERATORS = {
+    'url': lambda rng: f'https://{word(rng)}.com/{word(rng)}?id={rng.randint(1, 10**6)}',
+    'domain': lambda rng: f'{word(rng)}.{rng.choice(["ru", "com", "org"])}/{word(rng)}',
+    'email': lambda rng: f'{word(rng)}.{word(rng)}@{word(rng)}.com',
+    'phone': lambda rng: f'+7 ({rng.randint(900, 999)}) {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}',
+    'short_number': lambda rng: str(rng.randint(100, 99999)),
+    'wifi': lambda rng: f'WIFI:S:{word(rng)}.net;T:WPA;P:{word(rng)}@{word(rng)};;',
+    'vcard': lambda rng: (
+        f'BEGIN:VCARD\nVERSION:3.0\nFN:{word(rng)}\n'
+        f'EMAIL:{word(rng)}@{word(rng)}.ru\nEND:VCARD'
+    ),
+    'geo': lambda rng: f'geo:{rng.uniform(-90, 90):.5f},{rng.uniform(-180, 180):.5f}',
+    'text': lambda rng: ' '.join(word(rng) for _ in range(rng.randint(2, 30))),
+}
+
+
+def build_corpus(count, seed):
+    rng = random.Random(seed)
+    names = list(GENERATORS)
+    corpus = []
+    for _ in range(count):
+        name = rng.choice(names)
+        corpus.append((name, GENERATORS[name](rng)))
+    return corpus
+
+
+def best_time(func, items, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.count, args.seed)
+    items = [data for _, data in corpus]
+
+    differences = Counter(
+        name for name, data in corpus
+        if legacy_optimize_data(data) != classify(data).data
+    )
+    kinds = Counter(classify(data).kind for data in items)
+
+    old = best_time(legacy_optimize_data, items, args.repeat)
+    new = best_time(classify, items, args.repeat)
+
+    print(f'corpus: {len(items)} items, kinds: {dict(sorted(kinds.items()))}')
+    print(f"{'variant':<22} {'total, ms':>10} {'per item, us':>13}")
+    print(f"{'legacy optimize_data':<22} {old * 1000:>10.1f} {old / len(items) * 1e6:>13.2f}")
+    print(f"{'classify':<22} {new * 1000:>10.1f} {new / len(items) * 1e6:>13.2f}")
+    print(f'speedup: x{old / new:.2f}')
+    print(f'differences by generator: {dict(sorted(differences.items())) or "none"}')
+
+
+if __name__ == '__main__':
+    main()
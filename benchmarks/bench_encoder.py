@@ -0,0 +1,104 @@
+"""
+Кодирование encoder.make ('fast') против QRCode.make(fit=False) для версий 1-40.
+
+Для каждой версии и уровня коррекции кодирует случайные байты с
+фиксированным зерном на ~90% емкости версии, проверяет, что штрафы всех
+восьми масок совпадают с util.lost_point, а итоговые матрицы совпадают
+модуль в модуль, и печатает лучшее время обоих путей. Время включает
+кодовые слова: reed_solomon.create_data у 'fast' и util.create_data у
+qrcode (отдельно их сравнивает bench_reed_solomon).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_encoder [--repeat N] [--levels M,H]
+"""
+import argparse
+import random
+import time
+
+import qrcode
+from qrcode import util
+
+from app import ERROR_CORRECTION_LEVELS
+from capacity import max_chars
+from encoder import lost_points, make
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def new_qr(data, version, error_correction):
+    qr = qrcode.QRCode(version=version, error_correction=error_correction)
+    qr.add_data(data)
+    return qr
+
+
+def reference_points(data, version, error_correction):
+    qr = new_qr(data, version, error_correction)
+    points = []
+    for pattern in range(8):
+        qr.makeImpl(True, pattern)
+        points.append(util.lost_point(qr.modules))
+    return points
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--levels', default='M,H')
+    parser.add_argument('--seed', type=int, default=18004)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(
+        f"{'ec':<2} {'ver':>3} {'mask':>4} {'qrcode, ms':>11} {'fast, ms':>9} "
+        f"{'speedup':>8}"
+    )
+    total_reference = total_fast = 0
+    for error_level in args.levels.split(','):
+        const = ERROR_CORRECTION_LEVELS[error_level]['const']
+        for version in range(1, 41):
+            length = max(1, max_chars(const, version) * 9 // 10)
+            data = bytes(rng.getrandbits(8) for _ in range(length))
+
+            expected = reference_points(data, version, const)
+            if lost_points(new_qr(data, version, const)) != expected:
+                raise SystemExit(
+                    f'Penalty mismatch: ec={error_level} version={version}'
+                )
+            reference = new_qr(data, version, const)
+            reference.make(fit=False)
+            fast = new_qr(data, version, const)
+            make(fast)
+            if fast.modules != reference.modules:
+                raise SystemExit(
+                    f'Matrix mismatch: ec={error_level} version={version}'
+                )
+
+            reference_time = best_time(
+                lambda: new_qr(data, version, const).make(fit=False),
+                args.repeat
+            )
+            fast_time = best_time(
+                lambda: make(new_qr(data, version, const)), args.repeat
+            )
+            total_reference += reference_time
+            total_fast += fast_time
+            print(
+                f"{error_level:<2} {version:>3} {fast.mask_pattern:>4} "
+                f"{reference_time * 1000:>11.2f} {fast_time * 1000:>9.2f} "
+                f"{reference_time / fast_time:>7.1f}x"
+            )
+    print(
+        f'total: qrcode {total_reference:.2f} s, fast {total_fast:.2f} s '
+        f'({total_reference / total_fast:.1f}x)'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,511 @@
+"""
+Нагрузочный прогон gunicorn на localhost по матрице конфигураций воркеров.
+
+Для каждой комбинации класса воркера (sync, gthread, uvicorn), числа
+воркеров и потоков запускает gunicorn -c gunicorn.conf.py на свободном
+порту 127.0.0.1, ждет /health и подает закрытую нагрузку: --concurrency
+клиентов (потоки в --client-processes процессах, соединения keep-alive)
+без пауз между запросами в течение --duration секунд после --warmup.
+Смесь запросов задается весами --mix:
+  - index_get: GET /;
+  - index_post: POST / с формой;
+  - api_generate: POST /api/generate по всем SIZE_OPTIONS и уровням
+    коррекции;
+  - policy: GET страниц политик;
+  - health: GET /health.
+Данные берутся из --unique строк с фиксированным зерном (короткие URL,
+email, телефоны, текст), поэтому доля попаданий в кэш рендера зависит от
+--unique. Лимит запросов приложения выключен (RATE_LIMIT_ENABLED=0), если
+не передан --rate-limit.
+
+Для каждой конфигурации печатаются запросы в секунду, p50/p90/p99 и
+максимум задержки, доля ошибок (статус >= 400 или сбой соединения) по
+типам запросов и пиковый RSS мастера и каждого воркера (из /proc, только
+Linux). Полный результат пишется в JSON через --output.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_load [--worker-classes sync,gthread]
+        [--workers 1,2,4] [--threads 1,4] [--concurrency 16]
+        [--duration 20] [--mix api_generate=50,index_get=20,...]
+        [--output load.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.client import HTTPConnection
+from urllib.parse import urlencode
+
+from app import ERROR_CORRECTION_LEVELS, SIZE_OPTIONS
+from benchmarks.bench_suite import PAYLOADS, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Класс воркера -> (аргумент -k, приложение)
+WORKER_CLASSES = {
+    'sync': ('sync', 'wsgi:app'),
+    'gthread': ('gthread', 'wsgi:app'),
+    'uvicorn': ('uvicorn.workers.UvicornWorker', 'asgi:application'),
+}
+
+POLICY_PAGES = (
+    '/privacy-policy', '/terms-of-service', '/cookie-policy', '/dmca-policy'
+)
+
+DEFAULT_MIX = 'api_generate=50,index_get=20,index_post=10,policy=10,health=10'
+
+
+def parse_list(value, cast=str):
+    return [cast(item) for item in value.split(',') if item]
+
+
+def parse_mix(value):
+    """
+    'api_generate=50,health=10' -> {'api_generate': 50.0, 'health': 10.0}
+    """
+    mix = {}
+    for item in parse_list(value):
+        name, _, weight = item.partition('=')
+        if name not in SCENARIOS:
+            raise SystemExit(f'Unknown scenario: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def make_payloads(count, seed):
+    """
+    Данные для QR-кодов: классы из bench_suite с уникальными суффиксами.
+
+    Текст укорочен до 512 символов, чтобы помещаться в версию 40 на любом
+    уровне коррекции: ошибки в отчете - отказы сервера, а не данных.
+    """
+    rng = random.Random(seed)
+    kinds = [value[:512] for value in PAYLOADS.values()]
+    payloads = []
+    for number in range(count):
+        base = kinds[number % len(kinds)]
+        if base.startswith('http'):
+            payloads.append(f'{base}/{rng.getrandbits(32):08x}')
+        else:
+            payloads.append(f'{base} {number}')
+    return payloads
+
+
+def index_get(rng, payloads):
+    return 'GET', '/', None, {}
+
+
+def index_post(rng, payloads):
+    form = {
+        'data': rng.choice(payloads),
+        'size': rng.choice(SIZE_OPTIONS)['id'],
+        'color': '#000000',
+        'error_correction': rng.choice(list(ERROR_CORRECTION_LEVELS)),
+        'format': 'png',
+    }
+    return 'POST', '/', urlencode(form), {
+        'Content-Type': 'application/x-www-form-urlencoded'
+    }
+
+
+def api_generate(rng, payloads):
+    body = {
+        'data': rng.choice(payloads),
+        'size': rng.choice(SIZE_OPTIONS)['id'],
+        'error_correction': rng.choice(list(ERROR_CORRECTION_LEVELS)),
+    }
+    return 'POST', '/api/generate', json.dumps(body), {
+        'Content-Type': 'application/json'
+    }
+
+
+def policy(rng, payloads):
+    return 'GET', rng.choice(POLICY_PAGES), None, {}
+
+
+def health(rng, payloads):
+    return 'GET', '/health', None, {}
+
+
+SCENARIOS = {
+    'index_get': index_get,
+    'index_post': index_post,
+    'api_generate': api_generate,
+    'policy': policy,
+    'health': health,
+}
+
+
+def run_client(port, mix, payloads, threads, warmup, duration, seed):
+    """
+    Клиентский процесс: ``threads`` потоков шлют запросы без пауз.
+
+    Возвращает кортежи (сценарий, статус, секунды) запросов, начатых
+    после прогрева; статус 0 - сбой соединения.
+    """
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    started = time.monotonic()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+    results = []
+    lock = threading.Lock()
+
+    def worker(number):
+        rng = random.Random(seed * 1000 + number)
+        connection = HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        while True:
+            sent = time.monotonic()
+            if sent >= stop_at:
+                break
+            name = rng.choices(names, weights)[0]
+            method, path, body, headers = SCENARIOS[name](rng, payloads)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, ValueError):
+                connection.close()
+                status = 0
+            if sent >= measure_from:
+                local.append((name, status, time.monotonic() - sent))
+        connection.close()
+        with lock:
+            results.extend(local)
+
+    pool = [
+        threading.Thread(target=worker, args=(number,))
+        for number in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return results
+
+
+def _client_entry(queue, *args):
+    queue.put(run_client(*args))
+
+
+def generate_load(port, mix, payloads, concurrency, processes, warmup,
+                  duration, seed, sampler=None):
+    """
+    Распределяет ``concurrency`` клиентов по процессам и собирает замеры.
+
+    ``sampler`` запускается после форка клиентов, чтобы они не
+    наследовали процесс с работающим потоком.
+    """
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    processes = max(1, min(processes, concurrency))
+    children = []
+    for number in range(processes):
+        threads = concurrency // processes + (number < concurrency % processes)
+        child = context.Process(
+            target=_client_entry,
+            args=(queue, port, mix, payloads, threads, warmup, duration,
+                  seed + number)
+        )
+        child.start()
+        children.append(child)
+    if sampler is not None:
+        sampler.start()
+    results = []
+    for _ in children:
+        results.extend(queue.get())
+    for child in children:
+        child.join()
+    return results
+
+
+def rss_kb(pid):
+    """
+    VmRSS процесса в КБ или None, если процесса нет (или нет /proc).
+    """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def child_pids(pid):
+    """
+    Прямые потомки процесса (воркеры gunicorn) по /proc/<pid>/stat.
+    """
+    children = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                # Имя процесса в скобках может содержать пробелы
+                fields = f.read().rpartition(')')[2].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(name))
+    return children
+
+
+class MemorySampler(threading.Thread):
+    """
+    Раз в ``interval`` секунд записывает пиковый RSS мастера и воркеров.
+
+    Перезапущенный воркер получает новый pid и учитывается отдельно.
+    """
+
+    def __init__(self, master_pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.master_kb = 0
+        self.workers_kb = {}
+        self._done = threading.Event()
+
+    def sample(self):
+        self.master_kb = max(self.master_kb, rss_kb(self.master_pid) or 0)
+        for pid in child_pids(self.master_pid):
+            value = rss_kb(pid)
+            if value is not None:
+                self.workers_kb[pid] = max(self.workers_kb.get(pid, 0), value)
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.sample()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port, server, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and server.poll() is None:
+        connection = HTTPConnection('127.0.0.1', port, timeout=2)
+        try:
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        finally:
+            connection.close()
+        time.sleep(0.2)
+    return False
+
+
+def start_server(worker_class, workers, threads, port, log, rate_limit):
+    """
+    Запускает gunicorn с конфигурацией репозитория; аргументы командной
+    строки перекрывают значения из gunicorn.conf.py.
+    """
+    klass, target = WORKER_CLASSES[worker_class]
+    env = dict(os.environ)
+    if not rate_limit:
+        env['RATE_LIMIT_ENABLED'] = '0'
+    return subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers), '--threads', str(threads),
+            '--worker-class', klass, target,
+        ],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def summarize(samples, duration):
+    """
+    Пропускная способность, перцентили задержки (мс) и ошибки по статусам.
+    """
+    latencies = [seconds * 1000 for _, _, seconds in samples]
+    statuses = {}
+    for _, status, _ in samples:
+        if status == 0 or status >= 400:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(statuses.values())
+    return {
+        'requests': len(samples),
+        'rps': len(samples) / duration,
+        'p50_ms': percentile(latencies, 0.5) if latencies else None,
+        'p90_ms': percentile(latencies, 0.9) if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) if latencies else None,
+        'max_ms': max(latencies) if latencies else None,
+        'error_rate': errors / len(samples) if samples else 0.0,
+        'errors': statuses,
+    }
+
+
+def iter_configs(worker_classes, workers, threads):
+    """
+    Комбинации (класс, воркеры, потоки). Потоки имеют смысл только у
+    gthread: sync с --threads > 1 gunicorn сам заменяет на gthread.
+    """
+    for worker_class in worker_classes:
+        for count in workers:
+            for thread_count in (threads if worker_class == 'gthread' else [1]):
+                yield worker_class, count, thread_count
+
+
+def run_config(args, mix, payloads, worker_class, workers, threads, log_dir):
+    port = free_port()
+    log_path = os.path.join(
+        log_dir, f'gunicorn-{worker_class}-{workers}x{threads}.log'
+    )
+    with open(log_path, 'wb') as log:
+        server = start_server(
+            worker_class, workers, threads, port, log, args.rate_limit
+        )
+    try:
+        if not wait_ready(port, server, args.startup_timeout):
+            with open(log_path, errors='replace') as f:
+                tail = f.read()[-2000:]
+            return {'error': f'server did not start, log {log_path}:\n{tail}'}
+
+        sampler = MemorySampler(server.pid)
+        samples = generate_load(
+            port, mix, payloads, args.concurrency, args.client_processes,
+            args.warmup, args.duration, args.seed, sampler
+        )
+        sampler.stop()
+    finally:
+        stop_server(server)
+
+    by_scenario = {}
+    for sample in samples:
+        by_scenario.setdefault(sample[0], []).append(sample)
+    return {
+        'total': summarize(samples, args.duration),
+        'scenarios': {
+            name: summarize(by_scenario.get(name, []), args.duration)
+            for name in mix
+        },
+        'master_rss_kb': sampler.master_kb,
+        'worker_rss_kb': sorted(sampler.workers_kb.values()),
+    }
+
+
+def format_ms(value):
+    return f'{value:.1f}' if value is not None else '-'
+
+
+def print_result(name, result):
+    if 'error' in result:
+        print(f'{name}: {result["error"]}')
+        return
+    print(
+        f"{name}: master {result['master_rss_kb'] / 1024:.1f} MB, workers "
+        + ', '.join(f'{kb / 1024:.1f}' for kb in result['worker_rss_kb'])
+        + ' MB'
+    )
+    print(
+        f"  {'scenario':<13} {'req':>7} {'rps':>8} {'p50':>8} {'p90':>8} "
+        f"{'p99':>8} {'max':>8} {'errors':>7}"
+    )
+    rows = list(result['scenarios'].items()) + [('total', result['total'])]
+    for scenario, entry in rows:
+        print(
+            f"  {scenario:<13} {entry['requests']:>7} {entry['rps']:>8.1f} "
+            f"{format_ms(entry['p50_ms']):>8} {format_ms(entry['p90_ms']):>8} "
+            f"{format_ms(entry['p99_ms']):>8} {format_ms(entry['max_ms']):>8} "
+            f"{entry['error_rate'] * 100:>6.1f}%"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--worker-classes', default='sync,gthread')
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--threads', default='1,4')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument(
+        '--client-processes', type=int,
+        default=max(1, min(4, (os.cpu_count() or 1) // 2))
+    )
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--unique', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=18004)
+    parser.add_argument('--startup-timeout', type=float, default=30)
+    parser.add_argument(
+        '--rate-limit', action='store_true',
+        help='не выключать лимит запросов приложения'
+    )
+    parser.add_argument('--output', help='файл для результата в JSON')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    worker_classes = parse_list(args.worker_classes)
+    for worker_class in worker_classes:
+        if worker_class not in WORKER_CLASSES:
+            raise SystemExit(f'Unknown worker class: {worker_class}')
+    payloads = make_payloads(args.unique, args.seed)
+
+    report = {
+        'settings': {
+            'concurrency': args.concurrency,
+            'client_processes': args.client_processes,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'mix': mix,
+            'unique': args.unique,
+            'cpu_count': os.cpu_count(),
+        },
+        'configs': [],
+    }
+    with tempfile.TemporaryDirectory(prefix='bench-load-') as log_dir:
+        for worker_class, workers, threads in iter_configs(
+            worker_classes, parse_list(args.workers, int),
+            parse_list(args.threads, int)
+        ):
+            name = f'{worker_class} workers={workers} threads={threads}'
+            result = run_config(
+                args, mix, payloads, worker_class, workers, threads, log_dir
+            )
+            print_result(name, result)
+            report['configs'].append({
+                'worker_class': worker_class,
+                'workers': workers,
+                'threads': threads,
+                **result,
+            })
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Сравнение растеризатора rasterizer.rasterize с фабрикой изображений qrcode.
+
+Для каждой комбинации SIZE_OPTIONS × ERROR_CORRECTION_LEVELS проверяет
+попиксельное совпадение и замеряет время построения изображения.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_rasterizer [--repeat N]
+"""
+import argparse
+import time
+
+import qrcode
+from PIL import ImageChops
+
+from app import ERROR_CORRECTION_LEVELS, SIZE_OPTIONS
+from rasterizer import rasterize
+
+COLOR = '#6c63ff'
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def build_qr(size, error_level, version):
+    qr = qrcode.QRCode(
+        version=version,
+        error_correction=ERROR_CORRECTION_LEVELS[error_level]['const'],
+        box_size=size['box_size'],
+        border=size['border']
+    )
+    qr.add_data('https://example.com/benchmark')
+    qr.make(fit=False)
+    return qr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':<4} {'ec':<2} {'ver':>3} {'pil, ms':>9} {'fast, ms':>9} {'speedup':>8}")
+    for size in SIZE_OPTIONS:
+        for error_level in ERROR_CORRECTION_LEVELS:
+            for version in sorted({5, size['max_version']}):
+                qr = build_qr(size, error_level, version)
+
+                def render_pil():
+                    return qr.make_image(
+                        fill_color=COLOR, back_color='white'
+                    ).get_image()
+
+                def render_fast():
+                    return rasterize(qr.get_matrix(), size['box_size'], COLOR)
+
+                expected = render_pil().convert('RGB')
+                actual = render_fast().convert('RGB')
+                if ImageChops.difference(expected, actual).getbbox() is not None:
+                    raise SystemExit(
+                        f'Pixel mismatch: size={size["id"]} '
+                        f'ec={error_level} version={version}'
+                    )
+
+                pil = best_time(render_pil, args.repeat)
+                fast = best_time(render_fast, args.repeat)
+                print(
+                    f"{size['id']:<4} {error_level:<2} {version:>3} "
+                    f"{pil * 1000:>9.2f} {fast * 1000:>9.2f} {pil / fast:>7.1f}x"
+                )
+
+
+if __name__ == '__main__':
+    main()
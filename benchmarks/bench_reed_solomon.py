@@ -0,0 +1,89 @@
+"""
+Кодовые слова reed_solomon.create_data против util.create_data для версий 1-40.
+
+Для каждой версии и уровня коррекции кодирует случайные байты, цифры и
+буквенно-цифровые строки с фиксированным зерном на ~90% емкости версии,
+проверяет, что результаты совпадают байт в байт, и печатает лучшее время
+обоих путей на байтах.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_reed_solomon [--repeat N] [--levels L,M,Q,H]
+"""
+import argparse
+import random
+import time
+
+import qrcode
+from qrcode import util
+
+from app import ERROR_CORRECTION_LEVELS
+from capacity import max_chars
+from reed_solomon import create_data
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def data_list(data, version, error_correction):
+    qr = qrcode.QRCode(version=version, error_correction=error_correction)
+    qr.add_data(data)
+    return qr.data_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--levels', default='L,M,Q,H')
+    parser.add_argument('--seed', type=int, default=18004)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(
+        f"{'ec':<2} {'ver':>3} {'qrcode, ms':>11} {'tables, ms':>11} "
+        f"{'speedup':>8}"
+    )
+    total_reference = total_fast = 0
+    for error_level in args.levels.split(','):
+        const = ERROR_CORRECTION_LEVELS[error_level]['const']
+        for version in range(1, 41):
+            length = max(1, max_chars(const, version) * 9 // 10)
+            samples = [
+                bytes(rng.getrandbits(8) for _ in range(length)),
+                ''.join(rng.choice('0123456789') for _ in range(length * 2)),
+                ''.join(rng.choice(util.ALPHA_NUM.decode()) for _ in range(length)),
+            ]
+            for sample in samples:
+                segments = data_list(sample, version, const)
+                expected = bytes(util.create_data(version, const, segments))
+                if create_data(version, const, segments) != expected:
+                    raise SystemExit(
+                        f'Codeword mismatch: ec={error_level} version={version}'
+                    )
+
+            segments = data_list(samples[0], version, const)
+            reference_time = best_time(
+                lambda: util.create_data(version, const, segments), args.repeat
+            )
+            fast_time = best_time(
+                lambda: create_data(version, const, segments), args.repeat
+            )
+            total_reference += reference_time
+            total_fast += fast_time
+            print(
+                f"{error_level:<2} {version:>3} {reference_time * 1000:>11.2f} "
+                f"{fast_time * 1000:>11.3f} {reference_time / fast_time:>7.1f}x"
+            )
+    print(
+        f'total: qrcode {total_reference:.2f} s, tables {total_fast:.3f} s '
+        f'({total_reference / total_fast:.1f}x)'
+    )
+
+
+if __name__ == '__main__':
+    main()
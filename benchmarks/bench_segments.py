@@ -0,0 +1,101 @@
+"""
+Версии QR-кодов при разбиении на сегменты segments.optimize_segments
+против стандартного QRCode.add_data (optimize=20).
+
+Корпус с фиксированным зерном: ссылки с числовыми идентификаторами и
+UTM-метками, ссылки в верхнем регистре, телефоны (tel:), карточки
+товаров с артикулами, текст с кандзи. Для каждого класса данных и уровня
+коррекции печатает, у скольких кодов версия уменьшилась, среднюю версию
+и время разбиения. Версия не должна вырасти ни для одного кода.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_segments [--count N]
+"""
+import argparse
+import random
+import string
+import sys
+import time
+
+import qrcode
+
+from app import ERROR_CORRECTION_LEVELS
+from benchmarks.bench_capacity import find_min_version
+from segments import optimize_segments
+
+
+def word(rng, low=3, high=10):
+    return ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(low, high)))
+
+
+def digits(rng, low, high):
+    return ''.join(rng.choices(string.digits, k=rng.randint(low, high)))
+
+
+GENERATORS = {
+    'url_id': lambda rng: f'https://{word(rng)}.ru/{word(rng)}/{digits(rng, 6, 16)}',
+    'url_utm': lambda rng: (
+        f'https://{word(rng)}.com/p/{digits(rng, 8, 12)}'
+        f'?utm_source={word(rng)}&order={digits(rng, 10, 18)}'
+    ),
+    'url_upper': lambda rng: f'HTTPS://{word(rng).upper()}.EXAMPLE/P/{digits(rng, 6, 14)}',
+    'phone': lambda rng: f'tel:+7{digits(rng, 10, 10)}',
+    'sku': lambda rng: (
+        f'Артикул {digits(rng, 12, 13)}; партия {digits(rng, 8, 10)}; '
+        f'{word(rng)} {word(rng)}'
+    ),
+    'kanji': lambda rng: (
+        ''.join(rng.choices('日本語東京大阪商品価格注文番号', k=rng.randint(5, 30)))
+        + f' {digits(rng, 6, 12)}'
+    ),
+}
+
+
+def default_version(data, error_correction):
+    qr = qrcode.QRCode(error_correction=error_correction)
+    qr.add_data(data)
+    return find_min_version(qr.data_list, error_correction)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = {
+        name: [generate(rng) for _ in range(args.count)]
+        for name, generate in GENERATORS.items()
+    }
+
+    increased = 0
+    print(
+        f"{'payload':<10} {'ec':<2} {'reduced':>8} {'avg ver old':>12} "
+        f"{'avg ver new':>12} {'split, us':>10}"
+    )
+    for name, items in corpus.items():
+        for level, info in ERROR_CORRECTION_LEVELS.items():
+            const = info['const']
+            old_versions = [default_version(data, const) for data in items]
+
+            started = time.perf_counter()
+            new_versions = [optimize_segments(data, const)[1] for data in items]
+            elapsed = time.perf_counter() - started
+
+            reduced = sum(new < old for old, new in zip(old_versions, new_versions))
+            increased += sum(new > old for old, new in zip(old_versions, new_versions))
+            print(
+                f"{name:<10} {level:<2} {reduced / len(items):>7.0%} "
+                f"{sum(old_versions) / len(items):>12.2f} "
+                f"{sum(new_versions) / len(items):>12.2f} "
+                f"{elapsed / len(items) * 1e6:>10.1f}"
+            )
+
+    if increased:
+        print(f'ERROR: version increased for {increased} payloads')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Время старта и память воркеров при ленивой загрузке и с preload_app.
+
+Для каждого режима в отдельном процессе замеряет время импорта app,
+время create_app(), RSS после создания приложения и задержку первого
+запроса к /api/generate. Затем моделирует gunicorn: мастер форкает
+--workers воркеров и каждый выполняет первый запрос.
+  - lazy: каждый воркер сам вызывает create_app() после форка
+    (gunicorn без preload_app);
+  - preload: create_app(preload=True) вызывается в мастере до форка.
+Для воркеров печатаются RSS и приватная память (Private_Clean +
+Private_Dirty из /proc/self/smaps_rollup, только Linux) - именно она
+растет с каждым новым воркером.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_startup [--workers N] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROBE = '''
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app(preload={preload})
+created = time.perf_counter()
+rss_created = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+client = flask_app.test_client()
+request_started = time.perf_counter()
+client.post('/api/generate', json={{'data': 'https://example.com/startup'}})
+first_request = time.perf_counter() - request_started
+print(json.dumps({{
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': first_request * 1000,
+    'rss_after_create_kb': rss_created,
+    'rss_after_request_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': len(sys.modules),
+}}))
+'''
+
+
+def memory_kb():
+    """
+    RSS и приватная память текущего процесса в КБ.
+    """
+    values = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                if rest.strip().endswith('kB'):
+                    values[name] = int(rest.split()[0])
+    except OSError:
+        return None, None
+    return values['Rss'], values['Private_Clean'] + values['Private_Dirty']
+
+
+def run_probe(preload):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(preload=preload)],
+        check=True, capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def fork_workers(preload, workers):
+    """
+    Форкает воркеров так, как это делает gunicorn, и собирает их память.
+    """
+    master_app = None
+    if preload:
+        import app
+
+        master_app = app.create_app(preload=True)
+    results = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            started = time.perf_counter()
+            if master_app is None:
+                # Без preload_app воркер сам импортирует приложение
+                import app
+
+                flask_app = app.create_app(preload=False)
+            else:
+                flask_app = master_app
+            flask_app.test_client().post(
+                '/api/generate', json={'data': 'https://example.com/startup'}
+            )
+            rss, private = memory_kb()
+            with os.fdopen(write_fd, 'w') as f:
+                json.dump({
+                    'ready_ms': (time.perf_counter() - started) * 1000,
+                    'rss_kb': rss,
+                    'private_kb': private,
+                }, f)
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            results.append(json.load(f))
+        os.waitpid(pid, 0)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    args = parser.parse_args()
+
+    report = {}
+    for mode, preload in (('lazy', False), ('preload', True)):
+        probe = run_probe(preload)
+        # Форк в отдельном процессе, чтобы режимы не влияли друг на друга
+        code = (
+            'import json; from benchmarks.bench_startup import fork_workers; '
+            f'print(json.dumps(fork_workers({preload}, {args.workers})))'
+        )
+        workers = json.loads(subprocess.run(
+            [sys.executable, '-c', code], check=True, capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip().splitlines()[-1])
+        report[mode] = {'process': probe, 'workers': workers}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(
+        f"{'mode':<8} {'import, ms':>11} {'create, ms':>11} "
+        f"{'1st req, ms':>12} {'RSS, MB':>8} {'modules':>8}"
+    )
+    for mode, entry in report.items():
+        probe = entry['process']
+        print(
+            f"{mode:<8} {probe['import_ms']:>11.1f} {probe['create_app_ms']:>11.1f} "
+            f"{probe['first_request_ms']:>12.1f} "
+            f"{probe['rss_after_request_kb'] / 1024:>8.1f} {probe['modules']:>8}"
+        )
+
+    print()
+    print(f"{'mode':<8} {'worker':>6} {'ready, ms':>10} {'RSS, MB':>8} {'private, MB':>12}")
+    for mode, entry in report.items():
+        for number, worker in enumerate(entry['workers'], 1):
+            if worker['rss_kb'] is None:
+                print(f'{mode:<8} {number:>6} {worker["ready_ms"]:>10.1f}  (нет /proc)')
+                continue
+            print(
+                f"{mode:<8} {number:>6} {worker['ready_ms']:>10.1f} "
+                f"{worker['rss_kb'] / 1024:>8.1f} {worker['private_kb'] / 1024:>12.1f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+Воспроизводимый прогон производительности генерации QR-кодов.
+
+Перебирает SIZE_OPTIONS × ERROR_CORRECTION_LEVELS × цвета × классы данных
+(короткий URL, email, телефон, текст 2 КБ, данные у предела max_version)
+для трех путей:
+  - render: render_qr_image() напрямую, без кэша и пула;
+  - api: POST /api/generate через тестовый клиент Flask;
+  - index: POST / через тестовый клиент Flask.
+
+Кэши рендера и матриц очищаются перед каждым вызовом, чтобы мерить кодирование,
+а не попадания в кэш. Для каждой комбинации считаются p50/p99 задержки,
+рендеры в секунду на одно ядро (по процессорному времени) и пик памяти
+Python (tracemalloc, отдельным прогоном). Результат пишется в JSON,
+который можно сравнивать между релизами через --baseline.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_suite [--repeat N] [--output result.json]
+    python -m benchmarks.bench_suite --baseline old.json --output new.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib import metadata
+
+from app import (
+    COLOR_OPTIONS, ERROR_CORRECTION_LEVELS, SIZE_OPTIONS, create_app,
+    render_qr_image, services
+)
+from capacity import max_chars
+
+TARGETS = ('render', 'api', 'index')
+PACKAGES = ('Flask', 'qrcode', 'Pillow')
+
+# Классы данных, кроме near_capacity, который зависит от пресета
+PAYLOADS = {
+    'short_url': 'https://example.com/p/8f3a',
+    'email': 'user.name@example.com',
+    'phone': '+7 (912) 345-67-89',
+    'text_2kb': ('Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 36)[:2048],
+}
+
+
+def percentile(samples, fraction):
+    """
+    Перцентиль по методу ближайшего ранга.
+    """
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def iter_payloads(size, error_level):
+    yield from PAYLOADS.items()
+    const = ERROR_CORRECTION_LEVELS[error_level]['const']
+    yield 'near_capacity', 'x' * max_chars(const, size['max_version'])
+
+
+def make_call(target, client, data, size, color, error_level):
+    """
+    Функция одного рендера; возвращает True при успехе.
+    """
+    if target == 'render':
+        def call():
+            services().render_cache.clear()
+            services().matrix_cache.clear()
+            try:
+                render_qr_image(data, size, color, error_level)
+            except Exception:
+                return False
+            return True
+    elif target == 'api':
+        payload = {
+            'data': data, 'size': size['id'], 'color': color,
+            'error_correction': error_level
+        }
+
+        def call():
+            services().render_cache.clear()
+            services().matrix_cache.clear()
+            return client.post('/api/generate', json=payload).status_code == 200
+    else:
+        form = {
+            'data': data, 'size': size['id'], 'color': color,
+            'error_correction': error_level, 'format': 'png'
+        }
+
+        def call():
+            services().render_cache.clear()
+            services().matrix_cache.clear()
+            response = client.post('/', data=form)
+            return response.status_code == 200 and b'data:image/png' in response.data
+    return call
+
+
+def measure(call, repeat):
+    call()  # прогрев
+    latencies = []
+    errors = 0
+    cpu_started = time.process_time()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if not call():
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    cpu_time = time.process_time() - cpu_started
+
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'runs': repeat,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / repeat * 1000, 3),
+        'renders_per_sec_per_core': round(repeat / cpu_time, 1) if cpu_time else None,
+        'peak_mem_kb': round(peak / 1024, 1),
+    }
+
+
+def environment(app):
+    packages = {}
+    for name in PACKAGES:
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            packages[name] = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': packages,
+        'qr_renderer': app.config['QR_RENDERER'],
+    }
+
+
+def case_key(result):
+    return (
+        result['target'], result['size'], result['error_level'],
+        result['color'], result['payload']
+    )
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Печатает комбинации, где p50 вырос больше чем на ``threshold``.
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {case_key(r): r for r in json.load(f)['results']}
+
+    regressions = 0
+    for result in results:
+        old = baseline.get(case_key(result))
+        if not old or not old['p50_ms']:
+            continue
+        ratio = result['p50_ms'] / old['p50_ms']
+        if ratio > 1 + threshold:
+            regressions += 1
+            print(
+                f"REGRESSION {' '.join(map(str, case_key(result)))}: "
+                f"p50 {old['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms (x{ratio:.2f})"
+            )
+    print(f'{regressions} regressions against {baseline_path}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--targets', default=','.join(TARGETS))
+    parser.add_argument('--sizes', default=','.join(s['id'] for s in SIZE_OPTIONS))
+    parser.add_argument(
+        '--all-colors', action='store_true',
+        help='все цвета COLOR_OPTIONS вместо черного и одного цветного'
+    )
+    parser.add_argument('--output', help='путь к JSON с результатами')
+    parser.add_argument('--baseline', help='JSON прошлого прогона для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+
+    targets = args.targets.split(',')
+    size_ids = args.sizes.split(',')
+    colors = COLOR_OPTIONS if args.all_colors else COLOR_OPTIONS[:2]
+    app = create_app()
+    client = app.test_client()
+    # Рендер вне запроса берет сервисы из контекста приложения
+    app.app_context().push()
+    # Прогон мерит рендер, а не лимит запросов одного клиента
+    services().rate_limiter = None
+
+    results = []
+    print(
+        f"{'target':<6} {'size':<4} {'ec':<2} {'color':<8} {'payload':<14} "
+        f"{'p50, ms':>9} {'p99, ms':>9} {'r/s/core':>9} {'peak, KB':>9} {'err':>4}"
+    )
+    for target in targets:
+        for size in SIZE_OPTIONS:
+            if size['id'] not in size_ids:
+                continue
+            for error_level in ERROR_CORRECTION_LEVELS:
+                for color in colors:
+                    for payload, data in iter_payloads(size, error_level):
+                        call = make_call(
+                            target, client, data, size, color, error_level
+                        )
+                        result = {
+                            'target': target,
+                            'size': size['id'],
+                            'error_level': error_level,
+                            'color': color,
+                            'payload': payload,
+                            'bytes': len(data.encode('utf-8')),
+                        }
+                        result.update(measure(call, args.repeat))
+                        results.append(result)
+                        print(
+                            f"{target:<6} {size['id']:<4} {error_level:<2} "
+                            f"{color:<8} {payload:<14} "
+                            f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+                            f"{result['renders_per_sec_per_core'] or 0:>9.1f} "
+                            f"{result['peak_mem_kb']:>9.1f} {result['errors']:>4}"
+                        )
+
+    report = {
+        'environment': environment(app),
+        'repeat': args.repeat,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'Results written to {args.output}')
+
+    if args.baseline and compare(results, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import re
+
+from qrcode import base, constants, util
+
+# Режимы кодирования
+MODES = {
+    'numeric': util.MODE_NUMBER,
+    'alphanumeric': util.MODE_ALPHA_NUM,
+    'byte': util.MODE_8BIT_BYTE,
+    'kanji': util.MODE_KANJI,
+}
+
+# Диапазоны версий с одинаковой длиной поля счетчика символов
+VERSION_CLASSES = ((1, 9), (10, 26), (27, 40))
+
+# Биты данных по уровню коррекции и версии (индекс 0 не используется)
+DATA_BITS = {
+    error_correction: [0] + [
+        8 * sum(block.data_count for block in base.rs_blocks(version, error_correction))
+        for version in range(1, 41)
+    ]
+    for error_correction in range(4)
+}
+
+
+def data_bits(mode, length):
+    """
+    Количество бит, которое занимают ``length`` символов в режиме ``mode``.
+    """
+    if mode == util.MODE_NUMBER:
+        return 10 * (length // 3) + (0, 4, 7)[length % 3]
+    if mode == util.MODE_ALPHA_NUM:
+        return 11 * (length // 2) + 6 * (length % 2)
+    if mode == util.MODE_KANJI:
+        return 13 * length
+    return 8 * length
+
+
+def chars_for_bits(mode, bits):
+    """
+    Максимальное количество символов режима ``mode``, помещающееся в ``bits``.
+    """
+    if bits <= 0:
+        return 0
+    if mode == util.MODE_NUMBER:
+        rest = bits % 10
+        return 3 * (bits // 10) + (2 if rest >= 7 else 1 if rest >= 4 else 0)
+    if mode == util.MODE_ALPHA_NUM:
+        return 2 * (bits // 11) + (1 if bits % 11 >= 6 else 0)
+    if mode == util.MODE_KANJI:
+        return bits // 13
+    return bits // 8
+
+
+# Емкость одного сегмента: уровень коррекции -> режим -> версия -> символы
+CAPACITY = {
+    error_correction: {
+        name: [0] + [
+            chars_for_bits(
+                mode,
+                DATA_BITS[error_correction][version] - 4
+                - util.length_in_bits(mode, version)
+            )
+            for version in range(1, 41)
+        ]
+        for name, mode in MODES.items()
+    }
+    for error_correction in range(4)
+}
+
+
+# Больше символов не помещается ни в один QR-код (цифры, версия 40, L)
+MAX_DATA_CHARS = CAPACITY[constants.ERROR_CORRECT_L]['numeric'][40]
+
+_DIGITS = b'0123456789'
+_ALPHA_NUM_LETTERS = bytes(c for c in util.ALPHA_NUM if c not in _DIGITS)
+# Символы, которые сегментация может закодировать в режиме кандзи
+_KANJI_RANGE = re.compile('[\u3040-\u30ff\u4e00-\u9fff]')
+
+
+def may_fit(data, error_correction):
+    """
+    Быстрая проверка до сегментации: False, если данные заведомо не
+    помещаются в версию 40.
+
+    Нижняя оценка длины по самому дешевому режиму каждого символа: цифра -
+    10/3 бита, буквенно-цифровой символ - 5.5 бита, иероглиф или кана - 13
+    бит (режим кандзи), остальные символы - 8 бит на байт UTF-8.
+    """
+    if len(data) > CAPACITY[error_correction]['numeric'][40]:
+        return False
+    encoded = data.encode('utf-8')
+    digits = len(encoded) - len(encoded.translate(None, _DIGITS))
+    letters = len(encoded) - len(encoded.translate(None, _ALPHA_NUM_LETTERS))
+    kanji = len(_KANJI_RANGE.findall(data))
+    # Иероглиф занимает 3 байта UTF-8, в режиме кандзи - 13 бит вместо 24
+    bits = 8 * len(encoded) - (8 - 10 / 3) * digits - 2.5 * letters - 11 * kanji
+    return bits <= DATA_BITS[error_correction][40]
+
+
+def required_bits(data_list):
+    """
+    Длина закодированных сегментов в битах для каждого диапазона версий.
+    """
+    totals = []
+    for low, _ in VERSION_CLASSES:
+        sizes = util.mode_sizes_for_version(low)
+        totals.append(sum(
+            4 + sizes[segment.mode] + data_bits(segment.mode, len(segment))
+            for segment in data_list
+        ))
+    return totals
+
+
+def get_capacity_info(bits, error_correction, max_version):
+    """
+    Точная информация о занятой и оставшейся емкости.
+
+    ``bits`` - длина сегментов по диапазонам версий из ``required_bits``.
+    Остаток считается для версии ``max_version`` (предел пресета размера)
+    в байтовом режиме; если данные не помещаются в пресет, он равен нулю.
+    """
+    class_index = next(
+        i for i, (low, high) in enumerate(VERSION_CLASSES) if low <= max_version <= high
+    )
+    used_bits = bits[class_index]
+    available_bits = DATA_BITS[error_correction][max_version]
+    return {
+        'used_bits': used_bits,
+        'available_bits': available_bits,
+        'max_version': max_version,
+        'remaining_bytes': max(available_bits - used_bits, 0) // 8,
+    }
+
+
+def max_chars(error_correction, version, mode='byte'):
+    """
+    Сколько символов режима ``mode`` помещается в версию ``version``.
+    """
+    return CAPACITY[error_correction][mode][version]
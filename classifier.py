@@ -0,0 +1,77 @@
+import re
+from collections import namedtuple
+
+# Результат классификации: тип, данные для кодирования и исходная строка
+Payload = namedtuple('Payload', ('kind', 'data', 'source'))
+
+# Названия типов данных для интерфейса
+PAYLOAD_KINDS = {
+    'url': 'Ссылка',
+    'mailto': 'Email',
+    'tel': 'Телефон',
+    'wifi': 'Wi-Fi',
+    'vcard': 'Визитка (vCard)',
+    'geo': 'Геопозиция',
+    'text': 'Текст',
+}
+
+# Префиксы уже размеченных данных
+_SCHEME_KINDS = {
+    'http://': 'url',
+    'https://': 'url',
+    'mailto:': 'mailto',
+    'tel:': 'tel',
+    'geo:': 'geo',
+    'WIFI:': 'wifi',
+    'BEGIN:VCARD': 'vcard',
+}
+
+# Схема, номер телефона или домен без схемы - одно сопоставление на строку
+_CLASSIFY_RE = re.compile(
+    '(?P<scheme>' + '|'.join(re.escape(prefix) for prefix in _SCHEME_KINDS) + ')'
+    r'|(?P<phone>[\d\s\-+()]+)\Z'
+    r'|(?P<domain>[a-zA-Z0-9-]+\.[a-zA-Z]{2,})'
+)
+
+_PHONE_STRIP_RE = re.compile(r'[^\d+]+')
+
+_HEX_COLOR_RE = re.compile(r'#(?:[A-Fa-f0-9]{6}|[A-Fa-f0-9]{3})')
+
+
+def classify(data):
+    """
+    Определяет тип данных и приводит их к виду для кодирования в QR-код.
+
+    Email без схемы получает ``mailto:``, номер телефона - ``tel:`` с
+    одними цифрами, домен без схемы - ``https://``. Wi-Fi, vCard и geo
+    остаются как есть.
+    """
+    data = data.strip()
+    match = _CLASSIFY_RE.match(data)
+    group = match.lastgroup if match else None
+
+    if group == 'scheme':
+        return Payload(_SCHEME_KINDS[match.group()], data, data)
+
+    # Email проверяется раньше домена: "user.name@mail.ru" начинается с домена
+    if '@' in data and '.' in data and ' ' not in data and not data.startswith('http'):
+        return Payload('mailto', f'mailto:{data}', data)
+
+    if group == 'phone':
+        if len(data.replace(' ', '')) >= 10:
+            return Payload('tel', f"tel:{_PHONE_STRIP_RE.sub('', data)}", data)
+    elif group == 'domain':
+        return Payload('url', f'https://{data}', data)
+
+    return Payload('text', data, data)
+
+
+def normalize_hex_color(color):
+    """
+    Возвращает цвет в виде ``#rrggbb`` или None, если это не HEX-цвет.
+    """
+    if not _HEX_COLOR_RE.fullmatch(color):
+        return None
+    if len(color) == 4:
+        return f'#{color[1] * 2}{color[2] * 2}{color[3] * 2}'
+    return color
@@ -1,6 +1,10 @@
 import os
 from datetime import timedelta
 
+# Допустимые значения QR_RENDERER и QR_ENCODER (проверяются в create_app)
+RENDERERS = ('pil', 'fast')
+ENCODERS = ('qrcode', 'fast')
+
 class Config:
     """Базовая конфигурация"""
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -16,14 +20,125 @@ class Config:
     # Лимиты для защиты от DDoS
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max upload
     
+    # Кэш готовых QR-кодов (RENDER_CACHE_PATH - общий sqlite для воркеров)
+    RENDER_CACHE_MAX_ENTRIES = int(os.environ.get('RENDER_CACHE_MAX_ENTRIES', 1024))
+    RENDER_CACHE_MAX_BYTES = int(os.environ.get('RENDER_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    RENDER_CACHE_TTL = int(os.environ.get('RENDER_CACHE_TTL', 3600))
+    RENDER_CACHE_PATH = os.environ.get('RENDER_CACHE_PATH')
+    
+    # Кэш закодированных матриц по (данные, уровень коррекции): размеры,
+    # цвета и форматы одного QR-кода кодируются один раз. Матрица
+    # версии 40 занимает 3917 байт
+    MATRIX_CACHE_MAX_ENTRIES = int(os.environ.get('MATRIX_CACHE_MAX_ENTRIES', 4096))
+    MATRIX_CACHE_MAX_BYTES = int(os.environ.get('MATRIX_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    
+    # Пакетная генерация (BATCH_WORKERS=None - по числу ядер)
+    BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 10000))
+    BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 0)) or None
+    
+    # Вариантов одного QR-кода в /api/generate/variants (размеры × форматы)
+    VARIANTS_MAX_ITEMS = int(os.environ.get('VARIANTS_MAX_ITEMS', 20))
+    
+    # Фоновые задания /api/jobs: каталог очереди и результатов (по умолчанию
+    # instance/jobs), лимит элементов, порция захвата и время (сек), после
+    # которого элементы упавшего воркера снова берутся в работу;
+    # JOBS_RESULT_TTL - сколько секунд хранятся завершенные задания с
+    # архивами и изображениями (0 - бессрочно)
+    JOBS_DIR = os.environ.get('JOBS_DIR')
+    JOBS_MAX_ITEMS = int(os.environ.get('JOBS_MAX_ITEMS', 1000000))
+    JOBS_CHUNK_SIZE = int(os.environ.get('JOBS_CHUNK_SIZE', 64))
+    JOBS_LEASE = float(os.environ.get('JOBS_LEASE', 300))
+    JOBS_RESULT_TTL = float(os.environ.get('JOBS_RESULT_TTL', 86400))
+    
+    # Ограниченный пул рендера: воркеры, глубина очереди, таймаут (сек)
+    RENDER_POOL_WORKERS = int(os.environ.get('RENDER_POOL_WORKERS', 0)) or os.cpu_count()
+    RENDER_POOL_QUEUE = int(os.environ.get('RENDER_POOL_QUEUE', 16))
+    RENDER_TIMEOUT = float(os.environ.get('RENDER_TIMEOUT', 10))
+    
+    # Движок PNG: 'fast' (построчная запись из матрицы) или 'pil'
+    QR_RENDERER = os.environ.get('QR_RENDERER', 'fast')
+    
+    # Кодирование: 'fast' (табличный Reed-Solomon из reed_solomon.py и
+    # штрафы масок битовыми операциями, см. encoder.py) или 'qrcode'
+    # (коррекция, восемь полных матриц и штрафы самой библиотеки)
+    QR_ENCODER = os.environ.get('QR_ENCODER', 'fast')
+    
+    # Бюджет памяти на один рендер в байтах (оценка до рендера: растр,
+    # PNG, base64 и JSON); дороже - ответ 413. 0 - без ограничения
+    RENDER_MEMORY_BUDGET = int(os.environ.get('RENDER_MEMORY_BUDGET', 32 * 1024 * 1024))
+    
+    # Метрики Prometheus на /metrics (METRICS_ENABLED=0 - выключить)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+    
+    # Кэш готовых страниц: max-age для клиентов и период проверки шаблонов
+    PAGE_CACHE_MAX_AGE = int(os.environ.get('PAGE_CACHE_MAX_AGE', 3600))
+    PAGE_CACHE_CHECK_INTERVAL = float(os.environ.get('PAGE_CACHE_CHECK_INTERVAL', 2))
+    
+    # Сжатие PNG по пресетам размера: уровень zlib (0-9) и стратегия
+    # ('default', 'filtered', 'huffman', 'rle', 'fixed'). Ключ - id размера.
+    PNG_COMPRESSION = {
+        'default': {
+            'compress_level': int(os.environ.get('PNG_COMPRESS_LEVEL', 6)),
+            'strategy': os.environ.get('PNG_COMPRESS_STRATEGY', 'default'),
+        },
+    }
+    
     # CSP Headers (Content Security Policy)
     CSP = {
         'default-src': "'self'",
-        'style-src': ["'self'", "https://cdn.jsdelivr.net", "'unsafe-inline'"],
-        'script-src': ["'self'", "https://cdn.jsdelivr.net"],
+        'script-src': ["'self'", "'unsafe-inline'", "https://cdn.jsdelivr.net"],
+        'style-src': ["'self'", "'unsafe-inline'", "https://cdn.jsdelivr.net"],
         'img-src': ["'self'", "data:", "https:"],
-        'font-src': ["'self'", "https://cdn.jsdelivr.net"]
+        'font-src': ["'self'", "https://cdn.jsdelivr.net"],
+        'connect-src': "'self'",
+        'frame-ancestors': "'none'",
+        'form-action': "'self'",
+        'object-src': "'none'",
     }
+    
+    # CSP с nonce вместо 'unsafe-inline' для скриптов (CSP_NONCE=1): шаблоны
+    # не содержат встроенных скриптов и onclick, обработчики навешивает
+    # script.js, а HTML-страницы в этом режиме не берутся из кэша страниц
+    CSP_NONCE = os.environ.get('CSP_NONCE', '0') == '1'
+    
+    # HSTS только для продакшена
+    HSTS = os.environ.get('FLASK_ENV') == 'production'
+    
+    # Загружать qrcode/Pillow и таблицы при создании приложения, а не при
+    # первом рендере (включается в gunicorn.conf.py вместе с preload_app)
+    PRELOAD_RENDERERS = os.environ.get('PRELOAD_RENDERERS', '0') == '1'
+    
+    # Прогрев при создании приложения (WARMUP=1): все шаблоны, по одному
+    # рендеру на размер и уровень коррекции, главная страница в кэше
+    WARMUP = os.environ.get('WARMUP', '0') == '1'
+    
+    # Кэш байткода Jinja на диске (по умолчанию instance/jinja): после
+    # деплоя шаблоны не компилируются заново, пока не изменились
+    JINJA_BYTECODE_CACHE = os.environ.get('JINJA_BYTECODE_CACHE', '1') != '0'
+    JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR')
+    
+    # Лимит на клиента (IP или API-ключ из X-API-Key, если он есть в
+    # API_KEYS): бакет на RATE_LIMIT_BURST токенов, пополняется на
+    # RATE_LIMIT_RATE в секунду. QR-код версии 1 стоит около токена,
+    # версии 40 - 70-90 токенов. Запрос дороже бакета отклоняется с 413,
+    # элементы /api/generate/batch и /api/jobs списываются по одному по
+    # мере рендера. RATE_LIMIT_PATH - файл в /dev/shm, общий для воркеров
+    # gunicorn; без него у каждого процесса свои бакеты. По умолчанию
+    # выключен: за прокси без PROXY_FIX_HOPS все клиенты попали бы в
+    # один бакет с адресом прокси
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '0') == '1'
+    RATE_LIMIT_RATE = float(os.environ.get('RATE_LIMIT_RATE', 50))
+    RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', 500))
+    RATE_LIMIT_PATH = os.environ.get('RATE_LIMIT_PATH')
+    
+    # Выданные API-ключи через запятую; неизвестный ключ не дает своего
+    # бакета, и клиент лимитируется по IP
+    API_KEYS = frozenset(filter(None, os.environ.get('API_KEYS', '').split(',')))
+    
+    # Число прокси перед приложением: X-Forwarded-For и X-Forwarded-Proto
+    # учитываются через ProxyFix только с такого числа хопов (0 - не
+    # доверять заголовкам, ключ лимита - адрес соединения)
+    PROXY_FIX_HOPS = int(os.environ.get('PROXY_FIX_HOPS', 0))
 
 class DevelopmentConfig(Config):
     """Конфигурация для разработки"""
@@ -0,0 +1,198 @@
+from functools import lru_cache
+
+from qrcode import util
+from qrcode.main import QRCode
+
+import reed_solomon
+
+# Шаблоны правила 3 (1:1:3:1:1 со светлой зоной 4 модуля) по смещениям
+FINDER_PATTERNS = ('10111010000', '00001011101')
+
+if hasattr(int, 'bit_count'):
+    _popcount = int.bit_count
+else:
+    def _popcount(value):
+        return bin(value).count('1')
+
+
+def _pack(rows, stride):
+    """
+    Упаковывает матрицу в одно целое: модуль (i, j) - бит ``i * stride + j``.
+
+    Биты между концом строки и началом следующей нулевые, поэтому серии и
+    шаблоны не переходят через границу строки.
+    """
+    pad = '0' * (stride - len(rows[0]))
+    return int(''.join(
+        pad + ''.join(['1' if cell else '0' for cell in reversed(row)])
+        for row in reversed(rows)
+    ), 2)
+
+
+@lru_cache(maxsize=None)
+def _layout(version):
+    """
+    Упаковка для версии: шаг строки, плоскость всех модулей и для каждой
+    из восьми масок модули данных, которые она инвертирует, парой
+    (по строкам, по столбцам).
+    """
+    size = version * 4 + 17
+    qr = QRCode(version=version)
+    qr.modules_count = size
+    qr.modules = [[None] * size for _ in range(size)]
+    qr.setup_position_probe_pattern(0, 0)
+    qr.setup_position_probe_pattern(size - 7, 0)
+    qr.setup_position_probe_pattern(0, size - 7)
+    qr.setup_position_adjust_pattern()
+    qr.setup_timing_pattern()
+    qr.setup_type_info(True, 0)
+    if version >= 7:
+        qr.setup_type_number(True)
+
+    stride = size + 1
+    data = [[cell is None for cell in row] for row in qr.modules]
+    masks = []
+    for pattern in range(8):
+        mask_func = util.mask_func(pattern)
+        rows = [
+            [data[i][j] and mask_func(i, j) for j in range(size)]
+            for i in range(size)
+        ]
+        masks.append((_pack(rows, stride), _pack(list(zip(*rows)), stride)))
+    cells = _pack([[True] * size] * size, stride)
+    return stride, cells, masks
+
+
+def _line_penalty(dark, light):
+    """
+    Правила 1 и 3 для упакованной матрицы по строкам или по столбцам.
+    """
+    points = 0
+    for plane in (dark, light):
+        # Правило 1: серия длины L >= 5 дает L - 2 очка
+        runs = plane & (plane >> 1) & (plane >> 2) & (plane >> 3) & (plane >> 4)
+        points += _popcount(runs) + 2 * _popcount(runs & ~(runs >> 1))
+
+    # Правило 3: окна из 11 модулей, совпадающие с одним из шаблонов
+    for pattern in FINDER_PATTERNS:
+        match = -1
+        for offset, bit in enumerate(pattern):
+            match &= (dark if bit == '1' else light) >> offset
+        points += 40 * _popcount(match)
+    return points
+
+
+def _penalty(rows, cols, cells, stride, count):
+    light_rows = ~rows & cells
+    points = _line_penalty(rows, light_rows)
+    points += _line_penalty(cols, ~cols & cells)
+
+    # Правило 2: блоки 2x2 одного цвета, по 3 очка
+    for plane in (rows, light_rows):
+        pairs = plane & (plane >> stride)
+        points += 3 * _popcount(pairs & (pairs >> 1))
+
+    # Правило 4: отклонение доли темных модулей от 50%, как в qrcode
+    percent = float(_popcount(rows)) / (count ** 2)
+    points += int(abs(percent * 100 - 50) / 5) * 10
+    return points
+
+
+def _unpack(value, stride, size):
+    bits = format(value, f'0{stride * size}b')
+    return [
+        [bit == '1' for bit in reversed(bits[offset - size:offset])]
+        for offset in range(len(bits), 0, -stride)
+    ]
+
+
+def _score_masks(qr):
+    """
+    Штрафы всех восьми масок и упакованные по строкам матрицы с ними.
+
+    Матрица строится один раз с маской 0, остальные получаются из нее
+    инверсией модулей данных: M(k) = M(0) ^ X(0) ^ X(k).
+    """
+    stride, cells, masks = _layout(qr.version)
+    qr.makeImpl(True, 0)
+    rows = _pack(qr.modules, stride) ^ masks[0][0]
+    cols = _pack(list(zip(*qr.modules)), stride) ^ masks[0][1]
+    points = []
+    planes = []
+    for mask_rows, mask_cols in masks:
+        planes.append(rows ^ mask_rows)
+        points.append(_penalty(
+            planes[-1], cols ^ mask_cols, cells, stride, qr.modules_count
+        ))
+    return points, planes
+
+
+def lost_points(qr):
+    """
+    Штрафы ISO 18004 для всех восьми масок, равные ``util.lost_point``
+    матриц, которые строит ``QRCode.best_mask_pattern``.
+    """
+    return _score_masks(qr)[0]
+
+
+def pack_modules(modules):
+    """
+    Матрица без рамки в байты: модуль (i, j) - бит ``i * n + j`` со
+    старшего бита байта, хвост последнего байта дополнен нулями.
+    """
+    bits = ''.join(['1' if cell else '0' for row in modules for cell in row])
+    bits += '0' * (-len(bits) % 8)
+    return int(bits, 2).to_bytes(len(bits) // 8, 'big')
+
+
+def unpack_modules(packed, count, border=0):
+    """
+    Обратное к ``pack_modules``: матрица ``count`` x ``count`` со светлой
+    рамкой ``border`` модулей, как ``QRCode.get_matrix()``.
+    """
+    bits = format(int.from_bytes(packed, 'big'), f'0{len(packed) * 8}b')
+    edge = [False] * border
+    blank = [False] * (count + 2 * border)
+    matrix = [blank] * border
+    for offset in range(0, count * count, count):
+        matrix.append(
+            edge + [bit == '1' for bit in bits[offset:offset + count]] + edge
+        )
+    matrix.extend([blank] * border)
+    return matrix
+
+
+def make(qr, encoder='fast'):
+    """
+    Строит матрицу QR-кода с уже заданной версией.
+
+    Движок 'fast' заранее кладет в ``qr.data_cache`` кодовые слова из
+    ``reed_solomon.create_data``, оценивает маски битовыми операциями и
+    берет матрицу лучшей маски из упакованной плоскости, дописывая в нее
+    информацию о формате и версии; результат совпадает с
+    ``qr.make(fit=False)``. Оба движка оставляют выбранную маску в
+    ``qr.mask_pattern``.
+    """
+    if encoder != 'fast':
+        # qr.make() не сохраняет маску, которую выбрал сам
+        if qr.mask_pattern is None:
+            qr.mask_pattern = qr.best_mask_pattern()
+        qr.make(fit=False)
+        return
+
+    if qr.data_cache is None:
+        qr.data_cache = reed_solomon.create_data(
+            qr.version, qr.error_correction, qr.data_list
+        )
+    if qr.mask_pattern is not None:
+        qr.make(fit=False)
+        return
+
+    points, planes = _score_masks(qr)
+    pattern = points.index(min(points))
+    stride = _layout(qr.version)[0]
+    qr.mask_pattern = pattern
+    qr.modules = _unpack(planes[pattern], stride, qr.modules_count)
+    qr.setup_type_info(False, pattern)
+    if qr.version >= 7:
+        qr.setup_type_number(False)
@@ -0,0 +1,37 @@
+"""
+Конфигурация gunicorn:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Приложение создается один раз в мастере (preload_app) вместе с модулями
+рендера и таблицами емкости, воркеры получают их через copy-on-write.
+"""
+import gc
+import multiprocessing
+import os
+
+# create_app() в мастере сразу загрузит qrcode, Pillow и таблицы
+os.environ.setdefault('PRELOAD_RENDERERS', '1')
+# Общие для всех воркеров бакеты лимита запросов
+if os.path.isdir('/dev/shm'):
+    os.environ.setdefault('RATE_LIMIT_PATH', f'/dev/shm/qr-rate-limit-{os.getuid()}')
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+preload_app = True
+
+
+def when_ready(server):
+    # Объекты мастера больше не трогает сборщик мусора, поэтому их
+    # страницы памяти не копируются в воркерах при обходе поколений
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Фоновый обработчик /api/jobs в каждом воркере; незавершенные после
+    # перезапуска задания продолжаются с необработанных элементов. У
+    # UvicornWorker (asgi:application) worker.wsgi - адаптер WsgiToAsgi
+    from app import EXTENSION_KEY
+
+    app = getattr(worker.wsgi, 'app', worker.wsgi)
+    app.extensions[EXTENSION_KEY].job_runner.ensure_started()
@@ -0,0 +1,518 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zipfile
+from functools import partial
+
+from batch import item_filename, iter_results
+
+
+class JobNotFound(LookupError):
+    """
+    Задание с таким идентификатором не существует.
+    """
+
+
+class JobStore:
+    """
+    Очередь заданий пакетной генерации на диске.
+
+    Задания и их элементы хранятся в sqlite (общем для всех воркеров),
+    готовые изображения - в каталоге ``objects`` по ключу рендера:
+    одинаковые элементы разных заданий не рендерятся повторно. Элемент
+    захватывается воркером на ``lease`` секунд; если воркер умер,
+    элемент снова становится доступным, поэтому после перезапуска
+    обработка продолжается с незавершенных элементов. Задание хранит ключ
+    клиента ``client``, с бакета которого списываются его элементы.
+    Завершенные задания хранятся ``ttl`` секунд (None - без ограничения),
+    затем ``cleanup`` удаляет их вместе с архивом и изображениями, на
+    которые больше не ссылается ни одно задание.
+    """
+
+    def __init__(self, root, lease=300, ttl=None):
+        self.root = root
+        self.lease = lease
+        self.ttl = ttl
+        self.path = os.path.join(root, 'jobs.sqlite3')
+        self._local = threading.local()
+        self._ready = False
+
+    def _connect(self):
+        # Соединение sqlite нельзя разделять между потоками и процессами
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            if not self._ready:
+                os.makedirs(os.path.join(self.root, 'objects'), exist_ok=True)
+                os.makedirs(os.path.join(self.root, 'results'), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if not self._ready:
+                self._create_tables(conn)
+                self._ready = True
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _create_tables(conn):
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, format TEXT NOT NULL, status TEXT NOT NULL, '
+            'total INTEGER NOT NULL, done INTEGER NOT NULL DEFAULT 0, '
+            'failed INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL, '
+            'started REAL, finished REAL, result_size INTEGER)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS items ('
+            'job_id TEXT NOT NULL, idx INTEGER NOT NULL, options TEXT NOT NULL, '
+            "status TEXT NOT NULL DEFAULT 'pending', claimed REAL, "
+            'digest TEXT, info TEXT, error TEXT, PRIMARY KEY (job_id, idx))'
+        )
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS items_queue ON items (job_id, status, idx)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS items_digest ON items (digest)')
+        # Колонки, добавленные после первой версии схемы
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+        for name, kind in (('client', 'TEXT'), ('not_before', 'REAL')):
+            if name not in columns:
+                conn.execute(f'ALTER TABLE jobs ADD COLUMN {name} {kind}')
+
+    def create(self, items, fmt='png', client=None):
+        """
+        Ставит задание в очередь и возвращает его идентификатор.
+        """
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT INTO jobs (id, format, status, total, created, client) '
+                "VALUES (?, ?, 'queued', ?, ?, ?)",
+                (
+                    job_id, fmt, len(items), time.time(),
+                    None if client is None else str(client)
+                )
+            )
+            conn.executemany(
+                'INSERT INTO items (job_id, idx, options) VALUES (?, ?, ?)',
+                (
+                    (job_id, index, json.dumps(item, ensure_ascii=False))
+                    for index, item in enumerate(items)
+                )
+            )
+        return job_id
+
+    def get(self, job_id):
+        """
+        Состояние задания с прогрессом, скоростью и оценкой окончания.
+        """
+        row = self._connect().execute(
+            'SELECT id, format, status, total, done, failed, created, '
+            'started, finished, result_size FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            raise JobNotFound(job_id)
+
+        (job_id, fmt, status, total, done, failed, created, started,
+         finished, result_size) = row
+        completed = done + failed
+        elapsed = ((finished or time.time()) - started) if started else 0
+        rate = completed / elapsed if elapsed > 0 else None
+        eta = None
+        if status in ('queued', 'running') and rate:
+            eta = round((total - completed) / rate, 1)
+        return {
+            'id': job_id,
+            'format': fmt,
+            'status': status,
+            'total': total,
+            'done': done,
+            'failed': failed,
+            'progress': round(completed / total, 4) if total else 1.0,
+            'items_per_sec': round(rate, 1) if rate else None,
+            'eta_seconds': eta,
+            'created': created,
+            'started': started,
+            'finished': finished,
+            'result_bytes': result_size,
+        }
+
+    def claim(self, limit):
+        """
+        Захватывает до ``limit`` необработанных элементов самого старого
+        задания, не отложенного через ``release``. Возвращает (id задания,
+        формат, ключ клиента, [(индекс, параметры)]).
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for job_id, fmt, client in conn.execute(
+                'SELECT id, format, client FROM jobs '
+                "WHERE status IN ('queued', 'running') "
+                'AND (not_before IS NULL OR not_before <= ?) ORDER BY created',
+                (now,)
+            ).fetchall():
+                # Сначала элементы с истекшим lease, затем новые
+                rows = conn.execute(
+                    'SELECT rowid FROM items WHERE job_id = ? '
+                    "AND status = 'running' AND claimed < ? LIMIT ?",
+                    (job_id, now - self.lease, limit)
+                ).fetchall()
+                rows += conn.execute(
+                    'SELECT rowid FROM items WHERE job_id = ? '
+                    "AND status = 'pending' ORDER BY idx LIMIT ?",
+                    (job_id, limit - len(rows))
+                ).fetchall()
+                if rows:
+                    break
+            else:
+                return None
+            rows = [
+                conn.execute(
+                    "UPDATE items SET status = 'running', claimed = ? "
+                    'WHERE rowid = ? RETURNING idx, options', (now, rowid)
+                ).fetchone()
+                for rowid, in rows
+            ]
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started = COALESCE(started, ?) "
+                'WHERE id = ?', (now, job_id)
+            )
+        rows.sort()
+        return (
+            job_id, fmt, None if client is None else int(client),
+            [(index, json.loads(options)) for index, options in rows]
+        )
+
+    def release(self, job_id, indexes, not_before):
+        """
+        Возвращает захваченные элементы в очередь и откладывает задание до
+        ``not_before``: у клиента кончились токены.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                "UPDATE items SET status = 'pending', claimed = NULL "
+                "WHERE job_id = ? AND idx = ? AND status = 'running'",
+                ((job_id, index) for index in indexes)
+            )
+            conn.execute(
+                'UPDATE jobs SET not_before = ? WHERE id = ?', (not_before, job_id)
+            )
+
+    def known_info(self, digest):
+        """
+        Метаданные элемента с тем же ключом рендера, уже обработанного в
+        этом или другом задании.
+        """
+        row = self._connect().execute(
+            "SELECT info FROM items WHERE digest = ? AND status = 'done' "
+            'LIMIT 1', (digest,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def object_path(self, digest, extension):
+        return os.path.join(self.root, 'objects', digest[:2], f'{digest}.{extension}')
+
+    def reuse_object(self, digest, extension):
+        """
+        Проверяет, что изображение есть в хранилище, и обновляет его mtime:
+        ``cleanup`` не удаляет недавно использованные изображения, ссылка
+        на которые еще не записана через ``complete``.
+        """
+        try:
+            os.utime(self.object_path(digest, extension))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put_object(self, digest, extension, body):
+        path = self.object_path(digest, extension)
+        if self.reuse_object(digest, extension):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+    def complete(self, job_id, results):
+        """
+        Отмечает элементы обработанными. ``results`` - кортежи
+        (индекс, digest, info, error); при ошибке digest и info - None.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            done = failed = 0
+            for index, digest, info, error in results:
+                status = 'failed' if error else 'done'
+                updated = conn.execute(
+                    'UPDATE items SET status = ?, digest = ?, info = ?, '
+                    "error = ? WHERE job_id = ? AND idx = ? AND status = 'running'",
+                    (
+                        status, digest,
+                        None if info is None else json.dumps(info, ensure_ascii=False),
+                        error, job_id, index
+                    )
+                ).rowcount
+                if updated:
+                    done += not error
+                    failed += bool(error)
+            conn.execute(
+                'UPDATE jobs SET done = done + ?, failed = failed + ? '
+                'WHERE id = ?', (done, failed, job_id)
+            )
+
+    def claim_packing(self):
+        """
+        Захватывает упаковку задания, все элементы которого обработаны.
+
+        Упаковка, не завершенная за ``lease`` секунд (воркер умер),
+        захватывается повторно. Возвращает (id задания, формат) или None.
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT id, format FROM jobs WHERE ('
+                "status = 'running' AND NOT EXISTS (SELECT 1 FROM items "
+                'WHERE items.job_id = jobs.id '
+                "AND items.status IN ('pending', 'running'))"
+                ") OR (status = 'packing' AND finished < ?) LIMIT 1",
+                (now - self.lease,)
+            ).fetchone()
+            if row is None:
+                return None
+            # finished до завершения упаковки - время ее начала
+            conn.execute(
+                "UPDATE jobs SET status = 'packing', finished = ? WHERE id = ?",
+                (now, row[0])
+            )
+        return row
+
+    def iter_items(self, job_id):
+        yield from self._connect().execute(
+            'SELECT idx, options, digest, info, error FROM items '
+            'WHERE job_id = ? ORDER BY idx', (job_id,)
+        )
+
+    def result_path(self, job_id):
+        return os.path.join(self.root, 'results', f'{job_id}.zip')
+
+    def pack(self, job_id, fmt, extension):
+        """
+        Собирает ZIP с изображениями и manifest.ndjson и завершает задание.
+
+        Архив пишется во временный файл и подменяется атомарно, поэтому
+        частично записанный ZIP никогда не отдается клиенту.
+        """
+        path = self.result_path(job_id)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with zipfile.ZipFile(tmp, 'w', compression=zipfile.ZIP_STORED) as archive:
+            with archive.open('manifest.ndjson', 'w') as manifest:
+                for index, options, digest, info, error in self.iter_items(job_id):
+                    entry = {'index': index}
+                    name = json.loads(options).get('name')
+                    if name:
+                        entry['name'] = name
+                    if error:
+                        entry.update(success=False, error=error)
+                    else:
+                        entry.update(success=True, digest=digest, info=json.loads(info))
+                        entry['file'] = item_filename(entry, extension)
+                    manifest.write(
+                        (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+                    )
+            # Изображения после манифеста: zipfile не пишет две записи сразу
+            for index, options, digest, info, error in self.iter_items(job_id):
+                if error:
+                    continue
+                entry = {'index': index, 'name': json.loads(options).get('name')}
+                archive.write(
+                    self.object_path(digest, extension),
+                    item_filename(entry, extension)
+                )
+        os.replace(tmp, path)
+
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET status = 'done', finished = ?, result_size = ? "
+            'WHERE id = ?', (time.time(), os.path.getsize(path), job_id)
+        )
+
+    def cleanup(self, extensions):
+        """
+        Удаляет задания, завершенные более ``ttl`` секунд назад, их архивы
+        и изображения без других ссылок. ``extensions`` - расширение файла
+        для каждого формата. Возвращает число удаленных заданий.
+        """
+        if not self.ttl:
+            return 0
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            expired = [
+                job_id for job_id, in conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'done' AND finished < ?",
+                    (now - self.ttl,)
+                )
+            ]
+            objects = set()
+            for job_id in expired:
+                objects.update(conn.execute(
+                    'SELECT DISTINCT items.digest, jobs.format FROM items '
+                    'JOIN jobs ON jobs.id = items.job_id '
+                    'WHERE items.job_id = ? AND items.digest IS NOT NULL',
+                    (job_id,)
+                ))
+                conn.execute('DELETE FROM items WHERE job_id = ?', (job_id,))
+                conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+            orphans = [
+                (digest, fmt) for digest, fmt in objects
+                if conn.execute(
+                    'SELECT 1 FROM items WHERE digest = ? LIMIT 1', (digest,)
+                ).fetchone() is None
+            ]
+
+        for job_id in expired:
+            _remove(self.result_path(job_id))
+        for digest, fmt in orphans:
+            path = self.object_path(digest, extensions[fmt])
+            try:
+                # Изображение могли взять повторно после выборки ссылок
+                if os.path.getmtime(path) < now - self.lease:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(expired)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class JobRunner:
+    """
+    Фоновый поток воркера, который обрабатывает очередь ``JobStore``.
+
+    Элементы захватываются порциями по ``chunk_size`` и рендерятся в пуле
+    процессов ``get_pool()`` функцией ``render_item(index, item, fmt)``
+    (результат в формате render_batch_item). ``item_key(item, fmt)``
+    возвращает ключ рендера: если изображение с этим ключом уже есть в
+    хранилище, элемент не рендерится. ``charge(client, item, fmt)``
+    списывает стоимость элемента с бакета клиента и возвращает 0 или
+    число секунд до пополнения: тогда остаток порции возвращается в
+    очередь, а задание откладывается. Поток запускается в каждом процессе
+    отдельно (после форка) через ``ensure_started()``. Раз в
+    ``cleanup_interval`` секунд поток удаляет устаревшие задания
+    (``JobStore.cleanup``).
+    """
+
+    def __init__(self, store, render_item, item_key, get_pool, extensions,
+                 chunk_size=64, poll_interval=1.0, charge=None,
+                 cleanup_interval=60.0):
+        self.store = store
+        self.render_item = render_item
+        self.item_key = item_key
+        self.charge = charge
+        self.get_pool = get_pool
+        self.extensions = extensions
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.cleanup_interval = cleanup_interval
+        self._next_cleanup = 0.0
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(
+                target=self._run, name='qr-jobs', daemon=True
+            ).start()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            if time.monotonic() >= self._next_cleanup:
+                self._next_cleanup = time.monotonic() + self.cleanup_interval
+                try:
+                    self.store.cleanup(self.extensions)
+                except (sqlite3.Error, OSError) as e:
+                    print(f'Job cleanup error: {e}')
+            try:
+                claimed = self.store.claim(self.chunk_size)
+            except sqlite3.Error as e:
+                print(f'Job queue error: {e}')
+                claimed = None
+            try:
+                if claimed is not None:
+                    self.process(*claimed)
+                packing = self.store.claim_packing()
+                if packing is not None:
+                    job_id, fmt = packing
+                    self.store.pack(job_id, fmt, self.extensions[fmt])
+            except Exception as e:
+                # Элементы и упаковка вернутся в очередь по истечении lease
+                print(f'Job processing error: {e}')
+                packing = None
+            if claimed is None and packing is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def process(self, job_id, fmt, client, items):
+        extension = self.extensions[fmt]
+        results = []
+        to_render = []
+        for position, (index, item) in enumerate(items):
+            try:
+                if self.charge is not None:
+                    delay = self.charge(client, item, fmt)
+                    if delay:
+                        self.store.release(
+                            job_id, [index for index, _ in items[position:]],
+                            time.time() + delay
+                        )
+                        break
+                digest = self.item_key(item, fmt)
+            except Exception as e:
+                results.append((index, None, None, str(e)))
+                continue
+            info = self.store.known_info(digest)
+            if info is not None and self.store.reuse_object(digest, extension):
+                results.append((index, digest, info, None))
+            else:
+                to_render.append((index, item, digest))
+
+        rendered = iter_results(
+            self.get_pool(), partial(self.render_item, fmt=fmt),
+            [item for _, item, _ in to_render], window=self.chunk_size
+        )
+        for (index, _, digest), result in zip(to_render, rendered):
+            if not result['success']:
+                results.append((index, None, None, result['error']))
+                continue
+            self.store.put_object(digest, extension, result['body'])
+            results.append((index, digest, result['info'], None))
+
+        self.store.complete(job_id, results)
@@ -0,0 +1,242 @@
+import threading
+import time
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+# Метки стадий рендера
+STAGE_LABELS = ('stage', 'size', 'error_level', 'version', 'format')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        f'{name}="{str(value)}"'.replace('\n', ' ')
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+class Histogram:
+    """
+    Гистограмма в формате Prometheus с фиксированным набором меток.
+    """
+
+    def __init__(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, value, labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += 1
+        series[2] += value
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, (buckets, count, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, buckets):
+                cumulative += bucket
+                yield (
+                    f'{self.name}_bucket'
+                    f'{_format_labels(self.labelnames + ("le",), labels + (bound,))}'
+                    f' {cumulative}'
+                )
+            yield (
+                f'{self.name}_bucket'
+                f'{_format_labels(self.labelnames + ("le",), labels + ("+Inf",))}'
+                f' {count}'
+            )
+            label_text = _format_labels(self.labelnames, labels)
+            yield f'{self.name}_count{label_text} {count}'
+            yield f'{self.name}_sum{label_text} {total}'
+
+
+class Counter:
+    """
+    Счетчик в формате Prometheus с фиксированным набором меток.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+
+    def inc(self, labels=(), amount=1):
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in sorted(self._series.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+
+
+class _NullTimer:
+    """
+    Таймер-заглушка для выключенных метрик.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ('registry', 'labels', 'started')
+
+    def __init__(self, registry, labels):
+        self.registry = registry
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe_stage(
+            self.labels, time.perf_counter() - self.started
+        )
+        return False
+
+
+class MetricsRegistry:
+    """
+    Метрики процесса: гистограмма стадий рендера, счетчики и коллекторы.
+
+    При ``enabled=False`` ``timed()`` возвращает общий объект-заглушку,
+    а ``inc()`` сразу выходит, так что инструментирование почти ничего
+    не стоит.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.stage_seconds = Histogram(
+            'qr_render_stage_seconds',
+            'Duration of QR render pipeline stages',
+            STAGE_LABELS
+        )
+        self._counters = {}
+        self._collectors = []
+
+    def timed(self, stage, size='', error_level='', version='', fmt=''):
+        """
+        Контекстный менеджер, замеряющий длительность стадии рендера.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(
+            self, (stage, size, error_level, str(version), fmt)
+        )
+
+    def observe(self, stage, seconds, size='', error_level='', version='',
+                fmt=''):
+        """
+        Записывает уже измеренную длительность стадии.
+        """
+        if not self.enabled:
+            return
+        self.observe_stage(
+            (stage, size, error_level, str(version), fmt), seconds
+        )
+
+    def observe_stage(self, labels, seconds):
+        with self._lock:
+            self.stage_seconds.observe(seconds, labels)
+
+    def counter(self, name, documentation, labelnames=()):
+        counter = Counter(name, documentation, labelnames)
+        self._counters[name] = counter
+        return counter
+
+    def inc(self, name, *labels, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name].inc(labels, amount)
+
+    def register_collector(self, collect):
+        """
+        Регистрирует функцию, отдающую строки метрик в момент запроса.
+        """
+        self._collectors.append(collect)
+
+    def render(self):
+        """
+        Все метрики в текстовом формате Prometheus.
+        """
+        with self._lock:
+            lines = list(self.stage_seconds.collect())
+            for counter in self._counters.values():
+                lines.extend(counter.collect())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return '\n'.join(lines) + '\n'
+
+
+def gauge_lines(name, documentation, values, labelname=None, kind='gauge'):
+    """
+    Строки метрики из словаря ``{значение метки: значение}`` или числа.
+    """
+    yield f'# HELP {name} {documentation}'
+    yield f'# TYPE {name} {kind}'
+    if labelname is None:
+        yield f'{name} {values}'
+        return
+    for label, value in sorted(values.items()):
+        yield f'{name}{_format_labels((labelname,), (label,))} {value}'
+
+
+class EncodeStats:
+    """
+    Счетчики размера и времени кодирования PNG по пресетам размера.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sizes = {}
+
+    def record(self, size_id, nbytes, seconds):
+        with self._lock:
+            entry = self._sizes.setdefault(
+                size_id, {'codes': 0, 'bytes': 0, 'seconds': 0.0}
+            )
+            entry['codes'] += 1
+            entry['bytes'] += nbytes
+            entry['seconds'] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                size_id: {
+                    'codes': entry['codes'],
+                    'bytes_total': entry['bytes'],
+                    'bytes_per_code': round(entry['bytes'] / entry['codes']),
+                    'encode_ms_avg': round(
+                        entry['seconds'] * 1000 / entry['codes'], 3
+                    ),
+                }
+                for size_id, entry in self._sizes.items()
+            }
@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него отдаем только gzip
+    brotli = None
+
+# Кодировки в порядке предпочтения
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+
+class CachedPage:
+    """
+    Готовый ответ: тело, сжатые варианты, ETag и время изменения.
+    """
+
+    __slots__ = ('body', 'mimetype', 'etag', 'last_modified', 'variants',
+                 'sources', 'mtimes', 'checked')
+
+    def __init__(self, body, mimetype, sources, mtimes, min_size=256):
+        self.body = body
+        self.mimetype = mimetype
+        self.sources = sources
+        self.mtimes = mtimes
+        self.checked = time.monotonic()
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.last_modified = max(mtimes) if mtimes else time.time()
+
+        self.variants = {}
+        if len(body) >= min_size:
+            compressed = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli:
+                compressed['br'] = brotli.compress(body)
+            self.variants = {
+                encoding: data for encoding, data in compressed.items()
+                if len(data) < len(body)
+            }
+
+    def select(self, accepted):
+        """
+        Выбирает вариант по ``accepted(encoding) -> качество``.
+
+        Возвращает тело, кодировку (или None) и ETag варианта.
+        """
+        for encoding in ENCODINGS:
+            if encoding in self.variants and accepted(encoding):
+                return self.variants[encoding], encoding, f'{self.etag}-{encoding}'
+        return self.body, None, self.etag
+
+
+class PageCache:
+    """
+    Кэш страниц, которые не зависят от запроса.
+
+    Страница рендерится один раз и перерисовывается, только если у одного
+    из исходных файлов изменилось время модификации. Файлы проверяются не
+    чаще раза в ``check_interval`` секунд.
+    """
+
+    def __init__(self, check_interval=2.0, min_size=256):
+        self.check_interval = check_interval
+        self.min_size = min_size
+        self._pages = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+
+    @staticmethod
+    def _mtimes(sources):
+        return tuple(os.path.getmtime(path) for path in sources)
+
+    def get(self, key, render, sources=(), mimetype='text/html'):
+        """
+        Возвращает ``CachedPage``; ``render()`` вызывается при промахе.
+        """
+        page = self._pages.get(key)
+        now = time.monotonic()
+        if page is not None:
+            if now - page.checked < self.check_interval:
+                self.hits += 1
+                return page
+            if self._mtimes(page.sources) == page.mtimes:
+                page.checked = now
+                self.hits += 1
+                return page
+
+        with self._lock:
+            page = self._pages.get(key)
+            mtimes = self._mtimes(sources)
+            if page is None or page.mtimes != mtimes:
+                body = render()
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                page = CachedPage(
+                    body, mimetype, tuple(sources), mtimes, self.min_size
+                )
+                self._pages[key] = page
+                self.renders += 1
+            return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        return {
+            'pages': len(self._pages),
+            'bytes': sum(
+                len(page.body) + sum(map(len, page.variants.values()))
+                for page in self._pages.values()
+            ),
+            'hits': self.hits,
+            'renders': self.renders,
+        }
@@ -0,0 +1,113 @@
+import struct
+import zlib
+from io import BytesIO
+from itertools import chain
+
+from PIL import Image, ImageColor
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Стратегии zlib для сжатия PNG
+ZLIB_STRATEGIES = {
+    'default': zlib.Z_DEFAULT_STRATEGY,
+    'filtered': zlib.Z_FILTERED,
+    'huffman': zlib.Z_HUFFMAN_ONLY,
+    'rle': zlib.Z_RLE,
+    'fixed': zlib.Z_FIXED,
+}
+
+
+def get_palette(fill_color, back_color='white'):
+    """
+    Палитра из двух цветов: индекс 0 - фон, индекс 1 - модули.
+    """
+    return bytes(ImageColor.getrgb(back_color)[:3] + ImageColor.getrgb(fill_color)[:3])
+
+
+def rasterize(matrix, box_size, fill_color, back_color='white'):
+    """
+    Строит изображение QR-кода из матрицы модулей без отрисовки по модулю.
+
+    Матрица (вместе с рамкой, как ее отдает ``QRCode.get_matrix()``)
+    превращается в изображение 1 пиксель = 1 модуль, которое затем
+    масштабируется одним вызовом ``resize`` с ``NEAREST``. Результат -
+    палитровое изображение из двух цветов.
+    """
+    width = len(matrix)
+    image = Image.frombytes('P', (width, width), bytes(chain.from_iterable(matrix)))
+    image.putpalette(get_palette(fill_color, back_color))
+    if box_size != 1:
+        image = image.resize(
+            (width * box_size, width * box_size), Image.Resampling.NEAREST
+        )
+    return image
+
+
+def encode_png(image, compress_level=6, strategy='default'):
+    """
+    Кодирует изображение QR-кода в 1-битный PNG с палитрой из двух цветов.
+
+    Полноцветные изображения (движок 'pil') переводятся в палитру без
+    потерь: в QR-коде ровно два цвета.
+    """
+    if image.mode not in ('1', 'P'):
+        image = image.convert('P', palette=Image.Palette.ADAPTIVE, colors=2)
+
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        format='PNG',
+        compress_level=compress_level,
+        compress_type=ZLIB_STRATEGIES[strategy]
+    )
+    return buffer.getvalue()
+
+
+def _png_chunk(tag, data):
+    return (
+        struct.pack('>I', len(data)) + tag + data
+        + struct.pack('>I', zlib.crc32(tag + data))
+    )
+
+
+def iter_png(matrix, box_size, fill_color, back_color='white',
+             compress_level=6, strategy='default'):
+    """
+    Потоково кодирует матрицу модулей в 1-битный PNG с палитрой.
+
+    Растр целиком не строится: для каждой строки модулей один раз
+    упаковывается строка пикселей, которая ``box_size`` раз подается в
+    zlib, а сжатые данные отдаются чанками IDAT по мере готовности. Пиковая
+    память - несколько строк изображения, а не все изображение.
+    """
+    width = len(matrix) * box_size
+    row_bytes = (width + 7) // 8
+    yield (
+        PNG_SIGNATURE
+        + _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, width, 1, 3, 0, 0, 0))
+        + _png_chunk(b'PLTE', get_palette(fill_color, back_color))
+    )
+
+    compressor = zlib.compressobj(
+        compress_level, strategy=ZLIB_STRATEGIES[strategy]
+    )
+    dark, light = '1' * box_size, '0' * box_size
+    padding = '0' * (row_bytes * 8 - width)
+    for row in matrix:
+        bits = ''.join([dark if module else light for module in row]) + padding
+        # Байт 0 перед строкой - фильтр None
+        scanline = b'\x00' + int(bits, 2).to_bytes(row_bytes, 'big')
+        data = compressor.compress(scanline * box_size)
+        if data:
+            yield _png_chunk(b'IDAT', data)
+    yield _png_chunk(b'IDAT', compressor.flush()) + _png_chunk(b'IEND', b'')
+
+
+def encode_matrix_png(matrix, box_size, fill_color, back_color='white',
+                      compress_level=6, strategy='default'):
+    """
+    PNG из матрицы модулей через ``iter_png`` одним объектом bytes.
+    """
+    return b''.join(iter_png(
+        matrix, box_size, fill_color, back_color, compress_level, strategy
+    ))
@@ -0,0 +1,226 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+
+
+class RateLimited(Exception):
+    """
+    У клиента закончились токены на рендер.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__('Rate limit exceeded')
+        self.retry_after = retry_after
+
+
+class RenderTooLarge(Exception):
+    """
+    Данные не помещаются в QR-код или рендер превысит бюджет памяти.
+    """
+
+
+def estimate_version(nbytes, error_correction):
+    """
+    Версия QR-кода для ``nbytes`` байт без создания QRCode.
+
+    Берется из таблицы емкости байтового режима - это верхняя оценка:
+    сегментация может ее только уменьшить.
+    """
+    from capacity import CAPACITY
+
+    capacity = CAPACITY[error_correction]['byte']
+    return min(bisect_left(capacity, nbytes, 1), 40)
+
+
+def estimate_cost(nbytes, box_size, error_correction):
+    """
+    Оценка стоимости рендера в токенах до создания QRCode.
+
+    Время кодирования растет как квадрат числа модулей, растеризация - еще
+    и как квадрат box_size. QR-код версии 1 мелкого размера стоит около
+    одного токена.
+    """
+    modules = 17 + 4 * estimate_version(nbytes, error_correction)
+    return modules * modules * (1 + box_size * box_size / 1333) / 441
+
+
+def estimate_render_memory(nbytes, selected_size, error_correction, fmt,
+                           renderer, inline=False):
+    """
+    Верхняя оценка памяти (в байтах), которую займет один рендер.
+
+    Потоковый PNG-кодировщик (движок 'fast') держит несколько строк
+    растра, поэтому его вклад - размер несжатых строк как предел
+    результата. Движок 'pil' строит RGB-изображение и его палитровую
+    копию. При ``inline`` ответ дополнительно содержит base64 и строку
+    JSON/HTML с ним.
+    """
+    modules = (
+        17 + 4 * estimate_version(nbytes, error_correction)
+        + 2 * selected_size['border']
+    )
+    width = modules * selected_size['box_size']
+    if fmt == 'png':
+        body = width * ((width + 7) // 8 + 1)
+        total = body if renderer == 'fast' else body + 4 * width * width
+    elif fmt == 'matrix':
+        # Модули, упакованные по битам
+        body = total = (modules * modules + 7) // 8
+    else:
+        # Векторные форматы: до нескольких десятков байт на модуль
+        body = total = modules * modules * (64 if fmt == 'svg' else 32)
+    if inline:
+        total += body * 8 // 3
+    return total
+
+
+def client_key(api_key, remote_addr, valid_keys=frozenset()):
+    """
+    64-битный ключ бакета: API-ключ, если он есть среди ``valid_keys``,
+    иначе IP-адрес.
+
+    Произвольный ключ из заголовка не учитывается, иначе клиент получал
+    бы полный бакет, меняя ключ в каждом запросе.
+    """
+    if api_key and api_key in valid_keys:
+        identity = f'key:{api_key}'
+    else:
+        identity = f'ip:{remote_addr}'
+    digest = hashlib.blake2b(identity.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') or 1
+
+
+class LocalBucketBackend:
+    """
+    Бакеты в памяти процесса: у каждого воркера свои лимиты.
+    """
+
+    def __init__(self, max_clients=65536):
+        self.max_clients = max_clients
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, func):
+        with self._lock:
+            tokens, updated = func(*self._buckets.get(key, (None, None)))
+            if key not in self._buckets and len(self._buckets) >= self.max_clients:
+                # Вытесняем клиента, который дольше всех не обращался
+                oldest = min(self._buckets, key=lambda k: self._buckets[k][1])
+                del self._buckets[oldest]
+            self._buckets[key] = (tokens, updated)
+            return tokens
+
+
+class SharedBucketBackend:
+    """
+    Бакеты в файле, отображенном в память (например, в /dev/shm), общие
+    для всех воркеров gunicorn на машине.
+
+    Файл - хеш-таблица из ``slots`` записей (ключ, токены, время) с
+    открытой адресацией. Запись защищена threading.Lock внутри процесса
+    и fcntl.flock между процессами; после форка файл открывается заново,
+    потому что flock на унаследованном дескрипторе не разделяет процессы.
+    """
+
+    RECORD = struct.Struct('<Qdd')
+    PROBES = 8
+
+    def __init__(self, path, slots=16384):
+        self.path = path
+        self.slots = slots
+        self.size = slots * self.RECORD.size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._open()
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < self.size:
+            os.ftruncate(fd, self.size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self.size)
+        self._pid = os.getpid()
+
+    def update(self, key, func):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                slot, tokens, updated = self._find(key)
+                tokens, updated = func(tokens, updated)
+                self.RECORD.pack_into(
+                    self._map, slot * self.RECORD.size, key, tokens, updated
+                )
+                return tokens
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _find(self, key):
+        """
+        Слот с ключом ``key`` или слот под новую запись (пустой либо самый
+        старый в окне проб).
+        """
+        start = key % self.slots
+        victim, victim_updated = start, math.inf
+        for probe in range(self.PROBES):
+            slot = (start + probe) % self.slots
+            stored, tokens, updated = self.RECORD.unpack_from(
+                self._map, slot * self.RECORD.size
+            )
+            if stored == key:
+                return slot, tokens, updated
+            if stored == 0:
+                return slot, None, None
+            if updated < victim_updated:
+                victim, victim_updated = slot, updated
+        return victim, None, None
+
+
+class RateLimiter:
+    """
+    Токен-бакеты с учетом стоимости запроса.
+
+    Бакет клиента пополняется на ``rate`` токенов в секунду до ``burst``.
+    Запрос списывает свою стоимость или отклоняется с ``RateLimited``,
+    в котором указано, через сколько секунд токенов хватит. Запрос дороже
+    ``burst`` не пройдет никогда и сразу отклоняется с ``RenderTooLarge``.
+    """
+
+    def __init__(self, rate=50.0, burst=500.0, backend=None):
+        self.rate = rate
+        self.burst = burst
+        self.backend = backend or LocalBucketBackend()
+        self.rejected = 0
+
+    def acquire(self, key, cost):
+        if cost > self.burst:
+            self.rejected += 1
+            raise RenderTooLarge(
+                'Запрос дороже лимита на клиента: разбейте пакет на части '
+                'или поставьте его в очередь /api/jobs'
+            )
+        now = time.time()
+        state = {}
+
+        def take(tokens, updated):
+            if tokens is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            state['allowed'] = tokens >= cost
+            if state['allowed']:
+                tokens -= cost
+            return tokens, now
+
+        tokens = self.backend.update(key, take)
+        if not state['allowed']:
+            self.rejected += 1
+            raise RateLimited(max(1, math.ceil((cost - tokens) / self.rate)))
+        return tokens
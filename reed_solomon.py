@@ -0,0 +1,199 @@
+"""
+Кодовые слова QR-кода: данные и коррекция ошибок Reed-Solomon.
+
+Таблицы GF(256), порождающие многочлены и раскладка блоков для всех
+версий и уровней коррекции строятся при импорте модуля. Остаток деления
+блока на многочлен считается сдвиговым регистром в одном целом числе по
+таблице ``f * g(x)`` для каждого байта обратной связи, а блоки
+перемежаются срезами ``bytearray``. Результат совпадает байт в байт с
+``qrcode.util.create_data``.
+"""
+from qrcode import base, constants, exceptions, util
+
+# Поле GF(256) с порождающим многочленом x^8 + x^4 + x^3 + x^2 + 1.
+# Таблица антилогарифмов удвоена, чтобы сумму логарифмов не брать по
+# модулю 255; LOG[0] не определен и равен 0
+EXP = bytearray(512)
+LOG = bytearray(256)
+_value = 1
+for _power in range(255):
+    EXP[_power] = EXP[_power + 255] = _value
+    LOG[_value] = _power
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+EXP[510:] = EXP[:2]
+
+# Заполнение свободных байт данных: 0xEC, 0x11, 0xEC, ...
+_PADDING = bytes((util.PAD0, util.PAD1))
+
+LEVELS = (
+    constants.ERROR_CORRECT_L, constants.ERROR_CORRECT_M,
+    constants.ERROR_CORRECT_Q, constants.ERROR_CORRECT_H,
+)
+
+
+def generator(ec_count):
+    """
+    Коэффициенты порождающего многочлена (x - a^0)...(x - a^(n-1)) без
+    старшей единицы, от старшего к младшему.
+    """
+    poly = bytearray([1])
+    for power in range(ec_count):
+        factor = EXP[power]
+        shifted = poly + b'\0'
+        for index in range(1, len(shifted)):
+            if poly[index - 1]:
+                shifted[index] ^= EXP[LOG[poly[index - 1]] + LOG[factor]]
+        poly = shifted
+    return bytes(poly[1:])
+
+
+def feedback_table(coefficients):
+    """
+    Для каждого байта обратной связи f - произведение f * g(x) одним
+    целым (старший коэффициент в старшем байте).
+
+    Столбец таблицы для коэффициента c - это ``LOG`` через ``translate``
+    по антилогарифмам, сдвинутым на log(c), без цикла по 256 значениям.
+    """
+    count = len(coefficients)
+    rows = bytearray(256 * count)
+    for index, coefficient in enumerate(coefficients):
+        if coefficient:
+            offset = LOG[coefficient]
+            rows[count + index::count] = LOG[1:].translate(EXP[offset:offset + 256])
+    return [
+        int.from_bytes(rows[offset:offset + count], 'big')
+        for offset in range(0, len(rows), count)
+    ]
+
+
+class Layout:
+    """
+    Блоки версии и уровня коррекции: общее число байт данных, число байт
+    коррекции на блок, длина коротких блоков и их число (длинные блоки
+    на байт длиннее и идут после коротких).
+    """
+
+    __slots__ = ('block_count', 'data_count', 'total_count', 'ec_count',
+                 'short_count', 'short_length', 'table')
+
+    def __init__(self, rs_blocks, tables):
+        lengths = [block.data_count for block in rs_blocks]
+        self.block_count = len(rs_blocks)
+        self.data_count = sum(lengths)
+        self.total_count = sum(block.total_count for block in rs_blocks)
+        self.ec_count = rs_blocks[0].total_count - lengths[0]
+        self.short_length = lengths[0]
+        self.short_count = lengths.count(lengths[0])
+        self.table = tables[self.ec_count]
+
+
+def _build_layouts():
+    layouts = {}
+    tables = {}
+    for version in range(1, 41):
+        for level in LEVELS:
+            rs_blocks = base.rs_blocks(version, level)
+            ec_count = rs_blocks[0].total_count - rs_blocks[0].data_count
+            if ec_count not in tables:
+                tables[ec_count] = feedback_table(generator(ec_count))
+            layouts[version, level] = Layout(rs_blocks, tables)
+    return layouts
+
+
+LAYOUTS = _build_layouts()
+
+
+def remainder(block, table, ec_count):
+    """
+    Байты коррекции блока: остаток от деления block(x) * x^n на g(x).
+    """
+    shift = 8 * (ec_count - 1)
+    mask = (1 << 8 * ec_count) - 1
+    value = 0
+    for byte in block:
+        value = ((value << 8) & mask) ^ table[(value >> shift) ^ byte]
+    return value.to_bytes(ec_count, 'big')
+
+
+def create_bytes(data, layout):
+    """
+    Перемежает байты данных и коррекции всех блоков: сначала i-е байты
+    данных каждого блока, затем i-е байты коррекции.
+    """
+    out = bytearray(layout.total_count)
+    blocks = layout.block_count
+    short = layout.short_length
+    short_end = short * blocks
+    table = layout.table
+    ec_count = layout.ec_count
+    offset = 0
+    for index in range(blocks):
+        length = short if index < layout.short_count else short + 1
+        block = data[offset:offset + length]
+        offset += length
+        out[index:short_end:blocks] = block[:short]
+        if length > short:
+            out[short_end + index - layout.short_count] = block[short]
+        out[layout.data_count + index::blocks] = remainder(block, table, ec_count)
+    return bytes(out)
+
+
+class BitWriter:
+    """
+    Замена ``util.BitBuffer`` для ``QRData.write``: биты копятся в целом
+    числе, целые байты переносятся в ``bytearray`` одним ``to_bytes``.
+    """
+
+    __slots__ = ('buffer', 'value', 'bits')
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.value = 0
+        self.bits = 0
+
+    def __len__(self):
+        return len(self.buffer) * 8 + self.bits
+
+    def put(self, num, length):
+        self.value = (self.value << length) | (num & ((1 << length) - 1))
+        self.bits += length
+        if self.bits >= 8:
+            rest = self.bits & 7
+            self.buffer += (self.value >> rest).to_bytes(self.bits >> 3, 'big')
+            self.value &= (1 << rest) - 1
+            self.bits = rest
+
+
+def create_data(version, error_correction, data_list):
+    """
+    Кодовые слова для ``QRCode.data_cache``; то же, что
+    ``util.create_data``, но ``bytes`` вместо списка.
+    """
+    layout = LAYOUTS[version, error_correction]
+    writer = BitWriter()
+    for data in data_list:
+        writer.put(data.mode, 4)
+        writer.put(len(data), util.length_in_bits(data.mode, version))
+        if data.mode == util.MODE_8BIT_BYTE:
+            writer.put(int.from_bytes(data.data, 'big'), 8 * len(data.data))
+        else:
+            data.write(writer)
+
+    bit_limit = layout.data_count * 8
+    if len(writer) > bit_limit:
+        raise exceptions.DataOverflowError(
+            "Code length overflow. Data size (%s) > size available (%s)"
+            % (len(writer), bit_limit)
+        )
+
+    # Терминатор до четырех нулевых бит и добивка нулями до байта
+    writer.put(0, min(bit_limit - len(writer), 4))
+    writer.put(0, -len(writer) % 8)
+
+    data = writer.buffer
+    fill = layout.data_count - len(data)
+    data += (_PADDING * (fill // 2 + 1))[:fill]
+    return create_bytes(data, layout)
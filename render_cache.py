@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def make_cache_key(*parts):
+    """
+    Строит ключ кэша из нормализованных параметров рендера.
+    """
+    payload = json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SqliteCacheBackend:
+    """
+    Общий для всех воркеров кэш на базе sqlite-файла.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl=3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS renders ('
+                'key TEXT PRIMARY KEY, body BLOB NOT NULL, meta TEXT NOT NULL, '
+                'size INTEGER NOT NULL, created REAL NOT NULL, '
+                'accessed REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS renders_accessed '
+                'ON renders (accessed)'
+            )
+
+    def _connect(self):
+        # Соединение sqlite нельзя разделять между потоками и процессами
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT body, meta, created FROM renders WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        body, meta, created = row
+        now = time.time()
+        if self.ttl and now - created > self.ttl:
+            conn.execute('DELETE FROM renders WHERE key = ?', (key,))
+            return None
+
+        conn.execute(
+            'UPDATE renders SET accessed = ? WHERE key = ?', (now, key)
+        )
+        return bytes(body), json.loads(meta)
+
+    def set(self, key, body, meta):
+        """
+        Сохраняет запись и возвращает количество вытесненных записей.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            'INSERT OR REPLACE INTO renders '
+            '(key, body, meta, size, created, accessed) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (key, body, json.dumps(meta), len(body), now, now)
+        )
+        return self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        evicted = 0
+        if self.ttl:
+            evicted += conn.execute(
+                'DELETE FROM renders WHERE created < ?', (now - self.ttl,)
+            ).rowcount
+
+        total = conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM renders'
+        ).fetchone()[0]
+        while total > self.max_bytes:
+            row = conn.execute(
+                'SELECT key, size FROM renders ORDER BY accessed LIMIT 1'
+            ).fetchone()
+            if row is None:
+                break
+            conn.execute('DELETE FROM renders WHERE key = ?', (row[0],))
+            total -= row[1]
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        self._connect().execute('DELETE FROM renders')
+
+
+class RenderCache:
+    """
+    LRU/TTL кэш готовых QR-кодов с ограничением по памяти.
+
+    Хранит байты изображения и метаданные рендера. Если задан ``backend``,
+    промахи локального кэша проверяются в общем хранилище. Одновременные
+    промахи по одному ключу ждут один рендер (single-flight).
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024,
+                 ttl=3600, backend=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.backend = backend
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Ключ -> Future рендера, который сейчас выполняется
+        self._in_flight = {}
+
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._get_local(key, now)
+            if cached is not None:
+                return cached
+
+        if self.backend is not None:
+            cached = self.backend.get(key)
+            if cached is not None:
+                with self._lock:
+                    self.backend_hits += 1
+                    self._store(key, cached[0], cached[1], now)
+                return cached
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, body, meta):
+        with self._lock:
+            self._store(key, body, meta, time.monotonic())
+
+        if self.backend is not None:
+            evicted = self.backend.set(key, body, meta)
+            if evicted:
+                with self._lock:
+                    self.evictions += evicted
+
+    def get_or_render(self, key, render):
+        """
+        Возвращает запись из кэша или вызывает ``render()`` и сохраняет результат.
+
+        Если тот же ключ уже рендерится в другом потоке, ждет его результат
+        (или исключение) вместо повторного рендера; такие промахи
+        считаются в ``coalesced``.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            # Рендер мог закончиться между get() и захватом блокировки
+            cached = self._get_local(key, time.monotonic())
+            if cached is not None:
+                return cached
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            body, meta = render()
+            self.set(key, body, meta)
+        except BaseException as error:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+        future.set_result((body, meta))
+        return body, meta
+
+    def _get_local(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        body, meta, expires = entry
+        if expires is None or expires > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body, meta
+        self._remove(key)
+        self.evictions += 1
+        return None
+
+    def _store(self, key, body, meta, now):
+        if len(body) > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        expires = now + self.ttl if self.ttl else None
+        self._entries[key] = (body, meta, expires)
+        self._bytes += len(body)
+
+        while (len(self._entries) > self.max_entries
+               or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        body, _, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'backend_hits': self.backend_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._in_flight),
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'shared': self.backend is not None,
+            }
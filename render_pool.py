@@ -0,0 +1,93 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class PoolSaturated(Exception):
+    """
+    Пул рендера и его очередь заполнены.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__('Render pool is saturated')
+        self.retry_after = retry_after
+
+
+class RenderTimeout(Exception):
+    """
+    Рендер не уложился в отведенное время.
+    """
+
+
+class RenderPool:
+    """
+    Ограниченный пул потоков для кодирования и записи изображений.
+
+    Одновременно выполняется не более ``max_workers`` задач, еще
+    ``max_queue`` ждут в очереди. Сверх этого задачи сразу отклоняются
+    с ``PoolSaturated``, чтобы тяжелые запросы не занимали все воркеры
+    сервера и легкие эндпоинты отвечали без задержек.
+    """
+
+    def __init__(self, max_workers=4, max_queue=16, timeout=10.0,
+                 retry_after=1):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='render'
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def submit(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PoolSaturated(self.retry_after)
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            # Задача видит контекст вызывающего потока (приложение Flask)
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, func, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def run(self, func, *args, timeout=None):
+        """
+        Выполняет ``func(*args)`` в пуле и ждет результат не дольше таймаута.
+        """
+        future = self.submit(func, *args)
+        try:
+            return future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise RenderTimeout('Render timed out')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+            }
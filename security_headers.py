@@ -0,0 +1,106 @@
+import secrets
+
+# Заменяется на nonce запроса в режиме CSP с nonce
+NONCE_PLACEHOLDER = '{nonce}'
+
+PERMISSIONS_POLICY = (
+    'accelerometer=(), autoplay=(), camera=(), '
+    'geolocation=(), gyroscope=(), magnetometer=(), '
+    'microphone=(), payment=(), usb=()'
+)
+
+
+def build_csp(policy, nonce=False):
+    """
+    Собирает Content Security Policy из словаря ``{директива: источники}``.
+
+    При ``nonce=True`` в script-src вместо ``'unsafe-inline'`` ставится
+    ``'nonce-{nonce}'`` с подстановкой nonce запроса.
+    """
+    directives = []
+    for directive, sources in policy.items():
+        if isinstance(sources, str):
+            sources = [sources]
+        if nonce and directive == 'script-src':
+            sources = [s for s in sources if s != "'unsafe-inline'"]
+            sources.append(f"'nonce-{NONCE_PLACEHOLDER}'")
+        directives.append(' '.join([directive, *sources]))
+    return '; '.join(directives)
+
+
+class HeaderProfiles:
+    """
+    Готовые наборы заголовков безопасности для статики, страниц и API.
+
+    Наборы считаются один раз при создании приложения, а для ответа
+    выбирается один из них и применяется одним обновлением заголовков.
+    Для ответов, которые уже разрешают кэширование (``public``),
+    используются варианты без заголовков запрета кэширования.
+    """
+
+    def __init__(self, csp, csp_nonce=False, hsts=False):
+        common = {
+            'X-Content-Type-Options': 'nosniff',
+            'X-Frame-Options': 'DENY',
+            'X-XSS-Protection': '0',
+            'Referrer-Policy': 'strict-origin-when-cross-origin',
+            'Permissions-Policy': PERMISSIONS_POLICY,
+            'Cross-Origin-Embedder-Policy': 'require-corp',
+            'Cross-Origin-Opener-Policy': 'same-origin',
+            'Cross-Origin-Resource-Policy': 'same-origin',
+            'X-DNS-Prefetch-Control': 'off',
+        }
+        if hsts:
+            common['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
+
+        self.csp_nonce = csp_nonce
+        if csp_nonce:
+            self.csp_prefix, _, self.csp_suffix = build_csp(
+                csp, nonce=True
+            ).partition(NONCE_PLACEHOLDER)
+        else:
+            common['Content-Security-Policy'] = build_csp(csp)
+
+        no_store = {
+            'Cache-Control': 'no-store, no-cache, must-revalidate, proxy-revalidate',
+            'Pragma': 'no-cache',
+            'Expires': '0',
+        }
+        cors = {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type, X-API-Key',
+            'Access-Control-Expose-Headers': (
+                'X-QR-Version, X-QR-Mask, X-QR-Modules, X-QR-Border'
+            ),
+        }
+
+        # (профиль, ответ уже кэшируемый) -> заголовки
+        self.profiles = {
+            ('static', False): {
+                **common, 'Cache-Control': 'public, max-age=31536000, immutable'
+            },
+            ('dynamic', False): {**common, **no_store},
+            ('dynamic', True): common,
+            ('api', False): {**common, **no_store, **cors},
+            ('api', True): {**common, **cors},
+        }
+        self.profiles[('static', True)] = self.profiles[('static', False)]
+
+    @staticmethod
+    def profile_name(path):
+        if path.startswith('/static/'):
+            return 'static'
+        if path.startswith('/api/'):
+            return 'api'
+        return 'dynamic'
+
+    def get(self, path, cacheable):
+        return self.profiles[(self.profile_name(path), cacheable)]
+
+    def csp_with_nonce(self, nonce):
+        return f'{self.csp_prefix}{nonce}{self.csp_suffix}'
+
+
+def make_nonce():
+    return secrets.token_urlsafe(16)
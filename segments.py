@@ -0,0 +1,203 @@
+from bisect import bisect_left
+from functools import lru_cache
+
+from qrcode import exceptions, util
+
+from capacity import DATA_BITS, VERSION_CLASSES, data_bits
+
+# Режимы в порядке перебора и их названия в метаданных
+SEGMENT_MODES = (
+    util.MODE_NUMBER, util.MODE_ALPHA_NUM, util.MODE_8BIT_BYTE, util.MODE_KANJI
+)
+MODE_NAMES = {
+    util.MODE_NUMBER: 'numeric',
+    util.MODE_ALPHA_NUM: 'alphanumeric',
+    util.MODE_8BIT_BYTE: 'byte',
+    util.MODE_KANJI: 'kanji',
+}
+
+# Стоимость символа в шестых долях бита: 10/3, 11/2, 8 на байт, 13
+_CHAR_COST = {
+    util.MODE_NUMBER: 20,
+    util.MODE_ALPHA_NUM: 33,
+    util.MODE_8BIT_BYTE: 48,
+    util.MODE_KANJI: 78,
+}
+
+_ALPHA_NUM = frozenset(util.ALPHA_NUM.decode('ascii'))
+
+
+class KanjiData(util.QRData):
+    """
+    Сегмент в режиме кандзи (13 бит на символ Shift JIS).
+
+    ``util.QRData`` этот режим не поддерживает.
+    """
+
+    def __init__(self, text):
+        self.mode = util.MODE_KANJI
+        self.data = text.encode('shift_jis')
+
+    def __len__(self):
+        return len(self.data) // 2
+
+    def write(self, buffer):
+        data = self.data
+        for i in range(0, len(data), 2):
+            code = (data[i] << 8) | data[i + 1]
+            code -= 0x8140 if code <= 0x9FFC else 0xC140
+            buffer.put((code >> 8) * 0xC0 + (code & 0xFF), 13)
+
+
+def _is_kanji(char):
+    """
+    Иероглифы и кана, которые кодируются двумя байтами Shift JIS режима кандзи.
+
+    Кириллицу и латиницу полной ширины оставляем байтовому режиму: сканеры
+    ожидают их в UTF-8.
+    """
+    if not ('\u3040' <= char <= '\u30ff' or '\u4e00' <= char <= '\u9fff'):
+        return False
+    try:
+        encoded = char.encode('shift_jis')
+    except UnicodeEncodeError:
+        return False
+    if len(encoded) != 2:
+        return False
+    code = (encoded[0] << 8) | encoded[1]
+    return 0x8140 <= code <= 0x9FFC or 0xE040 <= code <= 0xEBBF
+
+
+@lru_cache(maxsize=4096)
+def _char_modes(char):
+    """
+    Режимы, которыми можно закодировать символ, с его стоимостью в каждом.
+    """
+    if char.isascii():
+        if char.isdigit():
+            modes = (util.MODE_NUMBER, util.MODE_ALPHA_NUM, util.MODE_8BIT_BYTE)
+        elif char in _ALPHA_NUM:
+            modes = (util.MODE_ALPHA_NUM, util.MODE_8BIT_BYTE)
+        else:
+            modes = (util.MODE_8BIT_BYTE,)
+        return tuple((mode, _CHAR_COST[mode]) for mode in modes)
+    byte_cost = _CHAR_COST[util.MODE_8BIT_BYTE] * len(char.encode('utf-8'))
+    if _is_kanji(char):
+        return (
+            (util.MODE_KANJI, _CHAR_COST[util.MODE_KANJI]),
+            (util.MODE_8BIT_BYTE, byte_cost),
+        )
+    return ((util.MODE_8BIT_BYTE, byte_cost),)
+
+
+def optimal_modes(text, version):
+    """
+    Оптимальный режим для каждого символа при длинах полей версии ``version``.
+
+    Динамическое программирование: для каждого режима хранится минимальная
+    длина потока, заканчивающегося символом в этом режиме. Переход в новый
+    режим стоит заголовка сегмента (4 бита режима и поле длины) плюс
+    округление предыдущего сегмента до целого бита.
+    """
+    sizes = util.mode_sizes_for_version(version)
+    head = {mode: (4 + sizes[mode]) * 6 for mode in SEGMENT_MODES}
+    infinity = float('inf')
+
+    costs = dict(head)
+    choices = []
+    for char in text:
+        # Стоимость закрытия сегмента каждого режима (округление до бита)
+        closed = [(prev, -(-cost // 6) * 6) for prev, cost in costs.items()]
+        new_costs = {}
+        came_from = {}
+        for mode, char_cost in _char_modes(char):
+            # Продолжаем текущий сегмент или начинаем новый
+            best_from, best_cost = mode, costs.get(mode, infinity)
+            for prev, closed_cost in closed:
+                if prev != mode and closed_cost + head[mode] < best_cost:
+                    best_from, best_cost = prev, closed_cost + head[mode]
+            new_costs[mode] = best_cost + char_cost
+            came_from[mode] = best_from
+        costs = new_costs
+        choices.append(came_from)
+
+    if not choices:
+        return []
+
+    mode = min(costs, key=lambda m: (-(-costs[m] // 6), m))
+    modes = []
+    for came_from in reversed(choices):
+        modes.append(mode)
+        mode = came_from[mode]
+    modes.reverse()
+    return modes
+
+
+def build_segments(text, modes):
+    """
+    Склеивает символы с одинаковым режимом в сегменты ``QRData``.
+    """
+    segments = []
+    start = 0
+    for index in range(1, len(text) + 1):
+        if index < len(text) and modes[index] == modes[start]:
+            continue
+        chunk = text[start:index]
+        mode = modes[start]
+        if mode == util.MODE_KANJI:
+            segments.append(KanjiData(chunk))
+        else:
+            segments.append(util.QRData(
+                chunk.encode('utf-8'), mode=mode, check_data=False
+            ))
+        start = index
+    return segments
+
+
+def segment_bits(segments, version):
+    """
+    Длина потока сегментов в битах для версии ``version``.
+    """
+    sizes = util.mode_sizes_for_version(version)
+    return sum(
+        4 + sizes[segment.mode] + data_bits(segment.mode, len(segment))
+        for segment in segments
+    )
+
+
+def optimize_segments(data, error_correction):
+    """
+    Разбивает данные на сегменты разных режимов для минимальной версии.
+
+    Длина поля счетчика символов зависит от диапазона версий, поэтому
+    разбиение считается отдельно для каждого диапазона, начиная с младшего;
+    диапазон пропускается, если даже цифровой режим в него не помещается.
+    Возвращает список сегментов и версию.
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+
+    limits = DATA_BITS[error_correction]
+    for low, high in VERSION_CLASSES:
+        # Нижняя оценка: все символы в цифровом режиме без заголовков
+        if len(data) * 10 // 3 > limits[high]:
+            continue
+        segments = build_segments(data, optimal_modes(data, low))
+        bits = segment_bits(segments, low)
+        version = bisect_left(limits, bits, low, high + 1)
+        if version <= high:
+            return segments, version
+
+    raise exceptions.DataOverflowError(
+        'Данные не помещаются в QR-код даже максимальной версии 40'
+    )
+
+
+def describe_segments(segments):
+    """
+    Краткое описание сегментов для qr_info и ответа API.
+    """
+    return [
+        {'mode': MODE_NAMES[segment.mode], 'length': len(segment)}
+        for segment in segments
+    ]
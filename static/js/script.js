@@ -13,7 +13,7 @@ if (window.location.hostname !== 'localhost' && window.location.hostname !== '12
 let colorInput, customColorInput, customColorHex, applyColorBtn;
 let dataInput, charCountElement, maxCharsInfoElement, charProgressElement;
 let formSubmitted = false;
-let currentQRDataUrl = null;
+let currentQRUrl = null;
 
 /**
  * Инициализация при загрузке страницы
@@ -130,6 +130,29 @@ function initEventListeners() {
         applyColorBtn.addEventListener('click', applyCustomColor);
     }
     
+    // Палитра цветов (без встроенных onclick, чтобы работал CSP с nonce)
+    document.querySelectorAll('.color-option').forEach(option => {
+        option.addEventListener('click', function() {
+            selectColor(this, this.dataset.color);
+        });
+    });
+    
+    // Кнопки блока с результатом
+    const copyBtn = document.getElementById('copyBtn');
+    if (copyBtn) {
+        copyBtn.addEventListener('click', copyQRImage);
+    }
+    const anotherBtn = document.getElementById('anotherBtn');
+    if (anotherBtn) {
+        anotherBtn.addEventListener('click', makeAnotherQR);
+    }
+    
+    // Кнопка "Назад" на странице 404
+    const backBtn = document.getElementById('backBtn');
+    if (backBtn) {
+        backBtn.addEventListener('click', () => window.history.back());
+    }
+    
     // Обработчик скролла
     window.addEventListener('scroll', handleScroll);
     
@@ -169,11 +192,18 @@ function checkForQRResult() {
         // Сохраняем URL QR-кода
         const qrImage = document.querySelector('.qr-image');
         if (qrImage && qrImage.src) {
-            currentQRDataUrl = qrImage.src;
+            currentQRUrl = getQRImageUrl(qrImage);
         }
     }
 }
 
+/**
+ * Прямая ссылка на изображение QR-кода (без data URL, если она есть)
+ */
+function getQRImageUrl(qrImage) {
+    return qrImage.dataset.qrUrl || qrImage.src;
+}
+
 /**
  * Проверяем, нужно ли прокручивать к результату
  */
@@ -277,7 +307,7 @@ function initFormValidation() {
                     // Сохраняем URL QR-кода после генерации
                     const qrImage = document.querySelector('.qr-image');
                     if (qrImage && qrImage.src) {
-                        currentQRDataUrl = qrImage.src;
+                        currentQRUrl = getQRImageUrl(qrImage);
                     }
                 }, 100);
             }
@@ -583,14 +613,14 @@ function showNotification(message, type = 'info') {
  * Копировать изображение QR-кода в буфер обмена
  */
 async function copyQRImage() {
-    if (!currentQRDataUrl) {
+    if (!currentQRUrl) {
         showNotification('QR-код не найден', 'error');
         return;
     }
     
     try {
-        // Преобразуем Data URL в Blob
-        const response = await fetch(currentQRDataUrl);
+        // Загружаем изображение по ссылке
+        const response = await fetch(currentQRUrl);
         const blob = await response.blob();
         
         // Создаем ClipboardItem
@@ -619,7 +649,7 @@ async function copyQRImage() {
  * Fallback метод копирования изображения
  */
 function copyQRImageFallback() {
-    if (!currentQRDataUrl) return;
+    if (!currentQRUrl) return;
     
     // Создаем временный элемент canvas
     const canvas = document.createElement('canvas');
@@ -646,14 +676,14 @@ function copyQRImageFallback() {
         });
     };
     
-    img.src = currentQRDataUrl;
+    img.src = currentQRUrl;
 }
 
 /**
  * Поделиться изображением QR-кода
  */
 async function shareQRImage() {
-    if (!currentQRDataUrl) {
+    if (!currentQRUrl) {
         showNotification('QR-код не найден', 'error');
         return;
     }
@@ -661,10 +691,10 @@ async function shareQRImage() {
     // Проверяем поддержку Web Share API Level 2 (для файлов)
     if (navigator.canShare && navigator.canShare({ files: [] })) {
         try {
-            // Преобразуем Data URL в File
-            const response = await fetch(currentQRDataUrl);
+            // Загружаем изображение по ссылке и превращаем в File
+            const response = await fetch(currentQRUrl);
             const blob = await response.blob();
-            const file = new File([blob], 'qr_code.png', { type: 'image/png' });
+            const file = new File([blob], getQRFileName(), { type: blob.type });
             
             const shareData = {
                 title: 'Мой QR-код',
@@ -689,7 +719,7 @@ async function shareQRImage() {
  * Создать попап для выбора способа поделиться изображением
  */
 function createImageSharePopup() {
-    if (!currentQRDataUrl) return;
+    if (!currentQRUrl) return;
     
     // Удаляем старый попап если есть
     const oldPopup = document.getElementById('sharePopup');
@@ -714,7 +744,7 @@ function createImageSharePopup() {
             <div class="share-popup-body">
                 <div class="qr-preview mb-3 text-center">
                     <p class="small text-muted mb-2">Предпросмотр QR-кода:</p>
-                    <img src="${currentQRDataUrl}" alt="QR код" class="img-thumbnail" style="max-width: 150px;">
+                    <img src="${currentQRUrl}" alt="QR код" class="img-thumbnail" style="max-width: 150px;">
                 </div>
                 <p class="small text-muted mb-3">
                     Выберите способ для отправки изображения QR-кода:
@@ -802,21 +832,30 @@ async function shareImageViaEmail(blob, text) {
     // Note: Прямая отправка файлов через mailto: не поддерживается
     // Поэтому отправляем только текст со ссылкой на изображение
     const subject = encodeURIComponent('Мой QR-код');
-    const body = encodeURIComponent(`${text}\n\nQR код доступен по ссылке: ${currentQRDataUrl}`);
+    const imageUrl = new URL(currentQRUrl, window.location.href).href;
+    const body = encodeURIComponent(`${text}\n\nQR код доступен по ссылке: ${imageUrl}`);
     const mailtoUrl = `mailto:?subject=${subject}&body=${body}`;
     
     window.location.href = mailtoUrl;
 }
 
+/**
+ * Имя файла QR-кода с расширением выбранного формата
+ */
+function getQRFileName() {
+    const downloadBtn = document.getElementById('downloadBtn');
+    return (downloadBtn && downloadBtn.getAttribute('download')) || 'qr_code.png';
+}
+
 /**
  * Скачать изображение QR-кода
  */
 function downloadQRImage() {
-    if (!currentQRDataUrl) return;
+    if (!currentQRUrl) return;
     
     const link = document.createElement('a');
-    link.href = currentQRDataUrl;
-    link.download = 'qr_code.png';
+    link.href = currentQRUrl;
+    link.download = getQRFileName();
     document.body.appendChild(link);
     link.click();
     document.body.removeChild(link);
@@ -854,7 +893,7 @@ function makeAnotherQR() {
     closeSharePopup();
     
     // Сбрасываем текущий QR-код
-    currentQRDataUrl = null;
+    currentQRUrl = null;
     
     // Прокручиваем к форме
     const formElement = document.getElementById('generatorForm');
@@ -915,6 +954,69 @@ function scrollToForm() {
     }
 }
 
+/**
+ * Запросить матрицу QR-кода с /api/matrix (JSON с модулями в base64)
+ */
+async function fetchQRMatrix(data, options = {}) {
+    const response = await fetch('/api/matrix', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            data: data,
+            size: options.size || 'm',
+            error_correction: options.errorCorrection || 'M'
+        })
+    });
+    const payload = await response.json();
+    if (!response.ok) {
+        throw new Error(payload.error || `HTTP ${response.status}`);
+    }
+    return payload;
+}
+
+/**
+ * Нарисовать матрицу с /api/matrix на canvas
+ *
+ * Модули идут построчно, по биту на модуль со старшего бита байта.
+ * Соседние темные модули строки рисуются одним прямоугольником.
+ */
+function drawQRMatrix(canvas, matrix, options = {}) {
+    const count = matrix.modules_count;
+    const border = options.border !== undefined ? options.border : matrix.border;
+    const boxSize = options.boxSize || 10;
+    const binary = atob(matrix.modules);
+    const bits = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bits[i] = binary.charCodeAt(i);
+    }
+    const isDark = index => (bits[index >> 3] >> (7 - (index & 7))) & 1;
+    
+    canvas.width = canvas.height = (count + 2 * border) * boxSize;
+    const ctx = canvas.getContext('2d');
+    ctx.fillStyle = options.background || '#ffffff';
+    ctx.fillRect(0, 0, canvas.width, canvas.height);
+    ctx.fillStyle = options.color || '#000000';
+    
+    for (let row = 0; row < count; row++) {
+        let col = 0;
+        while (col < count) {
+            if (!isDark(row * count + col)) {
+                col++;
+                continue;
+            }
+            const start = col;
+            while (col < count && isDark(row * count + col)) {
+                col++;
+            }
+            ctx.fillRect(
+                (start + border) * boxSize, (row + border) * boxSize,
+                (col - start) * boxSize, boxSize
+            );
+        }
+    }
+    return canvas;
+}
+
 // Экспорт функций для глобального использования
 window.scrollToForm = scrollToForm;
 window.scrollToQRResult = scrollToQRResult;
@@ -925,4 +1027,6 @@ window.copyToClipboard = copyQRImage; // Изменено на copyQRImage
 window.makeAnotherQR = makeAnotherQR;
 window.updateCharCounter = updateCharCounter;
 window.showNotification = showNotification;
+window.fetchQRMatrix = fetchQRMatrix;
+window.drawQRMatrix = drawQRMatrix;
 window.closeSharePopup = closeSharePopup;
\ No newline at end of file
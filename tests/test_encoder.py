@@ -0,0 +1,83 @@
+"""
+Штрафы масок битовыми операциями и движок 'fast' против qrcode.
+"""
+import random
+
+import pytest
+import qrcode
+from qrcode import constants, util
+
+import encoder
+
+
+def make_qr(data, version, error_correction=constants.ERROR_CORRECT_M):
+    qr = qrcode.QRCode(version=version, error_correction=error_correction)
+    qr.add_data(data)
+    return qr
+
+
+def reference_points(qr):
+    """
+    Штрафы qrcode: полная матрица и util.lost_point для каждой маски.
+    """
+    points = []
+    for pattern in range(8):
+        qr.makeImpl(True, pattern)
+        points.append(util.lost_point(qr.modules))
+    return points
+
+
+@pytest.mark.parametrize('version', (1, 2, 6, 7, 14, 27, 40))
+def test_lost_points_match_qrcode(version):
+    rng = random.Random(version)
+    for _ in range(3):
+        data = bytes(rng.getrandbits(8) for _ in range(version * 4))
+        qr = make_qr(data, version, constants.ERROR_CORRECT_L)
+        assert encoder.lost_points(qr) == reference_points(
+            make_qr(data, version, constants.ERROR_CORRECT_L)
+        )
+
+
+@pytest.mark.parametrize('version', (1, 5, 7, 20, 40))
+def test_fast_make_matches_qrcode(version):
+    data = 'item/' + '1234567890' * (version - 1)
+    expected = make_qr(data, version)
+    expected.make(fit=False)
+
+    qr = make_qr(data, version)
+    encoder.make(qr, 'fast')
+    assert qr.modules == expected.modules
+    # best_mask_pattern перестраивает модули, поэтому на отдельном QRCode
+    assert qr.mask_pattern == make_qr(data, version).best_mask_pattern()
+
+
+def test_qrcode_engine_records_mask():
+    data = 'item/1234567890'
+    qr = make_qr(data, 2)
+    encoder.make(qr, 'qrcode')
+    assert qr.mask_pattern == make_qr(data, 2).best_mask_pattern()
+    expected = make_qr(data, 2)
+    expected.make(fit=False)
+    assert qr.modules == expected.modules
+
+
+def test_fixed_mask_is_kept():
+    qr = make_qr('hello', 2)
+    qr.mask_pattern = 5
+    encoder.make(qr, 'fast')
+    expected = make_qr('hello', 2)
+    expected.mask_pattern = 5
+    expected.make(fit=False)
+    assert qr.modules == expected.modules
+
+
+@pytest.mark.parametrize('border', (0, 4))
+def test_pack_round_trip(border):
+    qr = make_qr('pack me', 3)
+    encoder.make(qr, 'fast')
+    packed = encoder.pack_modules(qr.modules)
+    assert len(packed) == (qr.modules_count ** 2 + 7) // 8
+    qr.border = border
+    assert encoder.unpack_modules(
+        packed, qr.modules_count, border
+    ) == qr.get_matrix()
@@ -0,0 +1,101 @@
+"""
+Токен-бакеты с учетом стоимости и общие для процессов бакеты в mmap.
+"""
+import os
+
+import pytest
+from qrcode import constants
+
+import rate_limit
+from capacity import max_chars
+from rate_limit import (
+    LocalBucketBackend, RateLimited, RateLimiter, RenderTooLarge,
+    SharedBucketBackend, client_key, estimate_cost, estimate_version,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, 'time', lambda: now[0])
+    return now
+
+
+def test_burst_then_refill(clock):
+    limiter = RateLimiter(rate=10, burst=30)
+    assert limiter.acquire(1, 20) == 10
+    with pytest.raises(RateLimited) as error:
+        limiter.acquire(1, 25)
+    # Не хватает 15 токенов при 10 в секунду
+    assert error.value.retry_after == 2
+    clock[0] += 1.5
+    assert limiter.acquire(1, 25) == 0
+    clock[0] += 100
+    assert limiter.acquire(1, 0) == 30
+    assert limiter.rejected == 1
+
+
+def test_clients_are_independent(clock):
+    limiter = RateLimiter(rate=1, burst=5)
+    limiter.acquire(1, 5)
+    with pytest.raises(RateLimited):
+        limiter.acquire(1, 1)
+    assert limiter.acquire(2, 5) == 0
+
+
+def test_cost_above_burst_is_too_large(clock):
+    limiter = RateLimiter(rate=1, burst=5)
+    with pytest.raises(RenderTooLarge):
+        limiter.acquire(1, 5.5)
+    # Отклоненный запрос не списывает токены
+    assert limiter.acquire(1, 5) == 0
+
+
+def test_local_backend_evicts_oldest(clock):
+    backend = LocalBucketBackend(max_clients=2)
+    limiter = RateLimiter(rate=1, burst=5, backend=backend)
+    for key in (1, 2, 3):
+        limiter.acquire(key, 1)
+        clock[0] += 1
+    assert set(backend._buckets) == {2, 3}
+
+
+def test_shared_backend_between_instances(tmp_path, clock):
+    path = os.fspath(tmp_path / 'buckets')
+    first = RateLimiter(rate=1, burst=10, backend=SharedBucketBackend(path, 64))
+    second = RateLimiter(rate=1, burst=10, backend=SharedBucketBackend(path, 64))
+    first.acquire(7, 6)
+    with pytest.raises(RateLimited):
+        second.acquire(7, 6)
+    # Коллизии слотов: ключи с одинаковым остатком не смешиваются
+    assert second.acquire(7 + 64, 10) == 0
+    assert first.acquire(7, 4) == 0
+
+
+def test_client_key():
+    keys = frozenset({'good'})
+    assert client_key('good', '1.2.3.4', keys) == client_key('good', '5.6.7.8', keys)
+    # Неизвестный ключ не дает своего бакета
+    assert client_key('bad', '1.2.3.4', keys) == client_key(None, '1.2.3.4', keys)
+    assert client_key(None, '1.2.3.4', keys) != client_key(None, '5.6.7.8', keys)
+    assert client_key(None, '1.2.3.4') > 0
+
+
+@pytest.mark.parametrize('error_correction', (
+    constants.ERROR_CORRECT_L, constants.ERROR_CORRECT_M,
+    constants.ERROR_CORRECT_Q, constants.ERROR_CORRECT_H,
+))
+def test_estimate_version(error_correction):
+    for version in range(1, 41):
+        limit = max_chars(error_correction, version)
+        assert estimate_version(limit, error_correction) == version
+        if version < 40:
+            assert estimate_version(limit + 1, error_correction) == version + 1
+    assert estimate_version(10 ** 6, error_correction) == 40
+
+
+def test_estimate_cost():
+    level = constants.ERROR_CORRECT_M
+    assert estimate_cost(1, 0, level) == pytest.approx(1)
+    assert estimate_cost(100, 10, level) > estimate_cost(100, 0, level)
+    assert estimate_cost(2000, 0, level) > estimate_cost(100, 0, level)
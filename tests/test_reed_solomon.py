@@ -0,0 +1,59 @@
+"""
+Табличный Reed-Solomon совпадает с qrcode.util.create_data байт в байт.
+"""
+import random
+
+import pytest
+import qrcode
+from qrcode import constants, exceptions, util
+
+from capacity import max_chars
+from reed_solomon import (
+    EXP, LEVELS, LOG, create_data, feedback_table, generator, remainder
+)
+
+
+def data_list(data, version, error_correction):
+    qr = qrcode.QRCode(version=version, error_correction=error_correction)
+    qr.add_data(data)
+    return qr.data_list
+
+
+def test_field_tables():
+    assert all(EXP[LOG[value]] == value for value in range(1, 256))
+    assert EXP[255:510] == EXP[:255]
+
+
+@pytest.mark.parametrize('error_correction', LEVELS)
+def test_matches_qrcode(error_correction):
+    rng = random.Random(error_correction)
+    for version in range(1, 41):
+        length = max(1, max_chars(error_correction, version) * 9 // 10)
+        samples = (
+            bytes(rng.getrandbits(8) for _ in range(length)),
+            ''.join(rng.choice('0123456789') for _ in range(length * 2)),
+            ''.join(rng.choice(util.ALPHA_NUM.decode()) for _ in range(length)),
+            'x',
+        )
+        for sample in samples:
+            segments = data_list(sample, version, error_correction)
+            assert create_data(version, error_correction, segments) == bytes(
+                util.create_data(version, error_correction, segments)
+            ), (version, sample[:20])
+
+
+@pytest.mark.parametrize('ec_count', (7, 10, 18, 30))
+def test_codeword_divisible_by_generator(ec_count):
+    # Блок данных с байтами коррекции делится на g(x) без остатка
+    rng = random.Random(ec_count)
+    block = bytes(rng.getrandbits(8) for _ in range(40))
+    table = feedback_table(generator(ec_count))
+    ec = remainder(block, table, ec_count)
+    assert remainder(block + ec, table, ec_count) == bytes(ec_count)
+
+
+def test_overflow():
+    version, level = 1, constants.ERROR_CORRECT_H
+    segments = data_list('x' * (max_chars(level, version) + 1), version, level)
+    with pytest.raises(exceptions.DataOverflowError):
+        create_data(version, level, segments)
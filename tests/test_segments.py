@@ -0,0 +1,149 @@
+"""
+Разбиение на сегменты: версия не выше одного режима на весь текст, ниже
+на смешанных данных, а поток сегментов декодируется в исходную строку.
+"""
+import random
+import string
+
+import pytest
+import qrcode
+from qrcode import constants, util
+
+from reed_solomon import LAYOUTS, create_data
+from segments import describe_segments, optimize_segments
+
+LEVELS = (
+    constants.ERROR_CORRECT_L, constants.ERROR_CORRECT_M,
+    constants.ERROR_CORRECT_Q, constants.ERROR_CORRECT_H,
+)
+
+MIXED = {
+    'numeric': 'https://example.com/item/' + '1234567890' * 8,
+    'numeric_query': (
+        'https://shop.example/p?sku=ABCD-1234-EFGH-5678&ref=' + '9' * 30
+    ),
+    'alphanumeric': 'Product: ' + 'ABCDEFGHIJKLMNOP' * 5,
+    'alphanumeric_numeric': (
+        'ORDER 12345678901234567890 ' + 'ABC-DEF/GHI' * 4 + 'x'
+    ),
+    'kanji': '東京都千代田区丸の内一丁目' * 4 + ' tel 0312345678',
+    'kanji_text': 'お問い合わせ: 日本語のテキストです。' * 3,
+}
+
+
+def single_mode_version(data, error_correction):
+    """
+    Версия стандартного QRCode, когда весь текст - один сегмент.
+    """
+    qr = qrcode.QRCode(error_correction=error_correction)
+    qr.add_data(data, optimize=0)
+    return qr.best_fit()
+
+
+def corpus(count=200, seed=12):
+    rng = random.Random(seed)
+    alphabets = (
+        string.digits, util.ALPHA_NUM.decode(), string.ascii_letters,
+        string.printable.strip(), 'абвгдеёжзийклмн', '日本語東京漢字かなカナ',
+        string.digits + '日本', string.ascii_uppercase + string.digits + 'ж',
+    )
+    for _ in range(count):
+        parts = [
+            ''.join(rng.choices(rng.choice(alphabets), k=rng.randint(1, 40)))
+            for _ in range(rng.randint(1, 6))
+        ]
+        yield ''.join(parts)
+
+
+def read_stream(codewords, version, error_correction):
+    """
+    Декодирует кодовые слова create_data обратно в строку: собирает байты
+    данных блоков и читает сегменты по ISO 18004.
+    """
+    layout = LAYOUTS[version, error_correction]
+    blocks = layout.block_count
+    short = layout.short_length
+    short_end = short * blocks
+    data = bytearray()
+    for index in range(blocks):
+        data += codewords[index:short_end:blocks]
+        if index >= layout.short_count:
+            data.append(codewords[short_end + index - layout.short_count])
+
+    bits = format(int.from_bytes(data, 'big'), f'0{len(data) * 8}b')
+    position = 0
+
+    def take(length):
+        nonlocal position
+        value = int(bits[position:position + length], 2)
+        position += length
+        return value
+
+    text = []
+    while len(bits) - position >= 4:
+        mode = take(4)
+        if mode == 0:
+            break
+        count = take(util.length_in_bits(mode, version))
+        if mode == util.MODE_NUMBER:
+            digits = []
+            for offset in range(0, count, 3):
+                width = min(3, count - offset)
+                digits.append(str(take((1, 4, 7, 10)[width])).zfill(width))
+            text.append(''.join(digits))
+        elif mode == util.MODE_ALPHA_NUM:
+            alphabet = util.ALPHA_NUM.decode()
+            chars = []
+            for _ in range(count // 2):
+                value = take(11)
+                chars += [alphabet[value // 45], alphabet[value % 45]]
+            if count % 2:
+                chars.append(alphabet[take(6)])
+            text.append(''.join(chars))
+        elif mode == util.MODE_8BIT_BYTE:
+            text.append(bytes(take(8) for _ in range(count)).decode('utf-8'))
+        elif mode == util.MODE_KANJI:
+            encoded = bytearray()
+            for _ in range(count):
+                value = take(13)
+                code = (value // 0xC0 << 8) | (value % 0xC0)
+                code += 0x8140 if code + 0x8140 <= 0x9FFC else 0xC140
+                encoded += code.to_bytes(2, 'big')
+            text.append(encoded.decode('shift_jis'))
+        else:
+            raise AssertionError(f'unexpected mode {mode}')
+    return ''.join(text)
+
+
+@pytest.mark.parametrize('error_correction', LEVELS)
+def test_never_above_single_mode(error_correction):
+    for data in corpus():
+        _, version = optimize_segments(data, error_correction)
+        assert version <= single_mode_version(data, error_correction), data
+
+
+@pytest.mark.parametrize('error_correction', LEVELS)
+@pytest.mark.parametrize('name', sorted(MIXED))
+def test_mixed_data_lowers_version(name, error_correction):
+    data = MIXED[name]
+    segments, version = optimize_segments(data, error_correction)
+    assert version < single_mode_version(data, error_correction)
+    modes = {segment['mode'] for segment in describe_segments(segments)}
+    expected = name.split('_')[0]
+    assert expected in modes
+
+
+@pytest.mark.parametrize('error_correction', LEVELS)
+def test_round_trip(error_correction):
+    samples = list(MIXED.values()) + list(corpus(100, seed=7))
+    for data in samples:
+        segments, version = optimize_segments(data, error_correction)
+        codewords = create_data(version, error_correction, segments)
+        assert read_stream(codewords, version, error_correction) == data
+
+
+def test_overflow():
+    with pytest.raises(qrcode.exceptions.DataOverflowError):
+        optimize_segments('1' * 7090, constants.ERROR_CORRECT_L)
+    _, version = optimize_segments('1' * 7089, constants.ERROR_CORRECT_L)
+    assert version == 40
@@ -0,0 +1,136 @@
+import zlib
+
+from PIL import ImageColor
+
+
+def iter_runs(matrix):
+    """
+    Отдает горизонтальные отрезки темных модулей: (строка, столбец, длина).
+    """
+    for y, row in enumerate(matrix):
+        x = 0
+        width = len(row)
+        while x < width:
+            if row[x]:
+                start = x
+                while x < width and row[x]:
+                    x += 1
+                yield y, start, x - start
+            else:
+                x += 1
+
+
+def iter_rects(matrix):
+    """
+    Отдает прямоугольники (столбец, строка, ширина, высота), объединяя
+    одинаковые отрезки в соседних строках.
+    """
+    open_rects = {}
+    last_row = -1
+    for y, x, length in iter_runs(matrix):
+        if y != last_row:
+            # Закрываем прямоугольники, которые не продолжились в строке y
+            for key in [k for k, (_, bottom) in open_rects.items() if bottom < y - 1]:
+                top, bottom = open_rects.pop(key)
+                yield key[0], top, key[1], bottom - top + 1
+            last_row = y
+        key = (x, length)
+        if key in open_rects and open_rects[key][1] == y - 1:
+            open_rects[key] = (open_rects[key][0], y)
+        else:
+            if key in open_rects:
+                top, bottom = open_rects.pop(key)
+                yield key[0], top, key[1], bottom - top + 1
+            open_rects[key] = (y, y)
+    for (x, length), (top, bottom) in open_rects.items():
+        yield x, top, length, bottom - top + 1
+
+
+def render_svg(matrix, box_size, fill_color, back_color='white', single_path=False):
+    """
+    Строит SVG из матрицы модулей (вместе с рамкой).
+
+    Соседние темные модули объединяются в прямоугольники. При
+    ``single_path=True`` все прямоугольники пишутся в один ``<path>``.
+    """
+    width = len(matrix)
+    size = width * box_size
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {width} {width}" shape-rendering="crispEdges">'
+        f'<rect width="{width}" height="{width}" fill="{back_color}"/>'
+    ]
+
+    if single_path:
+        path = ''.join(
+            f'M{x} {y}h{w}v{h}h-{w}z' for x, y, w, h in iter_rects(matrix)
+        )
+        parts.append(f'<path fill="{fill_color}" d="{path}"/>')
+    else:
+        parts.append(f'<g fill="{fill_color}">')
+        parts.extend(
+            f'<rect x="{x}" y="{y}" width="{w}" height="{h}"/>'
+            for x, y, w, h in iter_rects(matrix)
+        )
+        parts.append('</g>')
+
+    parts.append('</svg>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def _pdf_color(color):
+    return ' '.join(
+        f'{channel / 255:.4g}' for channel in ImageColor.getrgb(color)[:3]
+    )
+
+
+def render_pdf(matrix, box_size, fill_color, back_color='white'):
+    """
+    Строит одностраничный PDF из матрицы модулей (вместе с рамкой).
+
+    Размер страницы в пунктах совпадает с размером PNG в пикселях.
+    """
+    width = len(matrix)
+    size = width * box_size
+
+    # Ось Y в PDF направлена вверх, поэтому строки отсчитываем снизу
+    commands = [
+        f'{_pdf_color(back_color)} rg 0 0 {size} {size} re f',
+        f'{_pdf_color(fill_color)} rg',
+    ]
+    commands.extend(
+        f'{x * box_size} {(width - y - h) * box_size} '
+        f'{w * box_size} {h * box_size} re'
+        for x, y, w, h in iter_rects(matrix)
+    )
+    commands.append('f')
+    stream = zlib.compress('\n'.join(commands).encode('ascii'))
+
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {size} {size}] '
+            f'/Contents 4 0 R /Resources << >> >>'
+        ).encode('ascii'),
+        (
+            f'<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n'
+        ).encode('ascii') + stream + b'\nendstream',
+    ]
+
+    output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f'{number} 0 obj\n'.encode('ascii') + body + b'\nendobj\n'
+
+    xref = len(output)
+    output += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('ascii')
+    for offset in offsets:
+        output += f'{offset:010d} 00000 n \n'.encode('ascii')
+    output += (
+        f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n'
+        f'startxref\n{xref}\n%%EOF\n'
+    ).encode('ascii')
+    return bytes(output)